@@ -0,0 +1,281 @@
+# app/audit.py
+"""
+Buffered audit log writer.
+
+crud.log() hands entries to `sink` instead of committing inline. A single writer
+thread drains the bounded queue and inserts them with one multi-row INSERT when
+AUDIT_BATCH_SIZE entries are waiting or AUDIT_FLUSH_INTERVAL_MS has passed.
+
+- Bounded memory: the queue holds at most AUDIT_QUEUE_MAX entries.
+- Backpressure: when it is full, submit() blocks for up to AUDIT_PUT_TIMEOUT_MS and
+  then writes the entry synchronously, so entries are never dropped for being late.
+- Shutdown: stop() stops accepting entries (later ones are written synchronously),
+  then drains and flushes everything that was accepted.
+- Durability: a batch that still fails after AUDIT_FLUSH_RETRIES attempts is appended
+  to AUDIT_SPILL_PATH and inserted again after the next successful flush, on the
+  next start, or by `python -m app.maintenance replay-audit-spill`.
+
+AUDIT_MODE=sync disables buffering entirely (every crud.log commits inline).
+"""
+from __future__ import annotations
+
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+from typing import Any
+
+from sqlalchemy import insert
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from .db import SessionLocal
+from .models import AuditLog
+
+log = logging.getLogger(__name__)
+
+AUDIT_MODE = os.getenv("AUDIT_MODE", "buffered").strip().lower()
+AUDIT_QUEUE_MAX = int(os.getenv("AUDIT_QUEUE_MAX", "10000"))
+AUDIT_BATCH_SIZE = int(os.getenv("AUDIT_BATCH_SIZE", "500"))
+AUDIT_FLUSH_INTERVAL_MS = int(os.getenv("AUDIT_FLUSH_INTERVAL_MS", "200"))
+AUDIT_PUT_TIMEOUT_MS = int(os.getenv("AUDIT_PUT_TIMEOUT_MS", "50"))
+AUDIT_FLUSH_RETRIES = 3
+AUDIT_SPILL_PATH = os.getenv("AUDIT_SPILL_PATH", "audit_spill.ndjson")
+
+_STOP = object()
+
+
+def write_rows(rows: list[dict[str, Any]]) -> None:
+    """
+    Insert audit rows in one statement and commit, on a dedicated session.
+    """
+    db = SessionLocal()
+    try:
+        db.execute(insert(AuditLog), rows)
+        db.commit()
+    finally:
+        db.close()
+
+
+_spill_lock = threading.Lock()
+
+
+def spill(rows: list[dict[str, Any]], path: str | None = None) -> None:
+    """
+    Append rows that could not be inserted to the spill file, one JSON object per
+    line, and fsync it before returning.
+    """
+    path = path or AUDIT_SPILL_PATH
+    lines = "".join(json.dumps({**r, "created_at": r["created_at"].isoformat()}) + "\n" for r in rows)
+    with _spill_lock:
+        fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+        try:
+            os.write(fd, lines.encode())
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+    log.error("spilled %d audit rows to %s", len(rows), path)
+
+
+def replay_spill(path: str | None = None) -> int:
+    """
+    Insert the rows in the spill file and remove it. Rows already in audit_logs
+    (a replay that was interrupted) are skipped. Returns the number of rows read.
+    """
+    path = path or AUDIT_SPILL_PATH
+    claimed = f"{path}.{os.getpid()}.replay"
+    try:
+        # Claim the file, so spills from now on start a new one and a concurrent
+        # replay in another worker finds nothing.
+        os.rename(path, claimed)
+    except FileNotFoundError:
+        return 0
+    with open(claimed) as f:
+        rows = [json.loads(line) for line in f if line.strip()]
+    for r in rows:
+        r["created_at"] = datetime.fromisoformat(r["created_at"])
+    try:
+        db = SessionLocal()
+        try:
+            for start in range(0, len(rows), AUDIT_BATCH_SIZE):
+                db.execute(pg_insert(AuditLog).on_conflict_do_nothing(), rows[start:start + AUDIT_BATCH_SIZE])
+            db.commit()
+        finally:
+            db.close()
+    except Exception:
+        # Put them back for the next attempt.
+        spill(rows, path)
+        os.remove(claimed)
+        raise
+    os.remove(claimed)
+    log.info("replayed %d spilled audit rows", len(rows))
+    return len(rows)
+
+
+class AuditSink:
+    def __init__(
+        self,
+        *,
+        max_queue: int = AUDIT_QUEUE_MAX,
+        batch_size: int = AUDIT_BATCH_SIZE,
+        flush_interval_s: float = AUDIT_FLUSH_INTERVAL_MS / 1000,
+        put_timeout_s: float = AUDIT_PUT_TIMEOUT_MS / 1000,
+    ):
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue)
+        self._batch_size = batch_size
+        self._flush_interval_s = flush_interval_s
+        self._put_timeout_s = put_timeout_s
+        self._thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+        # Producers between "accepting?" and their put, so stop() can wait them out.
+        self._accepting = False
+        self._inflight = 0
+        self._accept = threading.Condition()
+        self._spilled = False
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        with self._lock:
+            if self.running:
+                return
+            self._thread = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+            self._thread.start()
+            with self._accept:
+                self._accepting = True
+        try:
+            replay_spill()
+        except Exception:
+            log.exception("could not replay the audit spill file")
+
+    def stop(self, timeout_s: float = 10.0) -> None:
+        """
+        Flush everything accepted so far and stop the writer thread.
+        """
+        with self._lock:
+            thread = self._thread
+            if thread is None:
+                return
+            with self._accept:
+                self._accepting = False
+                self._accept.wait_for(lambda: self._inflight == 0)
+            self._queue.put(_STOP)
+            thread.join(timeout_s)
+            if thread.is_alive():
+                log.error("audit writer did not stop within %.1fs", timeout_s)
+            self._thread = None
+
+    def _enter(self) -> bool:
+        with self._accept:
+            if not self._accepting:
+                return False
+            self._inflight += 1
+            return True
+
+    def _leave(self) -> None:
+        with self._accept:
+            self._inflight -= 1
+            if not self._inflight:
+                self._accept.notify_all()
+
+    def submit(self, row: dict[str, Any]) -> None:
+        if not self._enter():
+            write_rows([row])
+            return
+        try:
+            self._queue.put(row, timeout=self._put_timeout_s)
+            return
+        except queue.Full:
+            pass
+        finally:
+            self._leave()
+        # Backpressure: the writer is behind, so this caller pays for its own insert.
+        log.warning("audit queue full; writing entry synchronously")
+        write_rows([row])
+
+    def offer(self, row: dict[str, Any]) -> bool:
+        """
+        Non-blocking submit for async callers. Returns False if the queue is full
+        or the sink is stopping; the caller then writes the row itself.
+        """
+        if not self._enter():
+            return False
+        try:
+            self._queue.put_nowait(row)
+            return True
+        except queue.Full:
+            return False
+        finally:
+            self._leave()
+
+    def _run(self) -> None:
+        batch: list[dict[str, Any]] = []
+        deadline = time.monotonic() + self._flush_interval_s
+        stopping = False
+
+        while not stopping:
+            try:
+                item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                item = None
+
+            if item is _STOP:
+                stopping = True
+                # Drain whatever was queued before the stop marker.
+                while True:
+                    try:
+                        rest = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if rest is not _STOP:
+                        batch.append(rest)
+            elif item is not None:
+                batch.append(item)
+
+            if batch and (stopping or len(batch) >= self._batch_size or time.monotonic() >= deadline):
+                for start in range(0, len(batch), self._batch_size):
+                    self._flush(batch[start:start + self._batch_size])
+                batch = []
+
+            if time.monotonic() >= deadline:
+                deadline = time.monotonic() + self._flush_interval_s
+
+    def _flush(self, rows: list[dict[str, Any]]) -> None:
+        for attempt in range(1, AUDIT_FLUSH_RETRIES + 1):
+            try:
+                write_rows(rows)
+            except Exception:
+                log.exception("audit flush of %d rows failed (attempt %d)", len(rows), attempt)
+                time.sleep(0.1 * attempt)
+                continue
+            if self._spilled:
+                # The database is back: insert what was spilled while it was not.
+                try:
+                    replay_spill()
+                    self._spilled = False
+                except Exception:
+                    log.exception("could not replay the audit spill file")
+            return
+        try:
+            spill(rows)
+            self._spilled = True
+        except Exception:
+            log.exception("could not spill %d audit rows; they are lost", len(rows))
+
+
+sink = AuditSink()
+
+
+def start() -> None:
+    if AUDIT_MODE == "sync":
+        log.info("AUDIT_MODE=sync; audit entries are committed inline.")
+        return
+    sink.start()
+
+
+def stop() -> None:
+    sink.stop()
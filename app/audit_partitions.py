@@ -0,0 +1,267 @@
+# app/audit_partitions.py
+"""
+Monthly range partitions for audit_logs.
+
+Partitions are named audit_logs_pYYYYMM and cover [first of month, first of next month).
+A DEFAULT partition catches rows outside the pre-created range so inserts never fail.
+
+- ensure_partitions(): create this month plus AUDIT_PARTITION_MONTHS_AHEAD future months.
+- archive_expired_partitions(): export partitions older than AUDIT_RETENTION_MONTHS to
+  gzip-compressed NDJSON files in AUDIT_ARCHIVE_DIR, then detach and drop them.
+- migrate_to_partitioned(): one-off conversion of a legacy unpartitioned audit_logs table.
+
+Every worker runs the maintenance job, so both steps take a Postgres advisory lock:
+ensure_partitions() waits for it, archive_expired_partitions() skips the run when
+another process is already archiving.
+"""
+from __future__ import annotations
+
+import gzip
+import json
+import logging
+import os
+import re
+import time
+from contextlib import contextmanager
+from datetime import date, datetime
+from typing import Any, Iterator, Mapping
+
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Connection
+
+from .db import engine
+from .models import AuditLog
+
+log = logging.getLogger(__name__)
+
+AUDIT_PARTITION_MONTHS_AHEAD = int(os.getenv("AUDIT_PARTITION_MONTHS_AHEAD", "3"))
+AUDIT_RETENTION_MONTHS = int(os.getenv("AUDIT_RETENTION_MONTHS", "24"))  # 0 disables archiving
+AUDIT_ARCHIVE_DIR = os.getenv("AUDIT_ARCHIVE_DIR", "audit_archive")
+
+PARENT = AuditLog.__tablename__
+DEFAULT_PARTITION = f"{PARENT}_default"
+COLUMNS = ["id", "actor_user_id", "patient_id", "action", "details", "data", "created_at"]
+_PARTITION_RE = re.compile(rf"^{PARENT}_p(\d{{4}})(\d{{2}})$")
+# pg_advisory_lock keys
+_ENSURE_LOCK = 0x61756401
+_ARCHIVE_LOCK = 0x61756402
+
+
+def _month_start(d: date) -> date:
+    return date(d.year, d.month, 1)
+
+
+def _add_months(d: date, n: int) -> date:
+    years, month0 = divmod(d.month - 1 + n, 12)
+    return date(d.year + years, month0 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    return f"{PARENT}_p{month:%Y%m}"
+
+
+def audit_row_to_json(row: Mapping[str, Any]) -> str:
+    """
+    One NDJSON line for an audit row; shared by archives and the export endpoint.
+    """
+    created_at = row["created_at"]
+    return json.dumps(
+        {
+            "id": row["id"],
+            "actor_user_id": row["actor_user_id"],
+            "patient_id": row["patient_id"],
+            "action": row["action"],
+            "details": row["details"] or "",
+            "data": row["data"],
+            "created_at": created_at.isoformat() if created_at else None,
+        },
+        separators=(",", ":"),
+    )
+
+
+def is_partitioned(conn: Connection) -> bool:
+    return bool(
+        conn.execute(
+            text(
+                "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table pt "
+                "JOIN pg_class c ON c.oid = pt.partrelid WHERE c.relname = :t)"
+            ),
+            {"t": PARENT},
+        ).scalar()
+    )
+
+
+def list_partitions(conn: Connection) -> list[tuple[str, date]]:
+    """
+    Attached monthly partitions as (name, month start), oldest first. Excludes DEFAULT.
+    """
+    rows = conn.execute(
+        text(
+            "SELECT c.relname FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid "
+            "JOIN pg_class p ON p.oid = i.inhparent "
+            "WHERE p.relname = :t"
+        ),
+        {"t": PARENT},
+    ).scalars()
+    out = []
+    for name in rows:
+        m = _PARTITION_RE.match(name)
+        if m:
+            out.append((name, date(int(m.group(1)), int(m.group(2)), 1)))
+    return sorted(out, key=lambda x: x[1])
+
+
+def _create_months(conn: Connection, first: date, last: date) -> list[str]:
+    existing = {name for name, _ in list_partitions(conn)}
+    created = []
+    month = _month_start(first)
+    while month <= last:
+        name = partition_name(month)
+        if name not in existing:
+            conn.exec_driver_sql(
+                f'CREATE TABLE IF NOT EXISTS "{name}" PARTITION OF "{PARENT}" '
+                f"FOR VALUES FROM ('{month.isoformat()}') TO ('{_add_months(month, 1).isoformat()}')"
+            )
+            created.append(name)
+        month = _add_months(month, 1)
+    conn.exec_driver_sql(f'CREATE TABLE IF NOT EXISTS "{DEFAULT_PARTITION}" PARTITION OF "{PARENT}" DEFAULT')
+    return created
+
+
+def ensure_partitions(today: date | None = None, months_ahead: int = AUDIT_PARTITION_MONTHS_AHEAD) -> list[str]:
+    """
+    Pre-create the current and upcoming monthly partitions. No-op for an unpartitioned table.
+    """
+    today = today or datetime.utcnow().date()
+    with engine.begin() as conn:
+        if not is_partitioned(conn):
+            return []
+        conn.execute(text("SELECT pg_advisory_xact_lock(:k)"), {"k": _ENSURE_LOCK})
+        created = _create_months(conn, today, _add_months(_month_start(today), months_ahead))
+    if created:
+        log.info("audit partitions created: %s", ", ".join(created))
+    return created
+
+
+@contextmanager
+def _try_lock(key: int) -> Iterator[bool]:
+    """Session-level advisory lock on a dedicated connection; yields whether it was taken."""
+    with engine.connect() as conn:
+        taken = conn.execute(text("SELECT pg_try_advisory_lock(:k)"), {"k": key}).scalar()
+        conn.commit()
+        try:
+            yield taken
+        finally:
+            if taken:
+                conn.execute(text("SELECT pg_advisory_unlock(:k)"), {"k": key})
+                conn.commit()
+
+
+def _export_partition(name: str, path: str) -> int:
+    tmp = f"{path}.{os.getpid()}.tmp"
+    n = 0
+    with engine.connect().execution_options(stream_results=True, yield_per=5000) as conn:
+        result = conn.exec_driver_sql(f'SELECT {", ".join(COLUMNS)} FROM "{name}" ORDER BY created_at, id')
+        with gzip.open(tmp, "wt", encoding="utf-8") as f:
+            for row in result.mappings():
+                f.write(audit_row_to_json(row))
+                f.write("\n")
+                n += 1
+            f.flush()
+            os.fsync(f.fileno())
+    os.replace(tmp, path)
+    return n
+
+
+def archive_expired_partitions(
+    today: date | None = None,
+    retention_months: int = AUDIT_RETENTION_MONTHS,
+    archive_dir: str = AUDIT_ARCHIVE_DIR,
+) -> list[str]:
+    """
+    Export each monthly partition older than the retention window to
+    <archive_dir>/<partition>.ndjson.gz, then detach and drop it.
+    The file is written and fsynced before the partition is dropped.
+    Returns [] without doing anything while another process is archiving.
+    """
+    if retention_months <= 0:
+        return []
+    with _try_lock(_ARCHIVE_LOCK) as taken:
+        if not taken:
+            log.info("audit partition archiving is running elsewhere; skipping")
+            return []
+        return _archive_expired(today or datetime.utcnow().date(), retention_months, archive_dir)
+
+
+def _archive_expired(today: date, retention_months: int, archive_dir: str) -> list[str]:
+    cutoff = _add_months(_month_start(today), -retention_months)
+
+    with engine.connect() as conn:
+        if not is_partitioned(conn):
+            return []
+        expired = [name for name, month in list_partitions(conn) if month < cutoff]
+
+    if not expired:
+        return []
+
+    os.makedirs(archive_dir, exist_ok=True)
+    archived = []
+    for name in expired:
+        started = time.perf_counter()
+        path = os.path.join(archive_dir, f"{name}.ndjson.gz")
+        rows = _export_partition(name, path)
+        with engine.begin() as conn:
+            conn.exec_driver_sql(f'ALTER TABLE "{PARENT}" DETACH PARTITION "{name}"')
+            conn.exec_driver_sql(f'DROP TABLE "{name}"')
+        log.info(
+            "audit partition archived: %s rows=%d file=%s elapsed_ms=%.1f",
+            name,
+            rows,
+            path,
+            (time.perf_counter() - started) * 1000,
+        )
+        archived.append(path)
+    return archived
+
+
+def migrate_to_partitioned(months_ahead: int = AUDIT_PARTITION_MONTHS_AHEAD) -> int:
+    """
+    Convert a legacy unpartitioned audit_logs table in one transaction:
+    rename it aside, create the partitioned table and its partitions, copy rows, drop the old table.
+    Returns the number of rows copied (0 if already partitioned).
+    """
+    legacy = f"{PARENT}_legacy"
+    with engine.begin() as conn:
+        if not inspect(conn).has_table(PARENT) or is_partitioned(conn):
+            return 0
+
+        conn.exec_driver_sql(f'ALTER TABLE "{PARENT}" RENAME TO "{legacy}"')
+
+        # Free index / constraint names for the new table.
+        insp = inspect(conn)
+        for idx in insp.get_indexes(legacy):
+            conn.exec_driver_sql(f'DROP INDEX "{idx["name"]}"')
+        pk_name = insp.get_pk_constraint(legacy).get("name")
+        if pk_name:
+            conn.exec_driver_sql(f'ALTER TABLE "{legacy}" RENAME CONSTRAINT "{pk_name}" TO "{legacy}_pkey"')
+
+        AuditLog.__table__.create(conn)
+
+        oldest = conn.exec_driver_sql(f'SELECT min(created_at) FROM "{legacy}"').scalar()
+        today = datetime.utcnow().date()
+        _create_months(conn, (oldest or datetime.utcnow()).date(), _add_months(_month_start(today), months_ahead))
+
+        legacy_cols = {c["name"] for c in inspect(conn).get_columns(legacy)}
+        select_cols = [
+            "COALESCE(created_at, now() AT TIME ZONE 'utc')" if c == "created_at"
+            else (c if c in legacy_cols else "NULL")
+            for c in COLUMNS
+        ]
+        copied = conn.exec_driver_sql(
+            f'INSERT INTO "{PARENT}" ({", ".join(COLUMNS)}) SELECT {", ".join(select_cols)} FROM "{legacy}"'
+        ).rowcount
+        conn.exec_driver_sql(f'DROP TABLE "{legacy}"')
+
+    log.info("audit_logs converted to monthly partitions: %d rows copied", copied)
+    return copied
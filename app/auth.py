@@ -10,6 +10,10 @@ ACCESS_TOKEN_EXPIRE_HOURS = 8
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+# Stored for accounts created without a password (bulk patient import). Never a
+# valid bcrypt hash, so no password verifies against it.
+UNUSABLE_PASSWORD = "!"
+
 def hash_password(pw: str) -> str:
     # bcrypt hard limit is 72 bytes
     if len(pw.encode("utf-8")) > 72:
@@ -19,6 +23,8 @@ def hash_password(pw: str) -> str:
 def verify_password(pw: str, pw_hash: str) -> bool:
     if len(pw.encode("utf-8")) > 72:
         return False
+    if pw_hash.startswith(UNUSABLE_PASSWORD):
+        return False
     return pwd_context.verify(pw, pw_hash)
 
 def create_access_token(user_id: str, role: str) -> str:
@@ -0,0 +1,117 @@
+# app/consent_prefetch.py
+"""
+Warm the FHIR resource cache (app/fhir_client.py) for a newly consented chart,
+so the doctor's first records view does not pay the cold fan-out to every FHIR
+server.
+
+The consent routes call start() once a grant is committed. It runs one
+background task per consent that reads the patient's pointers for the granted
+scope ("all": every record type, at most CONSENT_PREFETCH_MAX_POINTERS) and
+fetches each resource not already cached, skipping pointers the health checker
+found gone. Fetches of all prefetch tasks share CONSENT_PREFETCH_CONCURRENCY
+slots and are spaced to at most CONSENT_PREFETCH_PER_HOST_RPS per FHIR host, so
+a burst of grants does not flood the servers. Revoking the consent cancels its
+task. The cache is per worker process: the worker that handled the grant is
+the one warmed. Record views read the cache only with FHIR_CACHE_RECORD_VIEWS
+on, so without it there is nothing to warm and start() does nothing.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import time
+from collections import Counter
+from urllib.parse import urlsplit
+
+import httpx
+from sqlalchemy import select
+
+from .db import AsyncSessionLocal
+from .models import ActiveConsent, RecordPointer
+from .pointer_health import HostRateLimiter, is_known_dead
+from . import crud, fhir_client
+
+log = logging.getLogger(__name__)
+
+PREFETCH = os.getenv("CONSENT_PREFETCH", "true").lower() in ("1", "true", "yes", "on")
+CONCURRENCY = int(os.getenv("CONSENT_PREFETCH_CONCURRENCY", "10"))
+PER_HOST_RPS = float(os.getenv("CONSENT_PREFETCH_PER_HOST_RPS", "5"))
+MAX_POINTERS = int(os.getenv("CONSENT_PREFETCH_MAX_POINTERS", "500"))
+
+# consent id -> prefetch task, while it runs
+_jobs: dict[str, asyncio.Task] = {}
+_sem = asyncio.Semaphore(CONCURRENCY)
+_limiter = HostRateLimiter(PER_HOST_RPS)
+
+
+async def _pointers(consent_id: str, patient_id: str, scope: str) -> list[RecordPointer]:
+    async with AsyncSessionLocal() as db:
+        # Revoked (or lapsed) before this task got to run
+        if await db.get(ActiveConsent, consent_id) is None:
+            return []
+        q = select(RecordPointer).where(RecordPointer.patient_id == patient_id)
+        if scope != "all":
+            q = q.where(RecordPointer.record_type == crud.SCOPE_RECORD_TYPES[scope])
+        return [p for p in (await db.scalars(q.limit(MAX_POINTERS))) if not is_known_dead(p)]
+
+
+async def _prefetch(consent_id: str, patient_id: str, scope: str) -> None:
+    started = time.perf_counter()
+    counts: Counter = Counter()
+
+    async def _one(ptr: RecordPointer) -> None:
+        url = fhir_client.resource_url(ptr.fhir_base_url, ptr.fhir_resource_type, ptr.fhir_resource_id)
+        if fhir_client.cached_resource(url) is not None:
+            counts["cached"] += 1
+            return
+        async with _sem:
+            await _limiter.wait(urlsplit(url).netloc)
+            try:
+                await fhir_client.fetch_fhir_resource(ptr.fhir_base_url, ptr.fhir_resource_type, ptr.fhir_resource_id)
+                counts["fetched"] += 1
+            except httpx.HTTPError:
+                counts["failed"] += 1
+
+    pointers = await _pointers(consent_id, patient_id, scope)
+    await asyncio.gather(*(_one(p) for p in pointers))
+    log.info(
+        "consent prefetch %s: pointers=%d fetched=%d cached=%d failed=%d elapsed_ms=%.1f",
+        consent_id,
+        len(pointers),
+        counts["fetched"],
+        counts["cached"],
+        counts["failed"],
+        (time.perf_counter() - started) * 1000,
+    )
+
+
+def _done(consent_id: str, task: asyncio.Task) -> None:
+    if _jobs.get(consent_id) is task:
+        del _jobs[consent_id]
+    if not task.cancelled() and task.exception() is not None:
+        log.warning("consent prefetch %s failed: %s", consent_id, task.exception())
+
+
+async def start(grants: list[tuple[str, str, str]]) -> None:
+    """Queue a prefetch per (consent_id, patient_id, scope). Returns at once."""
+    if not PREFETCH or not fhir_client.FHIR_CACHE_RECORD_VIEWS:
+        return
+    for consent_id, patient_id, scope in grants:
+        task = _jobs[consent_id] = asyncio.create_task(_prefetch(consent_id, patient_id, scope))
+        task.add_done_callback(lambda t, cid=consent_id: _done(cid, t))
+
+
+async def cancel(consent_ids: list[str]) -> None:
+    for consent_id in consent_ids:
+        task = _jobs.pop(consent_id, None)
+        if task is not None:
+            task.cancel()
+
+
+async def aclose() -> None:
+    tasks = list(_jobs.values())
+    _jobs.clear()
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
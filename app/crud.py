@@ -1,10 +1,34 @@
 # app/crud.py
+import csv
+import io
+import os
+import re
+
 from sqlalchemy.orm import Session
-from sqlalchemy import or_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy import or_, and_, insert, update, delete, select, func, distinct, text, RowMapping
 from datetime import datetime
+from collections import Counter
+from typing import Iterable, Iterator
 from .models_providers import PatientProviderSelection
-from .models import User, Patient, ConsentGrant, RecordPointer, AuditLog, generate_public_patient_id
-from .auth import hash_password, verify_password
+from .models import (
+    User,
+    Patient,
+    ConsentGrant,
+    ActiveConsent,
+    RecordPointer,
+    PointerSummary,
+    AuditLog,
+    PatientImportResult,
+    generate_public_patient_id,
+    uuid_str,
+)
+from .auth import hash_password, verify_password, UNUSABLE_PASSWORD
+from .cache import LRUCache
+from . import audit
+
+# Unit of work: crud functions add/flush but never commit. The route commits the
+# request's session once at the end, and get_db rolls it back on error.
 
 
 def normalize_scope(scope: str) -> str:
@@ -28,18 +52,70 @@ def normalize_scope(scope: str) -> str:
     return aliases.get(s, s)
 
 
-def log(db: Session, actor_user_id: str, patient_id: str, action: str, details: str = ""):
-    db.add(AuditLog(actor_user_id=actor_user_id, patient_id=patient_id, action=action, details=details))
-    db.commit()
+# consent scope -> RecordPointer.record_type
+SCOPE_RECORD_TYPES = {
+    "immunizations": "immunization",
+    "allergies": "allergy",
+    "conditions": "condition",
+}
+
+
+def log(
+    db: Session,
+    actor_user_id: str,
+    patient_id: str,
+    action: str,
+    details: str = "",
+    *,
+    data: dict | None = None,
+    strict: bool = False,
+):
+    """
+    Record an audit entry. Prefer structured `data` over free-text `details`
+    so the audit query API can filter on it.
+
+    By default the entry goes to the buffered audit writer and is persisted shortly
+    after the response. strict=True (or AUDIT_MODE=sync) adds it to `db` instead, so it
+    commits atomically with the caller's changes before the caller responds. Entries
+    that record a write should be strict: the buffered writer uses its own session,
+    so its row would survive a failed commit of the write it describes.
+    """
+    if strict or not audit.sink.running:
+        db.add(
+            AuditLog(actor_user_id=actor_user_id, patient_id=patient_id, action=action, details=details, data=data)
+        )
+        return
+
+    audit.sink.submit(
+        {
+            "id": uuid_str(),
+            "actor_user_id": actor_user_id,
+            "patient_id": patient_id,
+            "action": action,
+            "details": details,
+            "data": data,
+            "created_at": datetime.utcnow(),
+        }
+    )
 
 
 def create_user(db: Session, email: str, password: str, role: str) -> User:
-    user = User(email=email, password_hash=hash_password(password), role=role)
+    user = User(id=uuid_str(), email=email, password_hash=hash_password(password), role=role)
     db.add(user)
-    db.commit()
-    db.refresh(user)
-    db.add(AuditLog(actor_user_id=user.id, patient_id="", action="REGISTER", details=email))
-    db.commit()
+    log(db, actor_user_id=user.id, patient_id="", action="REGISTER", data={"email": email}, strict=True)
+    db.flush()
+    return user
+
+
+def create_invited_user(db: Session, email: str, role: str) -> User:
+    """
+    Account without a usable password, for its owner to set through an invite
+    token (clinic_admins, created by `python -m app.maintenance create-clinic-admin`).
+    """
+    user = User(id=uuid_str(), email=email, password_hash=UNUSABLE_PASSWORD, role=role)
+    db.add(user)
+    log(db, actor_user_id=user.id, patient_id="", action="REGISTER", data={"email": email, "role": role}, strict=True)
+    db.flush()
     return user
 
 
@@ -49,8 +125,7 @@ def authenticate(db: Session, email: str, password: str) -> User | None:
         return None
     if not verify_password(password, user.password_hash):
         return None
-    db.add(AuditLog(actor_user_id=user.id, patient_id="", action="LOGIN", details=email))
-    db.commit()
+    log(db, actor_user_id=user.id, patient_id="", action="LOGIN", data={"email": email})
     return user
 
 
@@ -58,55 +133,482 @@ def get_user_by_email(db: Session, email: str) -> User | None:
     return db.query(User).filter(User.email == email).first()
 
 
+def get_users_by_emails(db: Session, emails: list[str]) -> dict[str, User]:
+    """
+    Resolve many users with a single IN query, keyed by email.
+    """
+    if not emails:
+        return {}
+    rows = db.query(User).filter(User.email.in_(set(emails))).all()
+    return {u.email: u for u in rows}
+
+
+def ensure_guardians(db: Session, emails: list[str], created_by_user_id: str) -> tuple[dict[str, User], set[str]]:
+    """
+    Resolve guardian accounts by email, creating the missing ones in one multi-row
+    INSERT. New accounts get an unusable password; no bcrypt work per row, and
+    record created_by_user_id, the clinic_admin allowed to invite them.
+    Returns (users keyed by email, emails that were created). Existing users are
+    returned whatever their role or creator, so the caller can reject accounts
+    that are not guardians or were not created by created_by_user_id.
+    """
+    emails = sorted(set(emails))
+    if not emails:
+        return {}, set()
+    now = datetime.utcnow()
+    stmt = (
+        pg_insert(User)
+        .values(
+            [
+                {
+                    "id": uuid_str(),
+                    "email": e,
+                    "role": "guardian",
+                    "password_hash": UNUSABLE_PASSWORD,
+                    "created_by_user_id": created_by_user_id,
+                    "created_at": now,
+                }
+                for e in emails
+            ]
+        )
+        .on_conflict_do_nothing(index_elements=[User.email])
+        .returning(User.email)
+    )
+    created = set(db.scalars(stmt).all())
+    return get_users_by_emails(db, emails), created
+
+
+_UUID_RE = re.compile(r"[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}")
+
+# public_id -> patients.id. Public ids never change, so entries cannot go stale;
+# a patient deleted since caching is detected by the id lookup coming back empty.
+patient_id_cache = LRUCache(int(os.getenv("PATIENT_ID_CACHE_SIZE", "100000")))
+
+
+def is_internal_patient_id(identifier: str) -> bool:
+    """patients.id values are lowercase UUID strings; anything else is a public_id."""
+    return _UUID_RE.fullmatch(identifier) is not None
+
+
 def get_patient_by_identifier(db: Session, identifier: str) -> Patient | None:
     """
     Accept either internal UUID (patients.id) or human readable patients.public_id.
+    The identifier's shape picks the column, so a lookup is one indexed query.
     """
-    p = db.get(Patient, identifier)
-    if p:
-        return p
-    return db.query(Patient).filter(Patient.public_id == identifier).first()
+    if is_internal_patient_id(identifier):
+        return db.get(Patient, identifier)
+
+    patient_id = patient_id_cache.get(identifier)
+    if patient_id is not None:
+        p = db.get(Patient, patient_id)
+        if p is not None:
+            return p
+        patient_id_cache.pop(identifier)
 
+    p = db.scalars(select(Patient).where(Patient.public_id == identifier)).first()
+    if p is not None:
+        patient_id_cache.set(p.public_id, p.id)
+    return p
 
-def create_patient(db: Session, guardian_user_id: str) -> Patient:
-    # Generate a unique public_id. Retry a few times on collision.
-    for _ in range(10):
-        public_id = generate_public_patient_id()
-        exists = db.query(Patient).filter(Patient.public_id == public_id).first()
-        if not exists:
-            p = Patient(guardian_user_id=guardian_user_id, public_id=public_id)
-            db.add(p)
-            db.commit()
-            db.refresh(p)
-            db.add(
-                AuditLog(
-                    actor_user_id=guardian_user_id,
-                    patient_id=p.id,
-                    action="PATIENT_CREATE",
-                    details=f"public_id={p.public_id}",
-                )
-            )
-            db.commit()
+
+def get_patients_by_identifiers(db: Session, identifiers: list[str]) -> dict[str, Patient]:
+    """
+    Resolve many internal / public ids with at most one IN query per kind,
+    keyed by the identifier as given. Unknown identifiers are left out.
+    """
+    internal = {i for i in identifiers if is_internal_patient_id(i)}
+    public = set(identifiers) - internal
+    found: dict[str, Patient] = {}
+    if internal:
+        for p in db.scalars(select(Patient).where(Patient.id.in_(internal))):
+            found[p.id] = p
+    if public:
+        for p in db.scalars(select(Patient).where(Patient.public_id.in_(public))):
+            found[p.public_id] = p
+            patient_id_cache.set(p.public_id, p.id)
+    return found
+
+
+PUBLIC_ID_ATTEMPTS = 10
+
+
+def allocate_patient(db: Session, *, id_factory=generate_public_patient_id, **fields) -> Patient:
+    """
+    Insert a patient under a fresh public_id. The unique index on public_id is
+    the collision check: INSERT ... ON CONFLICT (public_id) DO NOTHING returns
+    no row on a clash and we retry with a new id. There is no check-then-insert
+    window, and a clash costs one statement without aborting the transaction.
+    """
+    fields.setdefault("id", uuid_str())
+    for _ in range(PUBLIC_ID_ATTEMPTS):
+        stmt = (
+            pg_insert(Patient)
+            .values(public_id=id_factory(), **fields)
+            .on_conflict_do_nothing(index_elements=[Patient.public_id])
+            .returning(Patient)
+        )
+        p = db.scalars(stmt).first()
+        if p is not None:
+            patient_id_cache.set(p.public_id, p.id)
             return p
 
     raise RuntimeError("Failed to generate a unique public patient id")
 
 
+def create_patient(db: Session, guardian_user_id: str) -> Patient:
+    p = allocate_patient(db, guardian_user_id=guardian_user_id)
+    db.add(
+        AuditLog(
+            actor_user_id=guardian_user_id,
+            patient_id=p.id,
+            action="PATIENT_CREATE",
+            data={"patient_public_id": p.public_id},
+        )
+    )
+    db.flush()
+    return p
+
+
+def allocate_patients_bulk(
+    db: Session, rows: list[dict], *, id_factory=generate_public_patient_id
+) -> list[tuple[str, str]]:
+    """
+    Insert many patients with multi-row INSERT ... ON CONFLICT (public_id) DO NOTHING.
+    Rows whose candidate id clashed, with an existing patient or within the batch,
+    get a new id and go again. Every row must carry the same keys.
+    Returns (id, public_id) per input row, in input order.
+    """
+    now = datetime.utcnow()
+    ids = [uuid_str() for _ in rows]
+    pending = [{**r, "id": pid, "created_at": now} for r, pid in zip(rows, ids)]
+    allocated: dict[str, str] = {}
+    for _ in range(PUBLIC_ID_ATTEMPTS):
+        for r in pending:
+            r["public_id"] = id_factory()
+        stmt = (
+            pg_insert(Patient)
+            .values(pending)
+            .on_conflict_do_nothing(index_elements=[Patient.public_id])
+            .returning(Patient.id, Patient.public_id)
+        )
+        allocated.update(db.execute(stmt).all())
+        pending = [r for r in pending if r["id"] not in allocated]
+        if not pending:
+            break
+    else:
+        raise RuntimeError("Failed to generate a unique public patient id")
+
+    return [(pid, allocated[pid]) for pid in ids]
+
+
+# A pointer is identified by what it points at; see uq_record_pointers_resource.
+POINTER_KEY = ("patient_id", "fhir_base_url", "fhir_resource_type", "fhir_resource_id")
+
+
+def pointer_upsert_stmt(values: dict):
+    """INSERT ... ON CONFLICT DO NOTHING RETURNING the new row (none if it already exists)."""
+    return (
+        pg_insert(RecordPointer)
+        .values(**values)
+        .on_conflict_do_nothing(index_elements=list(POINTER_KEY))
+        .returning(RecordPointer)
+    )
+
+
+def pointer_lookup_stmt(values: dict):
+    return select(RecordPointer).where(*(getattr(RecordPointer, k) == values[k] for k in POINTER_KEY))
+
+
+def pointer_summary_bump_stmt(added: dict[tuple[str, str], tuple[int, datetime]]):
+    """
+    Add newly inserted pointers, {(patient_id, record_type): (count, newest created_at)},
+    to pointer_summaries. Run it in the transaction that inserted them.
+    """
+    # Sorted, so concurrent bulk inserts lock summary rows in the same order
+    rows = [
+        {"patient_id": pid, "record_type": rtype, "count": n, "latest_at": latest}
+        for (pid, rtype), (n, latest) in sorted(added.items())
+    ]
+    stmt = pg_insert(PointerSummary).values(rows)
+    return stmt.on_conflict_do_update(
+        index_elements=[PointerSummary.patient_id, PointerSummary.record_type],
+        set_={
+            "count": PointerSummary.count + stmt.excluded.count,
+            "latest_at": func.greatest(PointerSummary.latest_at, stmt.excluded.latest_at),
+        },
+    )
+
+
+def upsert_pointer(db: Session, **values) -> RecordPointer:
+    """
+    Insert a pointer unless the patient already has one for the same FHIR
+    resource; either way return the stored row, so retried POSTs are idempotent.
+    """
+    values.setdefault("id", uuid_str())
+    ptr = db.scalars(pointer_upsert_stmt(values)).first()
+    if ptr is None:
+        return db.scalars(pointer_lookup_stmt(values)).one()
+    db.execute(pointer_summary_bump_stmt({(ptr.patient_id, ptr.record_type): (1, ptr.created_at)}))
+    return ptr
+
+
 def add_pointer(db: Session, patient_id: str, pointer: RecordPointer) -> RecordPointer:
-    db.add(pointer)
-    db.commit()
-    db.refresh(pointer)
-    return pointer
+    """Store `pointer` (transient) for the patient; returns the stored row, which may be an earlier one."""
+    return upsert_pointer(
+        db,
+        patient_id=patient_id,
+        record_type=pointer.record_type,
+        fhir_base_url=pointer.fhir_base_url,
+        fhir_resource_type=pointer.fhir_resource_type,
+        fhir_resource_id=pointer.fhir_resource_id,
+        issuer=pointer.issuer,
+    )
+
+
+POINTER_COPY_COLUMNS = (
+    "id", "patient_id", "record_type", "fhir_base_url", "fhir_resource_type", "fhir_resource_id", "issuer", "created_at",
+)
+
+
+def copy_rows(
+    db: Session, table: str, columns: tuple[str, ...], rows: Iterable[tuple], null_columns: tuple[str, ...] = ()
+) -> None:
+    """
+    COPY rows into `table` on the session's connection, in its transaction.
+    Several times faster than INSERT for large batches. Every field is sent
+    quoted, so '' stays an empty string, except in `null_columns`, where None
+    and '' are both loaded as NULL. Other columns must be non-null.
+    """
+    buf = io.StringIO()
+    csv.writer(buf, quoting=csv.QUOTE_ALL).writerows(rows)
+    buf.seek(0)
+    options = "FORMAT csv"
+    if null_columns:
+        options += f", FORCE_NULL ({', '.join(null_columns)})"
+    cursor = db.connection().connection.cursor()
+    try:
+        cursor.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH ({options})", buf)
+    finally:
+        cursor.close()
+
+
+def add_pointers_bulk(db: Session, rows: list[dict]) -> list[tuple[str, bool]]:
+    """
+    Insert many record pointers (RecordPointer column dicts without id): COPY into
+    a temp staging table, then one INSERT ... SELECT ... ON CONFLICT DO NOTHING.
+    Returns (pointer id, created) per input row in input order. Rows already
+    registered, or repeated within `rows`, get the existing id and created=False.
+    """
+    now = datetime.utcnow()
+    ids = [uuid_str() for _ in rows]
+    cols = ", ".join(POINTER_COPY_COLUMNS)
+    key = ", ".join(POINTER_KEY)
+    db.execute(text("CREATE TEMP TABLE IF NOT EXISTS record_pointers_stage (LIKE record_pointers)"))
+    copy_rows(
+        db,
+        "record_pointers_stage",
+        POINTER_COPY_COLUMNS,
+        (
+            (pid, r["patient_id"], r["record_type"], r["fhir_base_url"], r["fhir_resource_type"],
+             r["fhir_resource_id"], r["issuer"], now)
+            for r, pid in zip(rows, ids)
+        ),
+    )
+    inserted_rows = db.execute(
+        text(
+            f"INSERT INTO record_pointers ({cols}) SELECT {cols} FROM record_pointers_stage "
+            f"ON CONFLICT ({key}) DO NOTHING RETURNING id, patient_id, record_type"
+        )
+    ).all()
+    inserted = {pid for pid, _, _ in inserted_rows}
+    if inserted_rows:
+        added = Counter((patient_id, record_type) for _, patient_id, record_type in inserted_rows)
+        db.execute(pointer_summary_bump_stmt({k: (n, now) for k, n in added.items()}))
+    existing = {}
+    if len(inserted) < len(ids):
+        skipped = [pid for pid in ids if pid not in inserted]
+        existing = dict(
+            db.execute(
+                text(
+                    f"SELECT s.id, p.id FROM record_pointers_stage s JOIN record_pointers p USING ({key}) "
+                    "WHERE s.id = ANY(:skipped)"
+                ),
+                {"skipped": skipped},
+            ).all()
+        )
+    db.execute(text("TRUNCATE record_pointers_stage"))
+    return [(existing.get(pid, pid), pid not in existing) for pid in ids]
+
+
+def dedup_pointers_batch(db: Session, after_patient_id: str, batch_size: int = 1000) -> tuple[str | None, int]:
+    """
+    Delete duplicate pointers (same POINTER_KEY) of the next `batch_size` patients
+    after `after_patient_id`, keeping the oldest of each group.
+    Returns (last patient id of the batch, or None when there are no more; rows deleted).
+    """
+    patient_ids = db.scalars(
+        select(RecordPointer.patient_id)
+        .distinct()
+        .where(RecordPointer.patient_id > after_patient_id)
+        .order_by(RecordPointer.patient_id)
+        .limit(batch_size)
+    ).all()
+    if not patient_ids:
+        return None, 0
+
+    ranked = (
+        select(
+            RecordPointer.id,
+            func.row_number()
+            .over(
+                partition_by=[getattr(RecordPointer, k) for k in POINTER_KEY],
+                order_by=(RecordPointer.created_at, RecordPointer.id),
+            )
+            .label("rn"),
+        )
+        .where(RecordPointer.patient_id.in_(patient_ids))
+        .subquery()
+    )
+    res = db.execute(delete(RecordPointer).where(RecordPointer.id.in_(select(ranked.c.id).where(ranked.c.rn > 1))))
+    if res.rowcount:
+        refresh_pointer_summaries(db, patient_ids)
+    return patient_ids[-1], res.rowcount
+
+
+def refresh_pointer_summaries(db: Session, patient_ids: list[str]) -> int:
+    """Recompute pointer_summaries of these patients from record_pointers. Returns rows written."""
+    db.execute(
+        delete(PointerSummary)
+        .where(PointerSummary.patient_id.in_(patient_ids))
+        .execution_options(synchronize_session=False)
+    )
+    result = db.execute(
+        insert(PointerSummary).from_select(
+            ["patient_id", "record_type", "count", "latest_at"],
+            select(
+                RecordPointer.patient_id,
+                RecordPointer.record_type,
+                func.count(),
+                func.max(RecordPointer.created_at),
+            )
+            .where(RecordPointer.patient_id.in_(patient_ids))
+            .group_by(RecordPointer.patient_id, RecordPointer.record_type),
+        )
+    )
+    return result.rowcount or 0
+
+
+def rebuild_pointer_summaries_batch(db: Session, after_patient_id: str, batch_size: int = 1000) -> tuple[str | None, int]:
+    """
+    Recompute pointer_summaries for the next `batch_size` patients after
+    `after_patient_id` (backfill / repair), one short transaction per batch.
+    Returns (last patient id of the batch, or None when there are no more; rows written).
+    """
+    patient_ids = db.scalars(
+        select(Patient.id).where(Patient.id > after_patient_id).order_by(Patient.id).limit(batch_size)
+    ).all()
+    if not patient_ids:
+        return None, 0
+    return patient_ids[-1], refresh_pointer_summaries(db, list(patient_ids))
+
+
+def get_pointer_summaries(db: Session, patient_ids: list[str]) -> dict[str, dict[str, tuple[int, datetime | None]]]:
+    """{patient_id: {record_type: (count, latest_at)}} from pointer_summaries."""
+    out: dict[str, dict[str, tuple[int, datetime | None]]] = {}
+    if not patient_ids:
+        return out
+    rows = db.execute(
+        select(PointerSummary.patient_id, PointerSummary.record_type, PointerSummary.count, PointerSummary.latest_at)
+        .where(PointerSummary.patient_id.in_(patient_ids))
+    )
+    for pid, rtype, n, latest in rows:
+        out.setdefault(pid, {})[rtype] = (n, latest)
+    return out
 
 
 def grant_consent(db: Session, patient_id: str, grantee_user_id: str, scope: str, expires_at: datetime) -> ConsentGrant:
-    c = ConsentGrant(patient_id=patient_id, grantee_user_id=grantee_user_id, scope=scope, expires_at=expires_at)
+    c = ConsentGrant(
+        id=uuid_str(), patient_id=patient_id, grantee_user_id=grantee_user_id, scope=scope, expires_at=expires_at
+    )
     db.add(c)
-    db.commit()
-    db.refresh(c)
+    db.flush()  # no ORM relationship orders these inserts, so write the parent row first
+    db.add(
+        ActiveConsent(
+            consent_id=c.id, patient_id=patient_id, grantee_user_id=grantee_user_id, scope=scope, expires_at=expires_at
+        )
+    )
+    db.flush()
     return c
 
 
+def grant_consents_bulk(
+    db: Session,
+    patient_id: str,
+    grants: list[tuple[str, str, datetime]],
+) -> list[str]:
+    """
+    Insert many (grantee_user_id, scope, expires_at) grants with one multi-row INSERT.
+    The caller commits it together with its audit row.
+    """
+    now = datetime.utcnow()
+    rows = [
+        {
+            "id": uuid_str(),
+            "patient_id": patient_id,
+            "grantee_user_id": grantee_user_id,
+            "scope": scope,
+            "expires_at": expires_at,
+            "revoked": False,
+            "created_at": now,
+        }
+        for (grantee_user_id, scope, expires_at) in grants
+    ]
+    db.execute(insert(ConsentGrant), rows)
+    db.execute(
+        insert(ActiveConsent),
+        [
+            {
+                "consent_id": r["id"],
+                "patient_id": r["patient_id"],
+                "grantee_user_id": r["grantee_user_id"],
+                "scope": r["scope"],
+                "expires_at": r["expires_at"],
+            }
+            for r in rows
+        ],
+    )
+    return [r["id"] for r in rows]
+
+
+def revoke_consents_bulk(db: Session, patient_id: str, consent_ids: list[str]) -> list[str]:
+    """
+    Revoke the given consents of one patient with a single UPDATE.
+    Returns the ids that were actually flipped (unknown, foreign or already revoked ids are skipped).
+    """
+    if not consent_ids:
+        return []
+    result = db.execute(
+        update(ConsentGrant)
+        .where(ConsentGrant.patient_id == patient_id)
+        .where(ConsentGrant.id.in_(set(consent_ids)))
+        .where(ConsentGrant.revoked == False)  # noqa: E712
+        .values(revoked=True)
+        .returning(ConsentGrant.id)
+    )
+    revoked = [row[0] for row in result]
+    _drop_active_consents(db, revoked)
+    return revoked
+
+
+def _drop_active_consents(db: Session, consent_ids: list[str]) -> None:
+    if consent_ids:
+        db.execute(
+            delete(ActiveConsent)
+            .where(ActiveConsent.consent_id.in_(consent_ids))
+            .execution_options(synchronize_session=False)
+        )
+
+
 def has_valid_consent(db: Session, patient_id: str, doctor_user_id: str, scope: str, now: datetime) -> bool:
     """
     Returns True if doctor has a non-revoked, non-expired consent for:
@@ -115,46 +617,237 @@ def has_valid_consent(db: Session, patient_id: str, doctor_user_id: str, scope:
     """
     scope = normalize_scope(scope)
 
+    # Reads the active_consents projection; the expires_at filter still applies
+    # because grants may lapse between sweeper runs.
     c = (
-        db.query(ConsentGrant)
-        .filter(ConsentGrant.patient_id == patient_id)
-        .filter(ConsentGrant.grantee_user_id == doctor_user_id)
-        .filter(or_(ConsentGrant.scope == scope, ConsentGrant.scope == "all"))
-        .filter(ConsentGrant.expires_at > now)
-        .filter(ConsentGrant.revoked == False)  # noqa: E712
+        db.query(ActiveConsent.consent_id)
+        .filter(ActiveConsent.patient_id == patient_id)
+        .filter(ActiveConsent.grantee_user_id == doctor_user_id)
+        .filter(or_(ActiveConsent.scope == scope, ActiveConsent.scope == "all"))
+        .filter(ActiveConsent.expires_at > now)
         .first()
     )
     return c is not None
 
 
+def _audit_filters(
+    *,
+    patient_id: str | None = None,
+    actor_user_id: str | None = None,
+    action: str | None = None,
+    since: datetime | None = None,
+    until: datetime | None = None,
+    data_contains: dict | None = None,
+    patients_created_by: str | None = None,
+) -> list:
+    conds = []
+    if patient_id is not None:
+        conds.append(AuditLog.patient_id == patient_id)
+    if patients_created_by is not None:
+        created = select(Patient.id).where(Patient.created_by_user_id == patients_created_by)
+        conds.append(AuditLog.patient_id.in_(created))
+    if actor_user_id is not None:
+        conds.append(AuditLog.actor_user_id == actor_user_id)
+    if action is not None:
+        conds.append(AuditLog.action == action)
+    # created_at bounds also prune audit_logs partitions
+    if since is not None:
+        conds.append(AuditLog.created_at >= since)
+    if until is not None:
+        conds.append(AuditLog.created_at < until)
+    if data_contains:
+        conds.append(AuditLog.data.contains(data_contains))
+    return conds
+
+
+def query_audit_logs(
+    db: Session,
+    *,
+    before: tuple[datetime, str] | None = None,
+    limit: int = 50,
+    **filters,
+) -> list[AuditLog]:
+    """
+    Filtered audit events, newest first, keyset-paginated on (created_at, id).
+    Each equality filter pairs with created_at in a composite index.
+    Filters: see _audit_filters.
+    """
+    q = db.query(AuditLog).filter(*_audit_filters(**filters))
+    if before:
+        created_at, log_id = before
+        q = q.filter(
+            or_(
+                AuditLog.created_at < created_at,
+                and_(AuditLog.created_at == created_at, AuditLog.id < log_id),
+            )
+        )
+    return q.order_by(AuditLog.created_at.desc(), AuditLog.id.desc()).limit(limit).all()
+
+
+def stream_audit_logs(db: Session, *, batch_size: int = 1000, **filters) -> Iterator[RowMapping]:
+    """
+    Filtered audit events as plain row mappings, oldest first, fetched through a
+    server-side cursor in batches so exports of any size run in constant memory.
+    """
+    stmt = (
+        select(*AuditLog.__table__.columns)
+        .where(*_audit_filters(**filters))
+        .order_by(AuditLog.created_at, AuditLog.id)
+        .execution_options(yield_per=batch_size)
+    )
+    yield from db.execute(stmt).mappings()
+
+
+def stream_import_results(db: Session, job_id: str, *, batch_size: int = 1000) -> Iterator[RowMapping]:
+    """
+    Per-row results of a patient import job in input order, fetched in batches.
+    """
+    stmt = (
+        select(*PatientImportResult.__table__.columns)
+        .where(PatientImportResult.job_id == job_id)
+        .order_by(PatientImportResult.row)
+        .execution_options(yield_per=batch_size)
+    )
+    yield from db.execute(stmt).mappings()
+
+
 def get_patient_by_user_id(db: Session, user_id: str) -> Patient | None:
     return db.query(Patient).filter(Patient.user_id == user_id).first()
 
 
-def list_consents_for_patient(db: Session, patient_id: str) -> list[tuple[ConsentGrant, User]]:
+def list_consents_for_patient(db: Session, patient_id: str, now: datetime) -> list[tuple[ConsentGrant, User]]:
     """
-    Returns consent rows + grantee user for display.
+    Returns active consent rows + grantee user for display.
+    The full history (revoked / expired) is served by list_consent_history.
     """
     rows = (
         db.query(ConsentGrant, User)
+        .join(ActiveConsent, ActiveConsent.consent_id == ConsentGrant.id)
         .join(User, ConsentGrant.grantee_user_id == User.id)
-        .filter(ConsentGrant.patient_id == patient_id)
+        .filter(ActiveConsent.patient_id == patient_id)
+        .filter(ActiveConsent.expires_at > now)
         .order_by(ConsentGrant.created_at.desc())
         .all()
     )
     return rows
 
 
+def list_consent_history(
+    db: Session,
+    patient_id: str,
+    *,
+    before: tuple[datetime, str] | None = None,
+    limit: int = 50,
+) -> list[tuple[ConsentGrant, User]]:
+    """
+    Full consent history for a patient, newest first.
+    Keyset-paginated on (created_at, id); `before` is the last row of the previous page.
+    """
+    q = (
+        db.query(ConsentGrant, User)
+        .join(User, ConsentGrant.grantee_user_id == User.id)
+        .filter(ConsentGrant.patient_id == patient_id)
+    )
+    if before:
+        created_at, consent_id = before
+        q = q.filter(
+            or_(
+                ConsentGrant.created_at < created_at,
+                and_(ConsentGrant.created_at == created_at, ConsentGrant.id < consent_id),
+            )
+        )
+    return q.order_by(ConsentGrant.created_at.desc(), ConsentGrant.id.desc()).limit(limit).all()
+
+
+def list_patients_for_doctor(
+    db: Session,
+    doctor_user_id: str,
+    now: datetime,
+    *,
+    after_patient_id: str | None = None,
+    limit: int = 50,
+) -> list[tuple[str, str, list[str], datetime]]:
+    """
+    Doctor worklist: patients with at least one live (non-revoked, non-expired) consent
+    for this doctor, as (patient_id, public_id, scopes, soonest_expiry).
+
+    Keyset-paginated on patients.id so each page is a range scan on
+    ix_active_consents_grantee_patient, independent of how many consents exist overall.
+    """
+    q = (
+        db.query(
+            Patient.id,
+            Patient.public_id,
+            func.array_agg(distinct(ActiveConsent.scope)),
+            func.min(ActiveConsent.expires_at),
+        )
+        .join(Patient, ActiveConsent.patient_id == Patient.id)
+        .filter(ActiveConsent.grantee_user_id == doctor_user_id)
+        .filter(ActiveConsent.expires_at > now)
+    )
+    if after_patient_id:
+        q = q.filter(ActiveConsent.patient_id > after_patient_id)
+
+    rows = (
+        q.group_by(Patient.id, Patient.public_id)
+        .order_by(Patient.id)
+        .limit(limit)
+        .all()
+    )
+    return [(pid, public_id, sorted(scopes), soonest) for (pid, public_id, scopes, soonest) in rows]
+
+
 def revoke_consent(db: Session, consent_id: str) -> ConsentGrant | None:
     c = db.query(ConsentGrant).filter(ConsentGrant.id == consent_id).first()
     if not c:
         return None
     c.revoked = True
-    db.commit()
-    db.refresh(c)
+    _drop_active_consents(db, [c.id])
+    db.flush()
     return c
 
 
+def sweep_expired_active_consents(db: Session, now: datetime, batch_size: int) -> int:
+    """
+    Remove up to batch_size lapsed grants from the active_consents projection.
+    The consents table keeps them as history.
+    """
+    batch = (
+        select(ActiveConsent.consent_id)
+        .where(ActiveConsent.expires_at <= now)
+        .limit(batch_size)
+        .scalar_subquery()
+    )
+    result = db.execute(
+        delete(ActiveConsent)
+        .where(ActiveConsent.consent_id.in_(batch))
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount or 0
+
+
+def rebuild_active_consents(db: Session, now: datetime) -> int:
+    """
+    Repopulate active_consents from consents (backfill / repair).
+    """
+    db.execute(delete(ActiveConsent).execution_options(synchronize_session=False))
+    result = db.execute(
+        insert(ActiveConsent).from_select(
+            ["consent_id", "patient_id", "grantee_user_id", "scope", "expires_at"],
+            select(
+                ConsentGrant.id,
+                ConsentGrant.patient_id,
+                ConsentGrant.grantee_user_id,
+                ConsentGrant.scope,
+                ConsentGrant.expires_at,
+            )
+            .where(ConsentGrant.revoked == False)  # noqa: E712
+            .where(ConsentGrant.expires_at > now),
+        )
+    )
+    return result.rowcount or 0
+
+
 def create_pointer_for_patient(
     db: Session,
     *,
@@ -165,7 +858,8 @@ def create_pointer_for_patient(
     fhir_resource_id: str,
     issuer: str,
 ) -> RecordPointer:
-    ptr = RecordPointer(
+    return upsert_pointer(
+        db,
         patient_id=patient_id,
         record_type=record_type,
         fhir_base_url=fhir_base_url,
@@ -173,10 +867,6 @@ def create_pointer_for_patient(
         fhir_resource_id=fhir_resource_id,
         issuer=issuer,
     )
-    db.add(ptr)
-    db.commit()
-    db.refresh(ptr)
-    return ptr
 
 
 def get_provider_selection(db: Session, patient_id: int) -> PatientProviderSelection | None:
@@ -227,8 +917,7 @@ def upsert_provider_selection(
         row.state = state
         row.postal_code = postal_code
 
-    db.commit()
-    db.refresh(row)
+    db.flush()
     return row
 
 
@@ -237,5 +926,5 @@ def clear_provider_selection(db: Session, patient_id: int) -> bool:
     if row is None:
         return False
     db.delete(row)
-    db.commit()
+    db.flush()
     return True
@@ -0,0 +1,216 @@
+# app/crud_async.py
+"""
+AsyncSession variants of the crud helpers used by the `async def` routes.
+Same semantics and unit-of-work contract as crud.py: add/flush only, the route commits.
+"""
+import asyncio
+from datetime import datetime, timezone
+
+from sqlalchemy import select, update, or_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .models import Patient, ConsentGrant, ActiveConsent, RecordPointer, PointerSummary, AuditLog, User, uuid_str
+from .models_hospitals import PatientHospitalSelection
+from .models_providers import PatientProviderSelection
+from .crud import normalize_scope, is_internal_patient_id, patient_id_cache, pointer_upsert_stmt, pointer_lookup_stmt
+from .crud import pointer_summary_bump_stmt
+from . import audit
+
+
+def _naive_utc(dt: datetime) -> datetime:
+    # Columns are naive UTC; asyncpg (unlike psycopg2) refuses aware datetimes for them.
+    if dt.tzinfo is None:
+        return dt
+    return dt.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+async def get_user(db: AsyncSession, user_id: str) -> User | None:
+    return await db.get(User, user_id)
+
+
+async def get_patient_by_identifier(db: AsyncSession, identifier: str) -> Patient | None:
+    """
+    Accept either internal UUID (patients.id) or human readable patients.public_id.
+    Shares crud's shape detection and public_id cache.
+    """
+    if is_internal_patient_id(identifier):
+        return await db.get(Patient, identifier)
+
+    patient_id = patient_id_cache.get(identifier)
+    if patient_id is not None:
+        p = await db.get(Patient, patient_id)
+        if p is not None:
+            return p
+        patient_id_cache.pop(identifier)
+
+    p = (await db.execute(select(Patient).where(Patient.public_id == identifier))).scalars().first()
+    if p is not None:
+        patient_id_cache.set(p.public_id, p.id)
+    return p
+
+
+async def get_patient_by_user_id(db: AsyncSession, user_id: str) -> Patient | None:
+    return (await db.execute(select(Patient).where(Patient.user_id == user_id))).scalars().first()
+
+
+async def get_patient_with_selections(
+    db: AsyncSession, user_id: str
+) -> tuple[Patient, PatientHospitalSelection | None, PatientProviderSelection | None] | None:
+    """The user's own patient profile and its hospital and provider selections, in one query."""
+    row = (
+        await db.execute(
+            select(Patient, PatientHospitalSelection, PatientProviderSelection)
+            .outerjoin(PatientHospitalSelection, PatientHospitalSelection.patient_id == Patient.id)
+            .outerjoin(PatientProviderSelection, PatientProviderSelection.patient_id == Patient.id)
+            .where(Patient.user_id == user_id)
+            .limit(1)
+        )
+    ).first()
+    return tuple(row) if row is not None else None
+
+
+async def list_consents_for_patient(db: AsyncSession, patient_id: str, now: datetime) -> list[tuple[ConsentGrant, str]]:
+    """Live consents with the grantee's email, newest first (crud.list_consents_for_patient)."""
+    rows = await db.execute(
+        select(ConsentGrant, User.email)
+        .join(ActiveConsent, ActiveConsent.consent_id == ConsentGrant.id)
+        .join(User, ConsentGrant.grantee_user_id == User.id)
+        .where(ActiveConsent.patient_id == patient_id)
+        .where(ActiveConsent.expires_at > _naive_utc(now))
+        .order_by(ConsentGrant.created_at.desc())
+    )
+    return [tuple(r) for r in rows]
+
+
+async def get_pointer_summary(db: AsyncSession, patient_id: str) -> dict[str, tuple[int, datetime | None]]:
+    """{record_type: (count, latest_at)} from pointer_summaries."""
+    rows = await db.execute(
+        select(PointerSummary.record_type, PointerSummary.count, PointerSummary.latest_at)
+        .where(PointerSummary.patient_id == patient_id)
+    )
+    return {record_type: (n, latest) for record_type, n, latest in rows}
+
+
+async def has_valid_consent(db: AsyncSession, patient_id: str, doctor_user_id: str, scope: str, now: datetime) -> bool:
+    scope = normalize_scope(scope)
+    row = (
+        await db.execute(
+            select(ActiveConsent.consent_id)
+            .where(ActiveConsent.patient_id == patient_id)
+            .where(ActiveConsent.grantee_user_id == doctor_user_id)
+            .where(or_(ActiveConsent.scope == scope, ActiveConsent.scope == "all"))
+            .where(ActiveConsent.expires_at > _naive_utc(now))
+            .limit(1)
+        )
+    ).first()
+    return row is not None
+
+
+async def list_pointers(db: AsyncSession, patient_id: str, record_type: str) -> list[RecordPointer]:
+    return list(
+        (
+            await db.execute(
+                select(RecordPointer)
+                .where(RecordPointer.patient_id == patient_id)
+                .where(RecordPointer.record_type == record_type)
+            )
+        ).scalars()
+    )
+
+
+async def create_pointer_for_patient(
+    db: AsyncSession,
+    *,
+    patient_id: str,
+    record_type: str,
+    fhir_base_url: str,
+    fhir_resource_type: str,
+    fhir_resource_id: str,
+    issuer: str,
+) -> RecordPointer:
+    values = {
+        "id": uuid_str(),
+        "patient_id": patient_id,
+        "record_type": record_type,
+        "fhir_base_url": fhir_base_url,
+        "fhir_resource_type": fhir_resource_type,
+        "fhir_resource_id": fhir_resource_id,
+        "issuer": issuer,
+    }
+    ptr = (await db.scalars(pointer_upsert_stmt(values))).first()
+    if ptr is None:
+        return (await db.scalars(pointer_lookup_stmt(values))).one()
+    await db.execute(pointer_summary_bump_stmt({(ptr.patient_id, ptr.record_type): (1, ptr.created_at)}))
+    return ptr
+
+
+async def claim_pointers_for_check(
+    db: AsyncSession, now: datetime, stale_before: datetime, limit: int
+) -> list:
+    """
+    Pick up to `limit` pointers never checked or last checked before `stale_before`
+    and stamp last_checked_at=now, so concurrent checkers (other workers) skip them.
+    Returns (id, fhir_base_url, fhir_resource_type, fhir_resource_id) rows.
+    """
+    now, stale_before = _naive_utc(now), _naive_utc(stale_before)
+    due = (
+        select(RecordPointer.id)
+        .where(or_(RecordPointer.last_checked_at.is_(None), RecordPointer.last_checked_at < stale_before))
+        .order_by(RecordPointer.last_checked_at.asc().nulls_first())
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    stmt = (
+        update(RecordPointer)
+        .where(RecordPointer.id.in_(due))
+        .values(last_checked_at=now)
+        .returning(
+            RecordPointer.id,
+            RecordPointer.fhir_base_url,
+            RecordPointer.fhir_resource_type,
+            RecordPointer.fhir_resource_id,
+        )
+        .execution_options(synchronize_session=False)
+    )
+    return list((await db.execute(stmt)).all())
+
+
+async def record_pointer_checks(db: AsyncSession, statuses: list[tuple[str, int]], now: datetime) -> None:
+    """Store (pointer id, upstream status) results with one executemany."""
+    if not statuses:
+        return
+    now = _naive_utc(now)
+    await db.execute(
+        update(RecordPointer),
+        [{"id": pointer_id, "last_status": status, "last_checked_at": now} for pointer_id, status in statuses],
+    )
+
+
+async def log(
+    db: AsyncSession,
+    actor_user_id: str,
+    patient_id: str,
+    action: str,
+    *,
+    data: dict | None = None,
+    strict: bool = False,
+) -> None:
+    """
+    Like crud.log, but never blocks the event loop. strict=True adds the entry to `db`
+    (a primary session) to commit with the caller's changes; otherwise it goes to the
+    buffered writer, or is written from a worker thread if the writer is full or stopped.
+    This keeps read-only routes free to run on a replica session.
+    """
+    row = {
+        "id": uuid_str(),
+        "actor_user_id": actor_user_id,
+        "patient_id": patient_id,
+        "action": action,
+        "details": "",
+        "data": data,
+        "created_at": datetime.utcnow(),
+    }
+    if strict:
+        db.add(AuditLog(**row))
+    elif not (audit.sink.running and audit.sink.offer(row)):
+        await asyncio.to_thread(audit.write_rows, [row])
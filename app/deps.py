@@ -1,28 +1,81 @@
 from fastapi import Depends, HTTPException
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from .db import get_db
+from .db import AsyncSessionLocal, get_db, get_read_db, get_async_db, get_async_read_db
 from .auth import decode_token
 from .models import User
 
 bearer = HTTPBearer()
 
-def get_current_user(
-    creds: HTTPAuthorizationCredentials = Depends(bearer),
-    db: Session = Depends(get_db),
-) -> User:
+def _user_id_from_token(creds: HTTPAuthorizationCredentials) -> str:
     token = creds.credentials
     try:
         payload = decode_token(token)
     except ValueError:
         raise HTTPException(status_code=401, detail="Invalid token")
 
+    if payload.get("purpose"):
+        # e.g. an invite's set-password token; only POST /auth/set-password takes those
+        raise HTTPException(status_code=401, detail="Invalid token")
     user_id = payload.get("sub")
     if not user_id:
         raise HTTPException(status_code=401, detail="Invalid token payload")
+    return user_id
 
-    user = db.get(User, user_id)
+
+def _load_user(db: Session, creds: HTTPAuthorizationCredentials) -> User:
+    user = db.get(User, _user_id_from_token(creds))
     if not user:
         raise HTTPException(status_code=401, detail="User not found")
+    # lets db.py route this caller's next reads to the primary after it writes
+    db.info["user_id"] = user.id
     return user
+
+
+def get_current_user(
+    creds: HTTPAuthorizationCredentials = Depends(bearer),
+    db: Session = Depends(get_db),
+) -> User:
+    return _load_user(db, creds)
+
+
+def get_current_user_read(
+    creds: HTTPAuthorizationCredentials = Depends(bearer),
+    db: Session = Depends(get_read_db),
+) -> User:
+    # For read-only routes: shares the route's (possibly replica) session
+    return _load_user(db, creds)
+
+
+async def _load_user_async(db: AsyncSession, creds: HTTPAuthorizationCredentials) -> User:
+    user = await db.get(User, _user_id_from_token(creds))
+    if not user:
+        raise HTTPException(status_code=401, detail="User not found")
+    db.info["user_id"] = user.id
+    return user
+
+
+async def get_current_user_async(
+    creds: HTTPAuthorizationCredentials = Depends(bearer),
+    db: AsyncSession = Depends(get_async_db),
+) -> User:
+    # For async routes: shares the route's AsyncSession instead of a threadpool hop
+    return await _load_user_async(db, creds)
+
+
+async def get_current_user_async_upload(
+    creds: HTTPAuthorizationCredentials = Depends(bearer),
+) -> User:
+    # For routes that spool a large body first: the lookup's session is closed
+    # before the body is read, so no pool connection waits on the upload
+    async with AsyncSessionLocal() as db:
+        return await _load_user_async(db, creds)
+
+
+async def get_current_user_async_read(
+    creds: HTTPAuthorizationCredentials = Depends(bearer),
+    db: AsyncSession = Depends(get_async_read_db),
+) -> User:
+    return await _load_user_async(db, creds)
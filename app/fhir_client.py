@@ -1,22 +1,92 @@
+import json
+import os
+import time
+
 import httpx
 
-async def fetch_fhir_resource(base_url: str, resource_type: str, resource_id: str):
-    url = f"{base_url.rstrip('/')}/{resource_type}/{resource_id}"
-    async with httpx.AsyncClient(timeout=10.0) as client:
-        r = await client.get(url, headers={"Accept": "application/fhir+json"})
+from .cache import LRUCache
+
+FHIR_TIMEOUT_S = float(os.getenv("FHIR_TIMEOUT_S", "10"))
+FHIR_MAX_CONNECTIONS = int(os.getenv("FHIR_MAX_CONNECTIONS", "100"))
+# Resources fetched recently (by record views or app/consent_prefetch.py) are kept
+# in memory for this long. 0 disables the cache.
+FHIR_CACHE_TTL_S = float(os.getenv("FHIR_CACHE_TTL_S", "60"))
+FHIR_CACHE_SIZE = int(os.getenv("FHIR_CACHE_SIZE", "20000"))
+# Record views are served from the cache (so up to FHIR_CACHE_TTL_S old) only
+# when this is on; otherwise every view fetches from the FHIR server.
+FHIR_CACHE_RECORD_VIEWS = os.getenv("FHIR_CACHE_RECORD_VIEWS", "false").lower() in ("1", "true", "yes", "on")
+
+FHIR_HEADERS = {"Accept": "application/fhir+json"}
+
+# One pooled client per process: keeps upstream connections alive across requests
+# and avoids building a new SSL context for every fetch.
+_client: httpx.AsyncClient | None = None
+
+# resource url -> (fetched_at monotonic, response body); found resources only.
+# Bodies, not parsed resources, so every caller gets its own copy.
+_resources = LRUCache(FHIR_CACHE_SIZE if FHIR_CACHE_TTL_S > 0 else 0)
+
+
+def get_client() -> httpx.AsyncClient:
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            timeout=FHIR_TIMEOUT_S,
+            limits=httpx.Limits(max_connections=FHIR_MAX_CONNECTIONS, max_keepalive_connections=FHIR_MAX_CONNECTIONS),
+        )
+    return _client
+
+
+async def aclose() -> None:
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+def resource_url(base_url: str, resource_type: str, resource_id: str) -> str:
+    return f"{base_url.rstrip('/')}/{resource_type}/{resource_id}"
+
+
+def missing_resource(resource_type: str, resource_id: str, url: str, **extra) -> dict:
+    # structured "missing" response instead of raising
+    return {
+        "resourceType": resource_type,
+        "id": resource_id,
+        "_error": {
+            "status": 404,
+            "message": "Resource not found on FHIR server",
+            "url": url,
+            **extra,
+        },
+    }
+
+
+def cached_resource(url: str) -> dict | None:
+    entry = _resources.get(url)
+    if entry is None or time.monotonic() - entry[0] >= FHIR_CACHE_TTL_S:
+        return None
+    return json.loads(entry[1])
+
+
+async def fetch_fhir_resource(base_url: str, resource_type: str, resource_id: str, *, use_cache: bool | None = None):
+    """
+    Fetch one resource. use_cache (default FHIR_CACHE_RECORD_VIEWS) serves a
+    fresh cached copy instead; what is fetched is cached either way.
+    """
+    url = resource_url(base_url, resource_type, resource_id)
+    if FHIR_CACHE_RECORD_VIEWS if use_cache is None else use_cache:
+        cached = cached_resource(url)
+        if cached is not None:
+            return cached
+    r = await get_client().get(url, headers=FHIR_HEADERS)
 
     if r.status_code == 404:
-        # return a structured "missing" response instead of raising
-        return {
-            "resourceType": resource_type,
-            "id": resource_id,
-            "_error": {
-                "status": 404,
-                "message": "Resource not found on FHIR server",
-                "url": url,
-            },
-        }
+        _resources.pop(url)
+        return missing_resource(resource_type, resource_id, url)
 
     # for other errors, still raise
     r.raise_for_status()
-    return r.json()
+    resource = r.json()
+    _resources.set(url, (time.monotonic(), r.content))
+    return resource
@@ -1,12 +1,48 @@
 # app/init_db.py
 import os
-from .db import engine, Base
+from datetime import datetime, timezone
+from sqlalchemy import inspect
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from .db import engine, Base, SessionLocal
+from . import crud
+from . import audit_partitions
 from . import models_hospitals  # noqa: F401
 from . import models_providers  # noqa: F401
+from . import models_nppes  # noqa: F401
 from .models_providers import PatientProviderSelection  # noqa: F401
+from .models import SchemaBackfill
 
 
 
+def _add_missing_columns():
+    """
+    Additive schema changes for existing tables: columns present on a model but
+    missing in the database are added as nullable columns.
+    """
+    insp = inspect(engine)
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if not insp.has_table(table.name):
+                continue
+            existing = {c["name"] for c in insp.get_columns(table.name)}
+            for col in table.columns:
+                if col.name in existing:
+                    continue
+                col_type = col.type.compile(dialect=engine.dialect)
+                print(f"Adding column {table.name}.{col.name} ({col_type})")
+                conn.exec_driver_sql(f'ALTER TABLE "{table.name}" ADD COLUMN "{col.name}" {col_type}')
+
+
+def _backfilled(name: str) -> bool:
+    with SessionLocal() as db:
+        return db.get(SchemaBackfill, name) is not None
+
+
+def _mark_backfilled(db, name: str) -> None:
+    # ON CONFLICT: workers starting together may both run the backfill
+    db.execute(pg_insert(SchemaBackfill).values(name=name, done_at=datetime.utcnow()).on_conflict_do_nothing())
+
+
 def init_db():
     """
     Creates tables if RUN_DB_INIT=true.
@@ -17,4 +53,60 @@ def init_db():
         return
 
     print("RUN_DB_INIT enabled; running Base.metadata.create_all()...")
+    # A new unique index on an existing table is not created here: it may need
+    # a cleanup of the rows first, and writes rely on it (ON CONFLICT), so it is
+    # built by `python -m app.maintenance` without blocking writes, before this
+    # deploy. Checked before anything is created, so a refused start leaves the
+    # schema as it found it.
+    insp = inspect(engine)
+    existing_tables = set(insp.get_table_names())
+    missing_unique = []
+    for table in Base.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        present = {ix["name"] for ix in insp.get_indexes(table.name)}
+        missing_unique += [ix.name for ix in table.indexes if ix.unique and ix.name not in present]
+    if missing_unique:
+        raise RuntimeError(
+            f"Missing unique indexes {', '.join(missing_unique)}; "
+            "run `python -m app.maintenance dedup-pointers` before starting this version."
+        )
+
     Base.metadata.create_all(bind=engine)
+
+    _add_missing_columns()
+
+    # create_all skips tables that already exist, including their indexes,
+    # so indexes added to models later are created here for older databases.
+    insp = inspect(engine)
+    for table in Base.metadata.sorted_tables:
+        present = {ix["name"] for ix in insp.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in present:
+                index.create(bind=engine, checkfirst=True)
+
+    with engine.connect() as conn:
+        audit_partitioned = audit_partitions.is_partitioned(conn)
+    if audit_partitioned:
+        audit_partitions.ensure_partitions()
+    else:
+        print("audit_logs is not partitioned; run `python -m app.maintenance partition-audit-logs` to convert it.")
+
+    # Projections of existing data: filled when their table is new, and again
+    # on the next start if a start stopped before finishing.
+    if "active_consents" not in existing_tables or not _backfilled("active_consents"):
+        db = SessionLocal()
+        try:
+            n = crud.rebuild_active_consents(db, datetime.now(timezone.utc))
+            _mark_backfilled(db, "active_consents")
+            db.commit()
+        finally:
+            db.close()
+        print(f"Backfilled active_consents with {n} live grants.")
+
+    if "pointer_summaries" not in existing_tables or not _backfilled("pointer_summaries"):
+        from .maintenance import rebuild_pointer_summaries
+        rebuild_pointer_summaries()
+        with SessionLocal() as db:
+            _mark_backfilled(db, "pointer_summaries")
+            db.commit()
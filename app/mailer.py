@@ -0,0 +1,38 @@
+# app/mailer.py
+"""
+Outgoing email over SMTP, for messages that must reach the account owner
+directly rather than through an API caller (set-password invites).
+
+Sending is off while SMTP_HOST is unset; callers check configured() first.
+"""
+import os
+import smtplib
+import ssl
+from email.message import EmailMessage
+
+SMTP_HOST = os.getenv("SMTP_HOST", "")
+SMTP_PORT = int(os.getenv("SMTP_PORT", "587"))
+SMTP_USER = os.getenv("SMTP_USER", "")
+SMTP_PASSWORD = os.getenv("SMTP_PASSWORD", "")
+SMTP_STARTTLS = os.getenv("SMTP_STARTTLS", "true").lower() in ("1", "true", "yes", "on")
+SMTP_TIMEOUT_S = float(os.getenv("SMTP_TIMEOUT_S", "10"))
+MAIL_FROM = os.getenv("MAIL_FROM", "no-reply@localhost")
+
+
+def configured() -> bool:
+    return bool(SMTP_HOST)
+
+
+def send(to: str, subject: str, body: str) -> None:
+    """Send a plain-text message. Raises smtplib.SMTPException / OSError on failure."""
+    msg = EmailMessage()
+    msg["From"] = MAIL_FROM
+    msg["To"] = to
+    msg["Subject"] = subject
+    msg.set_content(body)
+    with smtplib.SMTP(SMTP_HOST, SMTP_PORT, timeout=SMTP_TIMEOUT_S) as smtp:
+        if SMTP_STARTTLS:
+            smtp.starttls(context=ssl.create_default_context())
+        if SMTP_USER:
+            smtp.login(SMTP_USER, SMTP_PASSWORD)
+        smtp.send_message(msg)
@@ -1,9 +1,14 @@
 # app/main.py
 import os
+import asyncio
+import logging
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 from .init_db import init_db
+from .db import pool_status
+from .tasks import start_background_tasks, stop_background_tasks
+from . import audit, consent_prefetch, fhir_client, npi_autocomplete, npi_registry
 
 # Routers
 from .routes_auth import router as auth_router
@@ -14,12 +19,15 @@ from .routes_hospitals_cms import router as hospitals_router
 from .routes_hospitals_select import router as hospitals_select_router
 from .routes_providers_cms import router as providers_cms_router
 from .routes_providers_select import router as providers_select_router
+from .routes_audit import router as audit_router
 
 
 
 # ✅ NEW: mock FHIR router
 from .routes_fhir import router as fhir_router
 
+logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO").upper())
+
 app = FastAPI(title="ViviSys API")
 
 # ---- CORS ----
@@ -47,6 +55,7 @@ app.include_router(hospitals_select_router)
 app.include_router(providers_cms_router)
 app.include_router(providers_select_router)
 app.include_router(providers_cms_router)
+app.include_router(audit_router)
 
 
 # ✅ NEW: serve /fhir inside this same API
@@ -57,6 +66,29 @@ app.include_router(fhir_router)
 def health():
     return {"ok": True}
 
+
+@app.get("/metrics/db")
+def db_metrics():
+    # Pool usage and checkout wait times per engine (this worker process only)
+    return pool_status()
+
 @app.on_event("startup")
 def _startup():
     init_db()
+
+
+@app.on_event("startup")
+async def _start_background():
+    audit.start()
+    npi_autocomplete.build_in_background()
+    start_background_tasks()
+
+
+@app.on_event("shutdown")
+async def _shutdown():
+    await stop_background_tasks()
+    await consent_prefetch.aclose()
+    await fhir_client.aclose()
+    await npi_registry.aclose()
+    # Flush buffered audit entries before the process exits.
+    await asyncio.to_thread(audit.stop)
@@ -0,0 +1,196 @@
+# app/maintenance.py
+"""
+Operational one-off commands:
+
+    python -m app.maintenance create-clinic-admin <email>
+    python -m app.maintenance rebuild-active-consents
+    python -m app.maintenance sweep-consents
+    python -m app.maintenance partition-audit-logs
+    python -m app.maintenance audit-retention
+    python -m app.maintenance replay-audit-spill
+    python -m app.maintenance dedup-pointers
+    python -m app.maintenance rebuild-pointer-summaries
+    python -m app.maintenance check-pointers
+    python -m app.maintenance nppes-import <NPPES full file .zip|.csv>
+    python -m app.maintenance nppes-update <NPPES weekly file .zip|.csv>
+    python -m app.maintenance zip-centroids-import <Census Gazetteer ZCTA file .zip|.txt>
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import time
+from datetime import datetime, timezone
+
+from sqlalchemy.exc import IntegrityError
+
+from .db import SessionLocal, engine
+from . import crud
+from . import security
+from . import tasks
+from . import audit
+from . import audit_partitions
+from . import fhir_client
+from . import pointer_health
+from . import nppes_mirror
+from . import zip_geo
+
+
+def create_clinic_admin(email: str) -> None:
+    db = SessionLocal()
+    try:
+        if crud.get_user_by_email(db, email):
+            raise SystemExit(f"{email} is already registered")
+        user = crud.create_invited_user(db, email, "clinic_admin")
+        db.commit()
+    finally:
+        db.close()
+    token, expires_at = security.create_invite_token(user.id)
+    print(f"clinic_admin {email} created; redeem at POST /auth/set-password before {expires_at:%Y-%m-%d %H:%M} UTC:")
+    print(token)
+
+
+def rebuild_active_consents() -> None:
+    db = SessionLocal()
+    try:
+        n = crud.rebuild_active_consents(db, datetime.now(timezone.utc))
+        db.commit()
+    finally:
+        db.close()
+    print(f"active_consents rebuilt: {n} live grants")
+
+
+def sweep_consents() -> None:
+    n = tasks.sweep_expired_consents()
+    print(f"swept {n} expired grants")
+
+
+def partition_audit_logs() -> None:
+    n = audit_partitions.migrate_to_partitioned()
+    print(f"audit_logs partitioned; {n} rows copied")
+
+
+def audit_retention() -> None:
+    created = audit_partitions.ensure_partitions()
+    archived = audit_partitions.archive_expired_partitions()
+    print(f"created {len(created)} partitions; archived {len(archived)}: {', '.join(archived) or '-'}")
+
+
+def _dedup_pointers_pass(batch_size: int) -> int:
+    after, deleted = "", 0
+    while True:
+        db = SessionLocal()
+        try:
+            last, n = crud.dedup_pointers_batch(db, after, batch_size)
+            db.commit()
+        finally:
+            db.close()
+        if last is None:
+            return deleted
+        after, deleted = last, deleted + n
+        print(f"... through patient {after}: {deleted} duplicates deleted")
+
+
+def replay_audit_spill() -> None:
+    n = audit.replay_spill()
+    print(f"replayed {n} spilled audit rows")
+
+
+def dedup_pointers(batch_size: int = 1000, attempts: int = 3) -> None:
+    """
+    One-time migration for uq_record_pointers_resource: delete duplicate pointers
+    patient batch by patient batch (one short transaction each), then build the
+    unique index without blocking writes. Duplicates written meanwhile by older
+    app instances fail the build; the invalid index is dropped and the pass repeated.
+    """
+    started = time.perf_counter()
+    name = "uq_record_pointers_resource"
+    ddl = f"CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS {name} ON record_pointers ({', '.join(crud.POINTER_KEY)})"
+    deleted = 0
+    for _ in range(attempts):
+        deleted += _dedup_pointers_pass(batch_size)
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            try:
+                conn.exec_driver_sql(ddl)
+                break
+            except IntegrityError:
+                conn.exec_driver_sql(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+    else:
+        raise SystemExit(f"dedup-pointers: duplicates keep appearing; {name} not created")
+    print(f"dedup-pointers: {deleted} duplicates deleted, {name} in place ({time.perf_counter() - started:.1f}s)")
+
+
+def rebuild_pointer_summaries(batch_size: int = 1000) -> None:
+    """Recompute pointer_summaries from record_pointers, patient batch by patient batch."""
+    after, written = "", 0
+    while True:
+        db = SessionLocal()
+        try:
+            last, n = crud.rebuild_pointer_summaries_batch(db, after, batch_size)
+            db.commit()
+        finally:
+            db.close()
+        if last is None:
+            break
+        after, written = last, written + n
+    print(f"pointer_summaries rebuilt: {written} rows")
+
+
+def check_pointers() -> None:
+    async def _run() -> int:
+        try:
+            return await pointer_health.check_pointers()
+        finally:
+            await fhir_client.aclose()
+
+    n = asyncio.run(_run())
+    print(f"checked {n} pointers")
+
+
+def _nppes_load(path: str, kind: str) -> None:
+    load = nppes_mirror.load_file(path, kind)
+    print(
+        f"nppes {kind} load of {load.file_name}: {load.rows_read} rows, "
+        f"{load.upserted} upserted, {load.removed} removed"
+    )
+
+
+def nppes_import(path: str) -> None:
+    _nppes_load(path, "full")
+
+
+def nppes_update(path: str) -> None:
+    _nppes_load(path, "weekly")
+
+
+def zip_centroids_import(path: str) -> None:
+    n = zip_geo.import_centroids(path)
+    print(f"zip centroids imported: {n}")
+
+
+COMMANDS = {
+    "create-clinic-admin": create_clinic_admin,
+    "rebuild-active-consents": rebuild_active_consents,
+    "sweep-consents": sweep_consents,
+    "partition-audit-logs": partition_audit_logs,
+    "audit-retention": audit_retention,
+    "replay-audit-spill": replay_audit_spill,
+    "dedup-pointers": dedup_pointers,
+    "rebuild-pointer-summaries": rebuild_pointer_summaries,
+    "check-pointers": check_pointers,
+    "nppes-import": nppes_import,
+    "nppes-update": nppes_update,
+    "zip-centroids-import": zip_centroids_import,
+}
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m app.maintenance")
+    parser.add_argument("command", choices=sorted(COMMANDS))
+    parser.add_argument("args", nargs="*", help="command arguments, e.g. the file for nppes-import")
+    args = parser.parse_args(argv)
+    COMMANDS[args.command](*args.args)
+
+
+if __name__ == "__main__":
+    main()
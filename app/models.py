@@ -1,4 +1,5 @@
-from sqlalchemy import String, DateTime, Boolean, ForeignKey, Text, Date
+from sqlalchemy import String, DateTime, Boolean, ForeignKey, Text, Date, Index, Integer, text
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import Mapped, mapped_column
 from sqlalchemy import Date
 from typing import Optional
@@ -31,6 +32,8 @@ class User(Base):
     email: Mapped[str] = mapped_column(String, unique=True, index=True)
     role: Mapped[str] = mapped_column(String)  # "doctor" | "guardian" | "clinic_admin"
     password_hash: Mapped[str] = mapped_column(String)
+    # clinic_admin whose patient import created the account; only they can invite it
+    created_by_user_id: Mapped[str | None] = mapped_column(String, ForeignKey("users.id"), nullable=True)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
 
 
@@ -52,11 +55,20 @@ class Patient(Base):
 
     date_of_birth: Mapped[date | None] = mapped_column(Date, nullable=True)
 
+    # clinic_admin whose import created the patient; scopes that admin's audit access
+    created_by_user_id: Mapped[str | None] = mapped_column(
+        String, ForeignKey("users.id"), index=True, nullable=True
+    )
+
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
 
 
 class ConsentGrant(Base):
     __tablename__ = "consents"
+    __table_args__ = (
+        # Paginated consent history per patient, newest first.
+        Index("ix_consents_patient_created", "patient_id", "created_at"),
+    )
     id: Mapped[str] = mapped_column(String, primary_key=True, default=uuid_str)
     patient_id: Mapped[str] = mapped_column(String, ForeignKey("patients.id"), index=True)
     grantee_user_id: Mapped[str] = mapped_column(String, ForeignKey("users.id"), index=True)  # doctor
@@ -66,8 +78,47 @@ class ConsentGrant(Base):
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
 
 
+class ActiveConsent(Base):
+    """
+    Projection of live consents (non-revoked, not yet swept as expired).
+    Written alongside ConsentGrant on grant, deleted on revoke and by the expiry sweeper,
+    so consent checks and the doctor worklist never scan the full consent history.
+    """
+    __tablename__ = "active_consents"
+    __table_args__ = (
+        # Consent checks: (patient, doctor) -> scopes
+        Index("ix_active_consents_patient_grantee", "patient_id", "grantee_user_id", "scope"),
+        # Doctor worklist: live grants for one grantee, walked in patient_id order.
+        Index(
+            "ix_active_consents_grantee_patient",
+            "grantee_user_id",
+            "patient_id",
+            "expires_at",
+            postgresql_include=["scope"],
+        ),
+    )
+    consent_id: Mapped[str] = mapped_column(String, ForeignKey("consents.id"), primary_key=True)
+    patient_id: Mapped[str] = mapped_column(String, ForeignKey("patients.id"))
+    grantee_user_id: Mapped[str] = mapped_column(String, ForeignKey("users.id"))
+    scope: Mapped[str] = mapped_column(String)
+    expires_at: Mapped[datetime] = mapped_column(DateTime, index=True)
+
+
 class RecordPointer(Base):
     __tablename__ = "record_pointers"
+    __table_args__ = (
+        # One pointer per upstream resource and patient; writers upsert against this.
+        Index(
+            "uq_record_pointers_resource",
+            "patient_id",
+            "fhir_base_url",
+            "fhir_resource_type",
+            "fhir_resource_id",
+            unique=True,
+        ),
+        # Health checker: never-checked pointers first, then the longest unchecked.
+        Index("ix_record_pointers_last_checked", text("last_checked_at NULLS FIRST")),
+    )
     id: Mapped[str] = mapped_column(String, primary_key=True, default=uuid_str)
     patient_id: Mapped[str] = mapped_column(String, ForeignKey("patients.id"), index=True)
     record_type: Mapped[str] = mapped_column(String)  # "immunization" | "allergy" | "condition"
@@ -77,12 +128,86 @@ class RecordPointer(Base):
     issuer: Mapped[str] = mapped_column(String)              # hospital/clinic name
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
 
+    # Written by the pointer health checker (app/pointer_health.py).
+    # last_status: upstream HTTP status, 0 when the server could not be reached.
+    last_checked_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+    last_status: Mapped[int | None] = mapped_column(Integer, nullable=True)
+
+
+class PointerSummary(Base):
+    """
+    Pointer count and newest pointer per (patient, record_type). Bumped in the same
+    transaction as every pointer insert (crud.pointer_summary_bump_stmt), so
+    dashboards and worklists show counts without reading record_pointers.
+    `python -m app.maintenance rebuild-pointer-summaries` repopulates it.
+    """
+    __tablename__ = "pointer_summaries"
+    patient_id: Mapped[str] = mapped_column(String, ForeignKey("patients.id"), primary_key=True)
+    record_type: Mapped[str] = mapped_column(String, primary_key=True)
+    count: Mapped[int] = mapped_column(Integer, default=0)
+    latest_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)  # created_at of the newest pointer
+
 
 class AuditLog(Base):
     __tablename__ = "audit_logs"
+    __table_args__ = (
+        # Audit queries are "events for X, newest first" over a time range.
+        Index("ix_audit_logs_patient_created", "patient_id", "created_at"),
+        Index("ix_audit_logs_actor_created", "actor_user_id", "created_at"),
+        Index("ix_audit_logs_action_created", "action", "created_at"),
+        # Containment filters on structured details, e.g. data @> '{"scope": "allergies"}'
+        Index("ix_audit_logs_data", "data", postgresql_using="gin", postgresql_ops={"data": "jsonb_path_ops"}),
+        # Monthly range partitions are managed by app/audit_partitions.py.
+        {"postgresql_partition_by": "RANGE (created_at)"},
+    )
+    # The partition key must be part of the primary key.
     id: Mapped[str] = mapped_column(String, primary_key=True, default=uuid_str)
-    actor_user_id: Mapped[str] = mapped_column(String, index=True)
-    patient_id: Mapped[str] = mapped_column(String, index=True)
+    actor_user_id: Mapped[str] = mapped_column(String)
+    patient_id: Mapped[str] = mapped_column(String)
     action: Mapped[str] = mapped_column(String)  # "REGISTER" | "LOGIN" | "PATIENT_CREATE" | "CONSENT_GRANT" | "RECORD_VIEW"
-    details: Mapped[str] = mapped_column(Text, default="")
+    details: Mapped[str] = mapped_column(Text, default="")  # legacy free text; new entries use `data`
+    data: Mapped[dict | None] = mapped_column(JSONB, nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime, primary_key=True, default=datetime.utcnow)
+
+
+class PatientImportJob(Base):
+    """
+    A clinic_admin bulk patient import (app/patient_import.py). Progress counters
+    are updated after every committed batch, so the job can be polled from any worker.
+    """
+    __tablename__ = "patient_import_jobs"
+    id: Mapped[str] = mapped_column(String, primary_key=True, default=uuid_str)
+    actor_user_id: Mapped[str] = mapped_column(String, ForeignKey("users.id"), index=True)
+    format: Mapped[str] = mapped_column(String)  # "csv" | "ndjson"
+    status: Mapped[str] = mapped_column(String, default="queued")  # "queued" | "running" | "done" | "failed"
+    rows_processed: Mapped[int] = mapped_column(Integer, default=0)
+    patients_created: Mapped[int] = mapped_column(Integer, default=0)
+    guardians_created: Mapped[int] = mapped_column(Integer, default=0)
+    errors: Mapped[int] = mapped_column(Integer, default=0)
+    error: Mapped[str | None] = mapped_column(Text, nullable=True)  # set when the whole job failed
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    finished_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+
+
+class PatientImportResult(Base):
+    """One row per input row of an import job, in input order."""
+    __tablename__ = "patient_import_results"
+    job_id: Mapped[str] = mapped_column(String, ForeignKey("patient_import_jobs.id"), primary_key=True)
+    row: Mapped[int] = mapped_column(Integer, primary_key=True)  # 1-based data row
+    status: Mapped[str] = mapped_column(String)  # "created" | "error"
+    external_id: Mapped[str | None] = mapped_column(String, nullable=True)  # caller's own row key, echoed back
+    patient_id: Mapped[str | None] = mapped_column(String, nullable=True)
+    patient_public_id: Mapped[str | None] = mapped_column(String, nullable=True)
+    guardian_user_id: Mapped[str | None] = mapped_column(String, nullable=True)
+    error: Mapped[str | None] = mapped_column(Text, nullable=True)
+
+
+class SchemaBackfill(Base):
+    """
+    Backfills init_db has finished, by name. A backfill runs on every start until
+    its row is here, so a start that failed before or during it is picked up again.
+    """
+    __tablename__ = "schema_backfills"
+    name: Mapped[str] = mapped_column(String, primary_key=True)
+    done_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
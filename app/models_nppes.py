@@ -0,0 +1,74 @@
+from sqlalchemy import String, DateTime, Date, Float, Index, Integer, Text, text
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import Mapped, mapped_column
+from datetime import datetime, date
+
+from .db import Base
+from .models import uuid_str
+
+
+class NppesProvider(Base):
+    """
+    Local mirror of the NPPES NPI file (app/nppes_mirror.py): one row per active
+    NPI with its practice location. Deactivated NPIs are removed.
+    """
+    __tablename__ = "nppes_providers"
+    __table_args__ = (
+        # Name searches are case-insensitive prefix matches ordered by name. The
+        # "C" collation lets one btree serve both LIKE 'PREFIX%' and the ORDER BY.
+        Index("ix_nppes_providers_org_name", text('upper(organization_name) COLLATE "C"')),
+        Index("ix_nppes_providers_person_name", text('upper(last_name) COLLATE "C"'), text('upper(first_name) COLLATE "C"')),
+        Index("ix_nppes_providers_first_name", text('upper(first_name) COLLATE "C"')),
+        Index("ix_nppes_providers_location", "state", text("upper(city)")),
+        Index("ix_nppes_providers_postal_code", text('postal_code COLLATE "C"')),
+        # Proximity search looks providers up by 5-digit ZIP (app/zip_geo.py)
+        Index("ix_nppes_providers_zip5", text("left(postal_code, 5)")),
+    )
+    npi: Mapped[str] = mapped_column(String, primary_key=True)
+    enumeration_type: Mapped[str] = mapped_column(String)  # "NPI-1" (individual) | "NPI-2" (organization)
+    organization_name: Mapped[str | None] = mapped_column(String, nullable=True)
+    last_name: Mapped[str | None] = mapped_column(String, nullable=True)
+    first_name: Mapped[str | None] = mapped_column(String, nullable=True)
+    middle_name: Mapped[str | None] = mapped_column(String, nullable=True)
+    credential: Mapped[str | None] = mapped_column(String, nullable=True)
+
+    # Business practice location
+    address_1: Mapped[str | None] = mapped_column(String, nullable=True)
+    address_2: Mapped[str | None] = mapped_column(String, nullable=True)
+    city: Mapped[str | None] = mapped_column(String, nullable=True)
+    state: Mapped[str | None] = mapped_column(String, nullable=True)
+    postal_code: Mapped[str | None] = mapped_column(String, nullable=True)  # 5 or 9 digits
+    country_code: Mapped[str | None] = mapped_column(String, nullable=True)
+    telephone_number: Mapped[str | None] = mapped_column(String, nullable=True)
+
+    # [{"code", "primary", "state", "license"}], in file order
+    taxonomies: Mapped[list | None] = mapped_column(JSONB, nullable=True)
+    enumeration_date: Mapped[date | None] = mapped_column(Date, nullable=True)
+    last_updated: Mapped[date | None] = mapped_column(Date, nullable=True)
+    loaded_at: Mapped[datetime] = mapped_column(DateTime)  # start of the load that last wrote the row
+
+
+class NppesLoad(Base):
+    """One run of `python -m app.maintenance nppes-import|nppes-update`."""
+    __tablename__ = "nppes_loads"
+    id: Mapped[str] = mapped_column(String, primary_key=True, default=uuid_str)
+    kind: Mapped[str] = mapped_column(String)  # "full" | "weekly"
+    file_name: Mapped[str] = mapped_column(String)
+    status: Mapped[str] = mapped_column(String, default="running")  # "running" | "done" | "failed"
+    rows_read: Mapped[int] = mapped_column(Integer, default=0)
+    upserted: Mapped[int] = mapped_column(Integer, default=0)
+    removed: Mapped[int] = mapped_column(Integer, default=0)
+    error: Mapped[str | None] = mapped_column(Text, nullable=True)
+    started_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    finished_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+
+
+class ZipCentroid(Base):
+    """
+    ZIP code (ZCTA) centroids from the Census Gazetteer file, for proximity search.
+    Loaded with `python -m app.maintenance zip-centroids-import`.
+    """
+    __tablename__ = "zip_centroids"
+    zip: Mapped[str] = mapped_column(String, primary_key=True)  # 5 digits
+    lat: Mapped[float] = mapped_column(Float)
+    lon: Mapped[float] = mapped_column(Float)
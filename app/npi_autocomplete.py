@@ -0,0 +1,314 @@
+# app/npi_autocomplete.py
+"""
+In-memory type-ahead index over hospital (NPI-2) and provider (NPI-1) names,
+for GET /hospitals/cms/autocomplete and /providers/cms/autocomplete.
+
+Two indexes per enumeration type are searched together: one built from the
+local NPPES mirror (app/nppes_mirror.py), when it has been loaded, and a small
+one over the records the NPI Registry API has returned to this process (the
+last AUTOCOMPLETE_SEEN_SIZE of them). refresh() runs in the background; it
+re-reads the mirror only after a new load, and otherwise just rebuilds the small
+index from memory when new API results came in. Each worker process has its own
+copy, built in a background thread at startup (build_in_background()); until
+then the routes answer 503.
+AUTOCOMPLETE_STATES (comma-separated) limits the mirror rows indexed, to bound
+memory on the full national file.
+
+Lookups are prefix matches on any word of the name ("mem" finds NORTHWESTERN
+MEMORIAL HOSPITAL) over sorted arrays, with keys grouped by state, so a state
+filter is one binary search. When the query matches nothing, unknown words are
+replaced by their closest indexed word by trigram similarity (typo fallback).
+"""
+from __future__ import annotations
+
+import logging
+import os
+import re
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter
+from dataclasses import dataclass
+from heapq import nsmallest
+from typing import Any, Dict, Iterable
+
+from sqlalchemy import func, select
+
+from .cache import LRUCache
+from .db import ReadSessionLocal
+from .models_nppes import NppesLoad, NppesProvider
+from .npi_records import pick_location, provider_name
+
+log = logging.getLogger(__name__)
+
+SEEN_SIZE = int(os.getenv("AUTOCOMPLETE_SEEN_SIZE", "50000"))
+STATES = [s.strip().upper() for s in os.getenv("AUTOCOMPLETE_STATES", "").split(",") if s.strip()]
+MAX_CANDIDATES = int(os.getenv("AUTOCOMPLETE_MAX_CANDIDATES", "2000"))
+MIN_SIMILARITY = 0.35
+
+_SEP = "\x00"  # state / name separator in keys; sorts before any name character
+_WORD_RE = re.compile(r"[A-Z0-9]+")
+
+
+@dataclass(frozen=True, slots=True)
+class Entry:
+    npi: str
+    name: str
+    city: str | None
+    state: str | None
+
+
+def normalize(name: str) -> str:
+    return " ".join(_WORD_RE.findall(name.upper()))
+
+
+def _trigrams(word: str) -> set[str]:
+    padded = f"${word}$"
+    return {padded[i : i + 3] for i in range(len(padded) - 2)}
+
+
+class NameIndex:
+    """Immutable; built once from a list of entries."""
+
+    def __init__(self, entries: Iterable[Entry]):
+        self.entries: list[Entry] = list(entries)
+        keyed: list[tuple[str, int]] = []
+        words: set[str] = set()
+        for i, e in enumerate(self.entries):
+            tokens = normalize(e.name).split()
+            words.update(tokens)
+            state = e.state or ""
+            # One key per word start, so a prefix of any word matches
+            for pos in range(len(tokens)):
+                keyed.append((f"{state}{_SEP}{' '.join(tokens[pos:])}", i * 2 + (pos == 0)))
+        keyed.sort()
+        self.keys = [k for k, _ in keyed]
+        # entry index * 2 + 1 when the key starts at the first word of the name
+        self.refs = [r for _, r in keyed]
+        self.states = sorted({k.split(_SEP, 1)[0] for k in self.keys})
+
+        self.vocab = sorted(words)
+        self.vocab_grams = [len(_trigrams(w)) for w in self.vocab]
+        self.gram_postings: dict[str, list[int]] = {}
+        for wi, w in enumerate(self.vocab):
+            for g in _trigrams(w):
+                self.gram_postings.setdefault(g, []).append(wi)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def _scan(self, state: str, prefix: str, limit: int) -> list[int]:
+        lo = f"{state}{_SEP}{prefix}"
+        i = bisect_left(self.keys, lo)
+        out = []
+        while i < len(self.keys) and len(out) < limit and self.keys[i].startswith(lo):
+            out.append(self.refs[i])
+            i += 1
+        return out
+
+    def _closest_word(self, word: str, prefix: bool) -> str | None:
+        i = bisect_left(self.vocab, word)
+        if i < len(self.vocab) and (self.vocab[i] == word or (prefix and self.vocab[i].startswith(word))):
+            return word
+        grams = _trigrams(word)
+        shared = Counter(wi for g in grams for wi in self.gram_postings.get(g, ()))
+        best, best_sim = None, MIN_SIMILARITY
+        for wi, n in shared.items():
+            sim = n / (len(grams) + self.vocab_grams[wi] - n)
+            if sim > best_sim:
+                best, best_sim = self.vocab[wi], sim
+        return best
+
+    def _candidates(self, prefix: str, state: str | None) -> list[int]:
+        # At most MAX_CANDIDATES per state, from every state: keys are in state then
+        # name order, so stopping at a total would rank only the first states.
+        states = [state] if state else self.states
+        return [ref for s in states for ref in self._scan(s, prefix, MAX_CANDIDATES)]
+
+    def matches(
+        self, q: str, limit: int, state: str | None = None, city: str | None = None
+    ) -> tuple[list[tuple[tuple, Entry]], bool]:
+        """
+        Top `limit` (rank key, entry) pairs for the prefix `q`, best first, and
+        whether the typo fallback was used. Entries in `state` rank first, then
+        those in `city`, then matches on the first word of the name, then shorter names.
+        """
+        prefix = normalize(q)
+        if not prefix:
+            return [], False
+        state = state.upper() if state else None
+        city = normalize(city) if city else None
+
+        fuzzy = False
+        refs = self._candidates(prefix, state) if state else []
+        if len(refs) < limit:
+            refs += self._candidates(prefix, None)
+        if not refs:
+            words = prefix.split()
+            corrected = [self._closest_word(w, prefix=(i == len(words) - 1)) for i, w in enumerate(words)]
+            if all(corrected) and corrected != words:
+                fuzzy = True
+                prefix = " ".join(corrected)
+                refs = self._candidates(prefix, None)
+
+        best: dict[int, int] = {}
+        for ref in refs:
+            i, first_word = ref >> 1, ref & 1
+            best[i] = max(best.get(i, 0), first_word)
+
+        ranked = []
+        for i, first_word in best.items():
+            e = self.entries[i]
+            key = (
+                state is not None and e.state != state,
+                city is not None and normalize(e.city or "") != city,
+                not first_word,
+                len(e.name),
+                e.name,
+            )
+            ranked.append((key, e))
+        return nsmallest(limit, ranked, key=lambda item: item[0]), fuzzy
+
+    def search(self, q: str, limit: int, state: str | None = None, city: str | None = None) -> tuple[list[Entry], bool]:
+        """Top `limit` entries for the prefix `q` (see matches()), and whether the typo fallback was used."""
+        ranked, fuzzy = self.matches(q, limit, state=state, city=city)
+        return [e for _, e in ranked], fuzzy
+
+
+# ---- Sources and refresh ----
+
+_mirror_indexes: dict[str, NameIndex] = {"NPI-1": NameIndex([]), "NPI-2": NameIndex([])}
+_seen_indexes: dict[str, NameIndex] = {"NPI-1": NameIndex([]), "NPI-2": NameIndex([])}
+_seen = LRUCache(SEEN_SIZE)  # npi -> (enumeration_type, Entry) from NPI Registry API results
+_seen_version = 0
+_mirror_built_from: Any = None
+_seen_built_from: int | None = None
+_built = False
+_refresh_lock = threading.Lock()
+
+
+def _entry_from_api(r: Dict[str, Any]) -> tuple[str, Entry] | None:
+    basic = r.get("basic") or {}
+    enumeration_type = r.get("enumeration_type")
+    if enumeration_type == "NPI-2":
+        name = basic.get("organization_name") or basic.get("name")
+    elif enumeration_type == "NPI-1":
+        name = provider_name(basic.get("first_name"), basic.get("middle_name"), basic.get("last_name"), basic.get("credential"))
+    else:
+        return None
+    loc = pick_location(r.get("addresses") or [])
+    if not name or not r.get("number"):
+        return None
+    return enumeration_type, Entry(str(r["number"]), name, loc.get("city"), loc.get("state"))
+
+
+def remember(results: Iterable[Dict[str, Any]]) -> None:
+    """Add NPI Registry API results to the next build of the seen-results index."""
+    global _seen_version
+    for r in results:
+        item = _entry_from_api(r)
+        if item is not None:
+            _seen.set(item[1].npi, item)
+            _seen_version += 1
+
+
+def _mirror_entries() -> Iterable[tuple[str, Entry]]:
+    q = select(
+        NppesProvider.npi,
+        NppesProvider.enumeration_type,
+        NppesProvider.organization_name,
+        NppesProvider.first_name,
+        NppesProvider.middle_name,
+        NppesProvider.last_name,
+        NppesProvider.credential,
+        NppesProvider.city,
+        NppesProvider.state,
+    )
+    if STATES:
+        q = q.where(NppesProvider.state.in_(STATES))
+    with ReadSessionLocal() as db:
+        for npi, etype, org, first, middle, last, cred, city, state in db.execute(q.execution_options(yield_per=10000)):
+            name = org if etype == "NPI-2" else provider_name(first, middle, last, cred)
+            if name:
+                yield etype, Entry(npi, name, city, state)
+
+
+def _mirror_version() -> Any:
+    with ReadSessionLocal() as db:
+        return db.scalar(select(func.max(NppesLoad.finished_at)).where(NppesLoad.status == "done"))
+
+
+def _build(entries: Iterable[tuple[str, Entry]]) -> dict[str, NameIndex]:
+    by_type: dict[str, dict[str, Entry]] = {"NPI-1": {}, "NPI-2": {}}
+    for etype, e in entries:
+        by_type[etype][e.npi] = e
+    return {etype: NameIndex(by_npi.values()) for etype, by_npi in by_type.items()}
+
+
+def refresh(force: bool = False) -> bool:
+    """
+    Rebuild the mirror index if a new mirror load finished, and the seen-results
+    index if API results came in since its last build. Returns whether either was rebuilt.
+    """
+    global _mirror_indexes, _seen_indexes, _mirror_built_from, _seen_built_from, _built
+    with _refresh_lock:
+        rebuilt = False
+        mirror_version = _mirror_version()
+        if force or not _built or mirror_version != _mirror_built_from:
+            started = time.perf_counter()
+            _mirror_indexes = _build(_mirror_entries()) if mirror_version is not None else _build([])
+            _mirror_built_from = mirror_version
+            rebuilt = True
+            log.info(
+                "npi autocomplete mirror index built: providers=%d organizations=%d elapsed_ms=%.1f",
+                len(_mirror_indexes["NPI-1"]),
+                len(_mirror_indexes["NPI-2"]),
+                (time.perf_counter() - started) * 1000,
+            )
+        seen_version = _seen_version
+        if force or seen_version != _seen_built_from:
+            _seen_indexes = _build(_seen.values())
+            _seen_built_from = seen_version
+            rebuilt = True
+        _built = True
+        return rebuilt
+
+
+def built() -> bool:
+    return _built
+
+
+def build_in_background() -> None:
+    """First build off the request path; the periodic refresh job keeps it current."""
+
+    def _run() -> None:
+        try:
+            refresh()
+        except Exception:
+            log.exception("npi autocomplete build failed")
+
+    threading.Thread(target=_run, name="autocomplete-build", daemon=True).start()
+
+
+def search(enumeration_type: str, q: str, limit: int, state: str | None = None, city: str | None = None) -> Dict[str, Any]:
+    started = time.perf_counter()
+    found = [
+        ix.matches(q, limit, state=state, city=city)
+        for ix in (_mirror_indexes[enumeration_type], _seen_indexes[enumeration_type])
+    ]
+    # Typo-corrected matches only when neither index matched the query as typed
+    if any(ranked and not fuzzy for ranked, fuzzy in found):
+        found = [(ranked, fuzzy) for ranked, fuzzy in found if not fuzzy]
+    fuzzy = any(fuzzy for ranked, fuzzy in found if ranked)
+    # The mirror's entry wins when both indexes return an NPI
+    merged: dict[str, tuple[tuple, Entry]] = {}
+    for ranked, _ in found:
+        for key, e in ranked:
+            merged.setdefault(e.npi, (key, e))
+    entries = [e for _, e in sorted(merged.values(), key=lambda item: item[0])[:limit]]
+    return {
+        "source": "autocomplete_index",
+        "fuzzy": fuzzy,
+        "took_ms": round((time.perf_counter() - started) * 1000, 3),
+        "results": [{"npi": e.npi, "name": e.name, "city": e.city, "state": e.state} for e in entries],
+    }
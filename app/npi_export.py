@@ -0,0 +1,159 @@
+# app/npi_export.py
+"""
+Complete result sets for CMS searches, past the NPI Registry API's page caps
+(limit <= 200, skip <= 1000, so at most 1200 results per query), for
+GET /hospitals/cms/export and GET /providers/cms/export.
+
+A query's six pages are requested concurrently. When the last one comes back
+full the query was cut off, so it is split into ten narrower queries by the
+next digit of the postal code (postal_code=606*, 6060*, ...), which run the same
+way, down to 5-digit ZIPs. A query the API rejects as too broad (state alone)
+is split the same way, starting from two digits, the shortest wildcard NPPES
+accepts. All requests of one export share NPI_EXPORT_CONCURRENCY slots, the
+requests of all exports in the process go out at most NPI_EXPORT_RPS per
+second together, and results stream as pages arrive,
+each NPI once. With NPI_SOURCE=mirror the set is read from the local NPPES
+mirror in one pass instead.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import time
+from collections import Counter
+from typing import Any, AsyncIterator, Dict, List
+
+import httpx
+
+from .pointer_health import HostRateLimiter
+from . import npi_registry, nppes_mirror
+
+log = logging.getLogger(__name__)
+
+EXPORT_CONCURRENCY = int(os.getenv("NPI_EXPORT_CONCURRENCY", "4"))
+EXPORT_RPS = float(os.getenv("NPI_EXPORT_RPS", "5"))
+EXPORT_ATTEMPTS = 3
+PAGE_LIMIT = 200
+MAX_SKIP = 1000
+ZIP_DIGITS = 5
+DIGITS = "0123456789"
+
+# shared by every export in this process, so concurrent exports do not add up
+_limiter = HostRateLimiter(EXPORT_RPS)
+
+
+class _Export:
+    def __init__(self) -> None:
+        # pages of results; bounded so a slow reader holds back the fetching
+        self.out: asyncio.Queue = asyncio.Queue(maxsize=EXPORT_CONCURRENCY * 2)
+        self.sem = asyncio.Semaphore(EXPORT_CONCURRENCY)
+        self.stats: Counter = Counter()
+        self.truncated: List[str] = []
+        self.errors: List[str] = []
+
+    async def _page(self, params: Dict[str, Any], skip: int) -> Dict[str, Any] | None:
+        for attempt in range(1, EXPORT_ATTEMPTS + 1):
+            async with self.sem:
+                await _limiter.wait("npi_registry")
+                self.stats["requests"] += 1
+                try:
+                    return await npi_registry.fetch_page({**params, "limit": PAGE_LIMIT, "skip": skip})
+                except httpx.HTTPError as e:
+                    if attempt == EXPORT_ATTEMPTS:
+                        self.errors.append(f"postal_code={params.get('postal_code') or '*'} skip={skip}: {e or type(e).__name__}")
+                        return None
+            await asyncio.sleep(0.5 * attempt)
+        return None
+
+    async def run(self, params: Dict[str, Any]) -> None:
+        prefix = (params.get("postal_code") or "").rstrip("*")
+        first = await self._page(params, 0)
+        if first is None:
+            return
+        if first.get("Errors"):
+            if prefix:
+                self.errors.append(f"postal_code={prefix}*: {first['Errors']}")
+                return
+            await self._split(params, [a + b for a in DIGITS for b in DIGITS])
+            return
+        await self.out.put(first.get("results") or [])
+        if len(first.get("results") or []) < PAGE_LIMIT:
+            return
+
+        pages = await asyncio.gather(*(self._page(params, skip) for skip in range(PAGE_LIMIT, MAX_SKIP + 1, PAGE_LIMIT)))
+        for data in pages:
+            if data is not None:
+                await self.out.put(data.get("results") or [])
+        last = pages[-1]
+        if last is None or len(last.get("results") or []) < PAGE_LIMIT:
+            return
+        if len(prefix) >= ZIP_DIGITS:
+            self.truncated.append(prefix)
+            return
+        await self._split(params, [prefix + d for d in DIGITS] if prefix else [a + b for a in DIGITS for b in DIGITS])
+
+    async def _split(self, params: Dict[str, Any], prefixes: List[str]) -> None:
+        self.stats["splits"] += 1
+        await asyncio.gather(*(self.run({**params, "postal_code": f"{p}*"}) for p in prefixes))
+
+
+async def export(params: Dict[str, Any]) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Every API result for `params` (NPI Registry query parameters, without
+    limit/skip), each NPI once, then a final {"summary": {...}} item.
+    """
+    started = time.perf_counter()
+    if npi_registry.NPI_SOURCE == "mirror":
+        n = 0
+        async for r in nppes_mirror.iter_all(params):
+            n += 1
+            yield r
+        yield {"summary": {"source": "mirror", "results": n, "elapsed_s": round(time.perf_counter() - started, 3)}}
+        return
+
+    job = _Export()
+    done = object()
+
+    async def _run() -> None:
+        try:
+            await job.run(params)
+        except Exception as e:
+            log.exception("npi export failed")
+            job.errors.append(str(e) or type(e).__name__)
+        await job.out.put(done)
+
+    seen: set[str] = set()
+    duplicates = 0
+    task = asyncio.create_task(_run())
+    try:
+        while (page := await job.out.get()) is not done:
+            for r in page:
+                npi = str(r.get("number"))
+                if npi in seen:
+                    duplicates += 1
+                    continue
+                seen.add(npi)
+                yield r
+    finally:
+        # Also when the client goes away mid-stream: stop fetching
+        task.cancel()
+
+    elapsed = time.perf_counter() - started
+    log.info(
+        "npi export: results=%d requests=%d splits=%d truncated=%d errors=%d elapsed_ms=%.1f",
+        len(seen), job.stats["requests"], job.stats["splits"], len(job.truncated), len(job.errors), elapsed * 1000,
+    )
+    yield {
+        "summary": {
+            "source": "cms_npi_registry",
+            "results": len(seen),
+            "duplicates": duplicates,
+            "requests": job.stats["requests"],
+            "splits": job.stats["splits"],
+            # 5-digit ZIPs that alone still match more than 1200 results
+            "truncated": job.truncated,
+            "errors": job.errors,
+            "elapsed_s": round(elapsed, 3),
+        }
+    }
@@ -0,0 +1,97 @@
+# app/npi_records.py
+"""
+NPI Registry result normalization shared by the CMS search routes.
+
+normalize() turns one API result (NPI-1 or NPI-2, from the CMS API or the
+local mirror) into the flat record the UI uses. Every output field is one
+entry of FIELDS, so a request can ask for just the fields it renders
+(?fields=npi,name,address) and nothing else is computed or sent.
+"""
+from __future__ import annotations
+
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from fastapi import HTTPException
+
+
+def provider_name(first: str | None, middle: str | None, last: str | None, credential: str | None) -> str:
+    name = " ".join(p for p in (first, middle, last) if p)
+    return f"{name}, {credential}" if credential else name
+
+
+def pick_location(addresses: List[Dict[str, Any]]) -> Dict[str, Any]:
+    # NPPES returns a practice LOCATION and a MAILING address; prefer the former
+    by_purpose = {(a.get("address_purpose") or "").upper(): a for a in addresses}
+    return by_purpose.get("LOCATION") or by_purpose.get("MAILING") or (addresses[0] if addresses else {})
+
+
+def _name(r: Dict[str, Any]) -> str:
+    basic = r.get("basic") or {}
+    if r.get("enumeration_type") == "NPI-1":
+        name = provider_name(basic.get("first_name"), basic.get("middle_name"), basic.get("last_name"), basic.get("credential"))
+        return name or basic.get("name") or "—"
+    return (
+        basic.get("organization_name")
+        or basic.get("name")
+        or basic.get("authorized_official_organization_name")
+        or "Unknown"
+    )
+
+
+def _address(r: Dict[str, Any]) -> Dict[str, Any]:
+    loc = pick_location(r.get("addresses") or [])
+    return {
+        "line1": loc.get("address_1"),
+        "line2": loc.get("address_2"),
+        "city": loc.get("city"),
+        "state": loc.get("state"),
+        "postal_code": loc.get("postal_code"),
+        "country_code": loc.get("country_code"),
+        "telephone_number": loc.get("telephone_number"),
+    }
+
+
+def _taxonomy(t: Dict[str, Any]) -> Dict[str, Any]:
+    return {"code": t.get("code"), "desc": t.get("desc"), "primary": bool(t.get("primary"))}
+
+
+def _primary_taxonomy(r: Dict[str, Any]) -> Dict[str, Any]:
+    tax = r.get("taxonomies") or []
+    return _taxonomy(next((t for t in tax if t.get("primary")), None) or (tax[0] if tax else {}))
+
+
+# output field -> how to compute it from an API result
+FIELDS: Dict[str, Callable[[Dict[str, Any]], Any]] = {
+    "npi": lambda r: r.get("number"),
+    "name": _name,
+    "enumeration_type": lambda r: r.get("enumeration_type"),
+    "status": lambda r: (r.get("basic") or {}).get("status"),
+    "last_updated": lambda r: (r.get("basic") or {}).get("last_updated"),
+    "address": _address,
+    "taxonomy": _primary_taxonomy,
+    "taxonomies": lambda r: [_taxonomy(t) for t in r.get("taxonomies") or []],
+    "raw": lambda r: r,
+    # only set by proximity search (near=)
+    "distance_km": lambda r: r.get("distance_km"),
+}
+
+HOSPITAL_FIELDS = ("npi", "name", "enumeration_type", "status", "last_updated", "address", "taxonomies")
+PROVIDER_FIELDS = ("npi", "name", "status", "last_updated", "address", "taxonomy")
+LOOKUP_FIELDS = ("npi", "name", "enumeration_type", "status", "last_updated", "address", "taxonomy")
+
+
+def parse_fields(fields: Optional[str], default: Iterable[str], include_raw: bool, near: bool = False) -> List[str]:
+    """The `fields=` query parameter (comma-separated) as a list, 400 on unknown names."""
+    selected = [f.strip() for f in fields.split(",") if f.strip()] if fields else list(default)
+    unknown = [f for f in selected if f not in FIELDS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields {unknown}; available: {sorted(FIELDS)}")
+    if include_raw and "raw" not in selected:
+        selected.append("raw")
+    if near and not fields:
+        selected.append("distance_km")
+    return selected
+
+
+def normalize(r: Dict[str, Any], fields: List[str]) -> Dict[str, Any]:
+    return {f: FIELDS[f](r) for f in fields}
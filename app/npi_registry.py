@@ -0,0 +1,196 @@
+# app/npi_registry.py
+"""
+Client for the CMS NPPES NPI Registry API, used by /hospitals/cms/search and
+/providers/cms/search.
+
+Searches go through one pooled httpx client and an in-process cache keyed by
+the normalized query parameters. An entry is served as-is for NPI_CACHE_TTL_S;
+for another NPI_CACHE_STALE_S it is still served, and a background refresh is
+started (stale-while-revalidate). Concurrent identical searches that miss the
+cache share one upstream request. Failed requests are not cached.
+
+NPI_REGISTRY_URL points the client at a local stand-in for testing.
+NPI_SOURCE=mirror serves searches from the local NPPES mirror
+(app/nppes_mirror.py) instead, without going through this cache.
+
+lookup() resolves many NPIs at once: from the records of recent responses
+first, then one cached by-number search per remaining NPI, at most
+NPI_LOOKUP_CONCURRENCY in flight. fetch_page() is a single uncached request,
+for exports that walk every page of a query.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import time
+from collections import Counter
+from typing import Any, Dict, Hashable, List, Tuple
+
+import httpx
+
+from .cache import LRUCache
+from . import npi_autocomplete, nppes_mirror
+
+log = logging.getLogger(__name__)
+
+NPI_SOURCE = os.getenv("NPI_SOURCE", "registry")  # "registry" | "mirror"
+API_VERSION = "2.1"
+NPI_REGISTRY_URL = os.getenv("NPI_REGISTRY_URL", "https://npiregistry.cms.hhs.gov/api/")
+NPI_TIMEOUT_S = float(os.getenv("NPI_TIMEOUT_S", "10"))
+NPI_MAX_CONNECTIONS = int(os.getenv("NPI_MAX_CONNECTIONS", "20"))
+NPI_CACHE_TTL_S = float(os.getenv("NPI_CACHE_TTL_S", str(6 * 3600)))
+NPI_CACHE_STALE_S = float(os.getenv("NPI_CACHE_STALE_S", str(7 * 24 * 3600)))
+NPI_CACHE_SIZE = int(os.getenv("NPI_CACHE_SIZE", "10000"))
+NPI_RECORD_CACHE_SIZE = int(os.getenv("NPI_RECORD_CACHE_SIZE", "50000"))
+NPI_LOOKUP_CONCURRENCY = int(os.getenv("NPI_LOOKUP_CONCURRENCY", "10"))
+
+# key -> (fetched_at monotonic, response body)
+_cache = LRUCache(NPI_CACHE_SIZE)
+# npi -> (fetched_at monotonic, API result) from every response
+_records = LRUCache(NPI_RECORD_CACHE_SIZE)
+# key -> upstream request in flight; awaited by every caller with that key
+_inflight: dict[Hashable, asyncio.Task] = {}
+stats: Counter = Counter()
+
+_client: httpx.AsyncClient | None = None
+
+
+def get_client() -> httpx.AsyncClient:
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            timeout=httpx.Timeout(NPI_TIMEOUT_S, connect=5.0),
+            limits=httpx.Limits(max_connections=NPI_MAX_CONNECTIONS, max_keepalive_connections=NPI_MAX_CONNECTIONS),
+        )
+    return _client
+
+
+async def aclose() -> None:
+    global _client
+    for task in list(_inflight.values()):
+        task.cancel()
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+def cache_key(params: Dict[str, Any]) -> tuple:
+    # NPPES matching is case-insensitive and ignores empty parameters
+    return tuple(
+        sorted(
+            (k, " ".join(str(v).split()).lower())
+            for k, v in params.items()
+            if v is not None and str(v).strip() != ""
+        )
+    )
+
+
+async def _fetch(key: tuple, params: Dict[str, Any]) -> Dict[str, Any]:
+    try:
+        stats["upstream"] += 1
+        r = await get_client().get(NPI_REGISTRY_URL, params=params)
+        r.raise_for_status()
+        data = r.json()
+        now = time.monotonic()
+        _cache.set(key, (now, data))
+        for rec in data.get("results") or []:
+            if rec.get("number"):
+                _records.set(str(rec["number"]), (now, rec))
+        npi_autocomplete.remember(data.get("results") or [])
+        return data
+    finally:
+        _inflight.pop(key, None)
+
+
+async def fetch_page(params: Dict[str, Any]) -> Dict[str, Any]:
+    """One upstream request, bypassing the cache (bulk exports, app/npi_export.py)."""
+    stats["upstream"] += 1
+    r = await get_client().get(NPI_REGISTRY_URL, params=params)
+    r.raise_for_status()
+    return r.json()
+
+
+def _start_fetch(key: tuple, params: Dict[str, Any]) -> asyncio.Task:
+    task = _inflight.get(key)
+    if task is None:
+        task = _inflight[key] = asyncio.create_task(_fetch(key, params))
+        task.add_done_callback(_log_failure)
+    return task
+
+
+def _log_failure(task: asyncio.Task) -> None:
+    # Also retrieves the exception when no caller is left waiting for it
+    if not task.cancelled() and task.exception() is not None:
+        stats["failed"] += 1
+        log.warning("NPI registry request failed: %s", task.exception())
+
+
+def source() -> str:
+    """The backend NPI_SOURCE sends searches and lookups to, as reported in responses."""
+    return "mirror" if NPI_SOURCE == "mirror" else "cms_npi_registry"
+
+
+async def search(params: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    NPI Registry response body for `params`.
+    Raises httpx.HTTPError when it has to go upstream and that fails.
+    """
+    if NPI_SOURCE == "mirror":
+        return await nppes_mirror.search(params)
+    key = cache_key(params)
+    entry = _cache.get(key)
+    if entry is not None:
+        age = time.monotonic() - entry[0]
+        if age < NPI_CACHE_TTL_S:
+            stats["hit"] += 1
+            return entry[1]
+        if age < NPI_CACHE_TTL_S + NPI_CACHE_STALE_S:
+            stats["stale"] += 1
+            _start_fetch(key, params)
+            return entry[1]
+    stats["miss"] += 1
+    # shield: a caller that disconnects does not cancel the request others wait on
+    return await asyncio.shield(_start_fetch(key, params))
+
+
+async def lookup(npis: List[str]) -> Tuple[Dict[str, Dict[str, Any] | None], Dict[str, str]]:
+    """
+    API result per NPI (None when the registry does not know it), and the error
+    for each NPI whose upstream request failed (those are left out of the first).
+    """
+    npis = list(dict.fromkeys(npis))
+    if NPI_SOURCE == "mirror":
+        return await nppes_mirror.lookup(npis), {}
+
+    found: Dict[str, Dict[str, Any] | None] = {}
+    errors: Dict[str, str] = {}
+    now = time.monotonic()
+    missing = []
+    for npi in npis:
+        entry = _records.get(npi)
+        if entry is not None and now - entry[0] < NPI_CACHE_TTL_S:
+            stats["record_hit"] += 1
+            found[npi] = entry[1]
+        else:
+            missing.append(npi)
+
+    sem = asyncio.Semaphore(NPI_LOOKUP_CONCURRENCY)
+
+    async def fetch_one(npi: str) -> None:
+        async with sem:
+            try:
+                data = await search({"version": API_VERSION, "number": npi})
+            except httpx.HTTPError as e:
+                errors[npi] = str(e) or type(e).__name__
+                return
+        found[npi] = next((r for r in data.get("results") or [] if str(r.get("number")) == npi), None)
+
+    await asyncio.gather(*(fetch_one(npi) for npi in missing))
+    return {npi: found.get(npi) for npi in npis if npi not in errors}, errors
+
+
+def clear() -> None:
+    _records.clear()
+    _cache.clear()
+    stats.clear()
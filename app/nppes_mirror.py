@@ -0,0 +1,377 @@
+# app/nppes_mirror.py
+"""
+Local mirror of the NPPES NPI registry, so CMS searches do not depend on the
+remote API at request time.
+
+CMS publishes the full NPI file monthly and a delta file weekly, as zip archives
+with an npidata_pfile_*.csv inside (https://download.cms.gov/nppes/NPI_Files.html):
+
+    python -m app.maintenance nppes-import NPPES_Data_Dissemination_October_2026.zip
+    python -m app.maintenance nppes-update NPPES_Data_Dissemination_101226_101826_Weekly.zip
+
+Both stream the CSV straight out of the archive (or a plain .csv) in batches of
+NPPES_LOAD_BATCH_SIZE rows. Each batch is COPYed into a staging table and
+upserted by NPI in one transaction. Rows without an entity type are deactivated
+NPIs and get deleted. Once the whole file is in, a full import also deletes every
+NPI it did not see.
+
+With NPI_SOURCE=mirror, npi_registry.search() answers from here instead of the
+CMS API (see search() for the matching rules).
+"""
+from __future__ import annotations
+
+import csv
+import io
+import json
+import logging
+import os
+import re
+import time
+import zipfile
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, Iterator, List, TextIO, Tuple
+
+from sqlalchemy import String, bindparam, delete, func, select, text, update
+from sqlalchemy.dialects.postgresql import ARRAY
+
+from .db import AsyncReadSessionLocal, SessionLocal
+from .models_nppes import NppesLoad, NppesProvider
+from . import crud
+
+log = logging.getLogger(__name__)
+
+BATCH_SIZE = int(os.getenv("NPPES_LOAD_BATCH_SIZE", "20000"))
+NEAR_ZIP_BATCH = int(os.getenv("NPPES_NEAR_ZIP_BATCH", "200"))
+
+# nppes_providers column -> NPPES file header
+FILE_COLUMNS = {
+    "npi": "NPI",
+    "enumeration_type": "Entity Type Code",
+    "organization_name": "Provider Organization Name (Legal Business Name)",
+    "last_name": "Provider Last Name (Legal Name)",
+    "first_name": "Provider First Name",
+    "middle_name": "Provider Middle Name",
+    "credential": "Provider Credential Text",
+    "address_1": "Provider First Line Business Practice Location Address",
+    "address_2": "Provider Second Line Business Practice Location Address",
+    "city": "Provider Business Practice Location Address City Name",
+    "state": "Provider Business Practice Location Address State Name",
+    "postal_code": "Provider Business Practice Location Address Postal Code",
+    "country_code": "Provider Business Practice Location Address Country Code (If outside U.S.)",
+    "telephone_number": "Provider Business Practice Location Address Telephone Number",
+    "enumeration_date": "Provider Enumeration Date",
+    "last_updated": "Last Update Date",
+}
+TAXONOMY_SLOTS = 15
+ENTITY_TYPES = {"1": "NPI-1", "2": "NPI-2"}
+DATE_COLUMNS = ("enumeration_date", "last_updated")
+
+STAGE = "nppes_providers_stage"
+COPY_COLUMNS = (*FILE_COLUMNS, "taxonomies", "loaded_at")
+NULL_COLUMNS = tuple(c for c in COPY_COLUMNS if c not in ("npi", "enumeration_type", "loaded_at"))
+
+_NPI_MEMBER_RE = re.compile(r"^npidata_pfile_.*(?<!_fileheader)\.csv$", re.IGNORECASE)
+
+
+@contextmanager
+def open_npi_csv(path: str) -> Iterator[TextIO]:
+    """The npidata_pfile CSV of an NPPES archive, or `path` itself if it is not a zip."""
+    if not zipfile.is_zipfile(path):
+        with open(path, newline="", encoding="utf-8", errors="replace") as f:
+            yield f
+        return
+    with zipfile.ZipFile(path) as zf:
+        members = [n for n in zf.namelist() if _NPI_MEMBER_RE.match(os.path.basename(n))]
+        if len(members) != 1:
+            raise ValueError(f"{path}: expected one npidata_pfile_*.csv, found {members or 'none'}")
+        with zf.open(members[0]) as raw:
+            yield io.TextIOWrapper(raw, encoding="utf-8", errors="replace", newline="")
+
+
+def _iso_date(value: str) -> str | None:
+    # NPPES dates are MM/DD/YYYY
+    if not value:
+        return None
+    month, day, year = value.split("/")
+    return f"{year}-{month}-{day}"
+
+
+def read_npi_rows(f: TextIO, loaded_at: datetime) -> Iterator[tuple[str, tuple | None]]:
+    """
+    Yield (npi, COPY_COLUMNS row) per record of an NPPES file, or (npi, None)
+    for a deactivated NPI.
+    """
+    reader = csv.reader(f)
+    header = {name: i for i, name in enumerate(next(reader))}
+    missing = [h for h in FILE_COLUMNS.values() if h not in header]
+    if missing:
+        raise ValueError(f"not an NPPES npidata file, missing columns: {missing}")
+    fields = [(col, header[h]) for col, h in FILE_COLUMNS.items()]
+    taxonomy_fields = [
+        (
+            header[f"Healthcare Provider Taxonomy Code_{i}"],
+            header.get(f"Healthcare Provider Primary Taxonomy Switch_{i}"),
+            header.get(f"Provider License Number State Code_{i}"),
+            header.get(f"Provider License Number_{i}"),
+        )
+        for i in range(1, TAXONOMY_SLOTS + 1)
+        if f"Healthcare Provider Taxonomy Code_{i}" in header
+    ]
+    npi_i, type_i = header[FILE_COLUMNS["npi"]], header[FILE_COLUMNS["enumeration_type"]]
+
+    for rec in reader:
+        if not rec:
+            continue
+        enumeration_type = ENTITY_TYPES.get(rec[type_i])
+        if enumeration_type is None:
+            yield rec[npi_i], None
+            continue
+        row = {col: rec[i].strip() or None for col, i in fields}
+        row["enumeration_type"] = enumeration_type
+        for col in DATE_COLUMNS:
+            row[col] = _iso_date(row[col])
+        taxonomies = [
+            {
+                "code": rec[code_i],
+                "primary": primary_i is not None and rec[primary_i] == "Y",
+                "state": rec[state_i] or None if state_i is not None else None,
+                "license": rec[license_i] or None if license_i is not None else None,
+            }
+            for code_i, primary_i, state_i, license_i in taxonomy_fields
+            if rec[code_i]
+        ]
+        row["taxonomies"] = json.dumps(taxonomies) if taxonomies else None
+        row["loaded_at"] = loaded_at
+        yield rec[npi_i], tuple(row[c] for c in COPY_COLUMNS)
+
+
+def _apply_batch(db, rows: list[tuple], deactivated: list[str]) -> tuple[int, int]:
+    """Upsert `rows` and delete `deactivated` NPIs. Returns (upserted, removed)."""
+    upserted = removed = 0
+    if rows:
+        cols = ", ".join(COPY_COLUMNS)
+        db.execute(text(f"CREATE TEMP TABLE IF NOT EXISTS {STAGE} (LIKE {NppesProvider.__tablename__})"))
+        crud.copy_rows(db, STAGE, COPY_COLUMNS, rows, null_columns=NULL_COLUMNS)
+        upserted = db.execute(
+            text(
+                f"INSERT INTO {NppesProvider.__tablename__} ({cols}) "
+                f"SELECT DISTINCT ON (npi) {cols} FROM {STAGE} ORDER BY npi "
+                f"ON CONFLICT (npi) DO UPDATE SET "
+                + ", ".join(f"{c} = EXCLUDED.{c}" for c in COPY_COLUMNS if c != "npi")
+            )
+        ).rowcount
+        db.execute(text(f"TRUNCATE {STAGE}"))
+    if deactivated:
+        removed = db.execute(delete(NppesProvider).where(NppesProvider.npi.in_(deactivated))).rowcount
+    return upserted, removed
+
+
+def load_file(path: str, kind: str, batch_size: int = BATCH_SIZE) -> NppesLoad:
+    """
+    Stream an NPPES file into nppes_providers. kind="full" for the monthly file
+    (NPIs missing from it are removed at the end), "weekly" for a delta file.
+    Each batch commits on its own, so searches keep working during a load.
+    """
+    started = time.perf_counter()
+    with SessionLocal() as db:
+        load = NppesLoad(
+            kind=kind, file_name=os.path.basename(path), rows_read=0, upserted=0, removed=0, started_at=datetime.utcnow()
+        )
+        db.add(load)
+        db.commit()
+
+    try:
+        with open_npi_csv(path) as f, SessionLocal() as db:
+            records = read_npi_rows(f, load.started_at)
+            while True:
+                rows, deactivated = [], []
+                for npi, row in records:
+                    if row is None:
+                        deactivated.append(npi)
+                    else:
+                        rows.append(row)
+                    if len(rows) + len(deactivated) >= batch_size:
+                        break
+                if not rows and not deactivated:
+                    break
+                upserted, removed = _apply_batch(db, rows, deactivated)
+                load.rows_read += len(rows) + len(deactivated)
+                load.upserted += upserted
+                load.removed += removed
+                db.execute(
+                    update(NppesLoad)
+                    .where(NppesLoad.id == load.id)
+                    .values(rows_read=load.rows_read, upserted=load.upserted, removed=load.removed)
+                )
+                db.commit()
+                log.info(
+                    "nppes %s load %s: %d rows (%.0f rows/s)",
+                    kind, load.file_name, load.rows_read, load.rows_read / (time.perf_counter() - started),
+                )
+
+            if kind == "full":
+                load.removed += db.execute(
+                    delete(NppesProvider).where(NppesProvider.loaded_at < load.started_at)
+                ).rowcount
+            load.status = "done"
+            load.finished_at = datetime.utcnow()
+            db.merge(load)
+            db.commit()
+    except Exception as e:
+        log.exception("nppes %s load %s failed after %d rows", kind, load.file_name, load.rows_read)
+        with SessionLocal() as db:
+            load.status = "failed"
+            load.error = str(e)
+            load.finished_at = datetime.utcnow()
+            db.merge(load)
+            db.commit()
+        raise
+    return load
+
+
+# ---- Search ----
+
+def _like_prefix(value: str) -> str:
+    # NPPES allows a trailing * wildcard; here every name filter is a prefix match
+    value = value.strip().rstrip("*").upper()
+    return re.sub(r"([\\%_])", r"\\\1", value) + "%"
+
+
+def _name_key(col):
+    # Must match the expressions of the name indexes on NppesProvider
+    return func.upper(col).collate("C")
+
+
+def to_api_record(p: NppesProvider) -> Dict[str, Any]:
+    """A mirrored row in the shape of an NPI Registry API result."""
+    if p.enumeration_type == "NPI-2":
+        basic = {"organization_name": p.organization_name}
+    else:
+        basic = {
+            "first_name": p.first_name,
+            "middle_name": p.middle_name,
+            "last_name": p.last_name,
+            "credential": p.credential,
+        }
+    basic |= {
+        "status": "A",
+        "enumeration_date": p.enumeration_date.isoformat() if p.enumeration_date else None,
+        "last_updated": p.last_updated.isoformat() if p.last_updated else None,
+    }
+    return {
+        "number": p.npi,
+        "enumeration_type": p.enumeration_type,
+        "basic": basic,
+        "addresses": [
+            {
+                "address_purpose": "LOCATION",
+                "address_1": p.address_1,
+                "address_2": p.address_2,
+                "city": p.city,
+                "state": p.state,
+                "postal_code": p.postal_code,
+                "country_code": p.country_code or "US",
+                "telephone_number": p.telephone_number,
+            }
+        ],
+        # The NPI file carries taxonomy codes only; descriptions come from the API
+        "taxonomies": [
+            {"code": t["code"], "desc": None, "primary": t["primary"], "state": t["state"], "license": t["license"]}
+            for t in p.taxonomies or []
+        ],
+    }
+
+
+def _filtered(params: Dict[str, Any]):
+    q = select(NppesProvider)
+    if params.get("enumeration_type"):
+        q = q.where(NppesProvider.enumeration_type == params["enumeration_type"])
+    for key, col in (
+        ("organization_name", NppesProvider.organization_name),
+        ("last_name", NppesProvider.last_name),
+        ("first_name", NppesProvider.first_name),
+    ):
+        if params.get(key):
+            q = q.where(_name_key(col).like(_like_prefix(params[key]), escape="\\"))
+    if params.get("city"):
+        q = q.where(func.upper(NppesProvider.city) == params["city"].strip().upper())
+    if params.get("state"):
+        q = q.where(NppesProvider.state == params["state"].strip().upper())
+    if params.get("postal_code"):
+        digits = re.sub(r"\D", "", params["postal_code"])
+        q = q.where(NppesProvider.postal_code.collate("C").like(digits + "%"))
+    return q
+
+
+def _name_order(enumeration_type: str | None) -> list:
+    if enumeration_type == "NPI-2":
+        return [_name_key(NppesProvider.organization_name), NppesProvider.npi]
+    if enumeration_type == "NPI-1":
+        return [_name_key(NppesProvider.last_name), _name_key(NppesProvider.first_name), NppesProvider.npi]
+    return [NppesProvider.npi]
+
+
+async def search(params: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Answer an NPI Registry API query (same params, same response shape) from the
+    mirror. Names match case-insensitively as prefixes, city and state exactly
+    (case-insensitive), postal_code as a prefix of the 9-digit code.
+    """
+    q = (
+        _filtered(params)
+        .order_by(*_name_order(params.get("enumeration_type")))
+        .offset(int(params.get("skip") or 0))
+        .limit(int(params.get("limit") or 10))
+    )
+    async with AsyncReadSessionLocal() as db:
+        results = [to_api_record(p) for p in (await db.execute(q)).scalars()]
+    return {"result_count": len(results), "results": results}
+
+
+async def lookup(npis: List[str]) -> Dict[str, Dict[str, Any] | None]:
+    """API-shaped record per NPI, None for NPIs not in the mirror."""
+    async with AsyncReadSessionLocal() as db:
+        rows = (await db.execute(select(NppesProvider).where(NppesProvider.npi.in_(npis)))).scalars()
+        found = {p.npi: to_api_record(p) for p in rows}
+    return {npi: found.get(npi) for npi in npis}
+
+
+async def search_near(params: Dict[str, Any], zips: List[Tuple[float, str]]) -> Dict[str, Any]:
+    """
+    Like search(), restricted to providers whose practice ZIP is in `zips`
+    ((distance_km, zip5) sorted by distance) and ordered by that distance, then
+    by name. ZIPs are queried nearest first, NEAR_ZIP_BATCH at a time, until
+    skip + limit results are found. Each result gets a `distance_km`.
+    """
+    skip, limit = int(params.get("skip") or 0), int(params.get("limit") or 10)
+    base = _filtered(params)
+    zip5 = func.left(NppesProvider.postal_code, 5)
+    found: list[Dict[str, Any]] = []
+    async with AsyncReadSessionLocal() as db:
+        for i in range(0, len(zips), NEAR_ZIP_BATCH):
+            chunk = zips[i : i + NEAR_ZIP_BATCH]
+            codes = [z for _, z in chunk]
+            distance = {z: d for d, z in chunk}
+            q = (
+                base.where(zip5.in_(codes))
+                .order_by(
+                    func.array_position(bindparam("near_zips", codes, type_=ARRAY(String)), zip5),
+                    *_name_order(params.get("enumeration_type")),
+                )
+                .limit(skip + limit - len(found))
+            )
+            for p in (await db.execute(q)).scalars():
+                found.append(to_api_record(p) | {"distance_km": round(distance[p.postal_code[:5]], 1)})
+            if len(found) >= skip + limit:
+                break
+    results = found[skip:]
+    return {"result_count": len(results), "results": results}
+
+
+async def iter_all(params: Dict[str, Any]) -> AsyncIterator[Dict[str, Any]]:
+    """Every match of search()'s filters, in the same order, without limit/skip."""
+    q = _filtered(params).order_by(*_name_order(params.get("enumeration_type")))
+    async with AsyncReadSessionLocal() as db:
+        async for p in await db.stream_scalars(q.execution_options(yield_per=BATCH_SIZE)):
+            yield to_api_record(p)
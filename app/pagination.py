@@ -0,0 +1,23 @@
+# app/pagination.py
+from datetime import datetime
+
+from fastapi import HTTPException
+
+
+def encode_keyset_cursor(created_at: datetime, row_id: str) -> str:
+    """
+    Opaque cursor for (created_at, id) keyset pagination, newest first.
+    """
+    return f"{created_at.isoformat()}|{row_id}"
+
+
+def decode_keyset_cursor(cursor: str | None) -> tuple[datetime, str] | None:
+    if not cursor:
+        return None
+    created_at, sep, row_id = cursor.partition("|")
+    try:
+        if not sep or not row_id:
+            raise ValueError(cursor)
+        return datetime.fromisoformat(created_at), row_id
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
@@ -0,0 +1,239 @@
+# app/patient_import.py
+"""
+Bulk patient onboarding for clinic_admins.
+
+POST /patients/imports spools the uploaded CSV or NDJSON to a temp file and
+returns a job id. A worker thread then imports it in batches of
+PATIENT_IMPORT_BATCH_SIZE rows, one transaction per batch: guardians are
+resolved or created with one multi-row INSERT, patients get their public ids
+from crud.allocate_patients_bulk, and the per-row results and the job's
+progress counters are written with them.
+
+Columns / keys per row: external_id (echoed back), date_of_birth, guardian_email.
+All optional. Guardian accounts created here have no password; the clinic
+sends each one an invite from POST /auth/invite, redeemed at
+POST /auth/set-password. A guardian_email of an account this admin's imports
+did not create is a row error, not a link to that account. A job interrupted
+by a restart keeps its committed batches and stays "running".
+"""
+import csv
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+from itertools import islice
+from typing import Iterator
+
+from fastapi import HTTPException, Request
+from pydantic import ValidationError
+from sqlalchemy import insert, update
+
+from .db import SessionLocal
+from .models import AuditLog, PatientImportJob, PatientImportResult, uuid_str
+from .schemas import PatientImportRowIn
+from . import crud, uploads
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = int(os.getenv("PATIENT_IMPORT_BATCH_SIZE", "1000"))
+MAX_UPLOAD_BYTES = int(os.getenv("PATIENT_IMPORT_MAX_BYTES", str(200 * 1024 * 1024)))
+
+CONTENT_TYPES = {"text/csv": "csv", "application/csv": "csv"} | {t: "ndjson" for t in uploads.NDJSON_CONTENT_TYPES}
+
+
+def detect_format(request: Request, fmt: str | None) -> str:
+    if fmt:
+        return fmt
+    fmt = CONTENT_TYPES.get(uploads.content_type(request))
+    if fmt is None:
+        raise HTTPException(status_code=415, detail="Send text/csv or application/x-ndjson, or pass format=csv|ndjson")
+    return fmt
+
+
+async def spool_upload(request: Request, fmt: str) -> str:
+    return await uploads.spool_upload(request, prefix="patient-import-", suffix=f".{fmt}", max_bytes=MAX_UPLOAD_BYTES)
+
+
+def read_rows(path: str, fmt: str) -> Iterator[tuple[int, dict | None, str | None]]:
+    """Yield (row number, fields, parse error) per data row, 1-based."""
+    if fmt == "ndjson":
+        yield from uploads.read_ndjson(path)
+        return
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        for n, rec in enumerate(csv.DictReader(f), start=1):
+            # Blank cells are missing values; surplus cells (key None) are dropped
+            yield n, {k.strip(): (v.strip() or None) if v else None for k, v in rec.items() if k}, None
+
+
+def _import_batch(job_id: str, actor_user_id: str, batch: list[tuple[int, dict | None, str | None]]) -> None:
+    results: dict[int, dict] = {}
+    valid: list[tuple[int, PatientImportRowIn]] = []
+    for n, rec, err in batch:
+        if rec is not None and rec.get("external_id") is not None:
+            rec["external_id"] = str(rec["external_id"])
+        if err is None:
+            try:
+                valid.append((n, PatientImportRowIn.model_validate(rec)))
+                continue
+            except ValidationError as e:
+                err = uploads.validation_message(e)
+        results[n] = {"status": "error", "external_id": (rec or {}).get("external_id"), "error": err}
+
+    with SessionLocal() as db:
+        guardians, new_guardians = crud.ensure_guardians(
+            db, [r.guardian_email for _, r in valid if r.guardian_email], actor_user_id
+        )
+
+        to_create = []
+        for n, r in valid:
+            g = guardians.get(r.guardian_email) if r.guardian_email else None
+            if g is not None and g.role != "guardian":
+                results[n] = {
+                    "status": "error",
+                    "external_id": r.external_id,
+                    "error": f"guardian_email belongs to a {g.role} account",
+                }
+                continue
+            if g is not None and g.created_by_user_id != actor_user_id:
+                # Someone else's account: never attach a child to it on an email match
+                results[n] = {
+                    "status": "error",
+                    "external_id": r.external_id,
+                    "error": "guardian_email belongs to an existing account not created by your imports",
+                }
+                continue
+            to_create.append((n, r, g.id if g else None))
+
+        allocated = crud.allocate_patients_bulk(
+            db,
+            [
+                {
+                    "guardian_user_id": gid,
+                    "user_id": None,
+                    "date_of_birth": r.date_of_birth,
+                    "created_by_user_id": actor_user_id,
+                }
+                for _, r, gid in to_create
+            ],
+        ) if to_create else []
+
+        now = datetime.utcnow()
+        audit_rows = [
+            {
+                "id": uuid_str(),
+                "actor_user_id": actor_user_id,
+                "patient_id": pid,
+                "action": "PATIENT_CREATE",
+                "details": "",
+                "data": {"patient_public_id": public_id, "import_job_id": job_id},
+                "created_at": now,
+            }
+            for pid, public_id in allocated
+        ] + [
+            {
+                "id": uuid_str(),
+                "actor_user_id": actor_user_id,
+                "patient_id": "",
+                "action": "REGISTER",
+                "details": "",
+                "data": {"email": email, "role": "guardian", "import_job_id": job_id},
+                "created_at": now,
+            }
+            for email in sorted(new_guardians)
+        ]
+        if audit_rows:
+            db.execute(insert(AuditLog), audit_rows)
+
+        for (n, r, gid), (pid, public_id) in zip(to_create, allocated):
+            results[n] = {
+                "status": "created",
+                "external_id": r.external_id,
+                "patient_id": pid,
+                "patient_public_id": public_id,
+                "guardian_user_id": gid,
+            }
+        db.execute(
+            insert(PatientImportResult),
+            [
+                {
+                    "job_id": job_id,
+                    "row": n,
+                    "status": res["status"],
+                    "external_id": res.get("external_id"),
+                    "patient_id": res.get("patient_id"),
+                    "patient_public_id": res.get("patient_public_id"),
+                    "guardian_user_id": res.get("guardian_user_id"),
+                    "error": res.get("error"),
+                }
+                for n, res in sorted(results.items())
+            ],
+        )
+        db.execute(
+            update(PatientImportJob)
+            .where(PatientImportJob.id == job_id)
+            .values(
+                rows_processed=PatientImportJob.rows_processed + len(batch),
+                patients_created=PatientImportJob.patients_created + len(allocated),
+                guardians_created=PatientImportJob.guardians_created + len(new_guardians),
+                errors=PatientImportJob.errors + (len(batch) - len(allocated)),
+                updated_at=now,
+            )
+        )
+        db.commit()
+
+
+def _finish(job_id: str, status: str, error: str | None) -> None:
+    with SessionLocal() as db:
+        job = db.get(PatientImportJob, job_id)
+        job.status = status
+        job.error = error
+        job.updated_at = job.finished_at = datetime.utcnow()
+        crud.log(
+            db,
+            actor_user_id=job.actor_user_id,
+            patient_id="",
+            action="PATIENT_IMPORT",
+            data={
+                "import_job_id": job_id,
+                "status": status,
+                "rows": job.rows_processed,
+                "patients_created": job.patients_created,
+                "guardians_created": job.guardians_created,
+                "errors": job.errors,
+            },
+            strict=True,
+        )
+        db.commit()
+
+
+def run_import(job_id: str, path: str, fmt: str) -> None:
+    started = time.perf_counter()
+    processed = 0
+    try:
+        with SessionLocal() as db:
+            job = db.get(PatientImportJob, job_id)
+            job.status = "running"
+            job.updated_at = datetime.utcnow()
+            actor_user_id = job.actor_user_id
+            db.commit()
+
+        rows = read_rows(path, fmt)
+        while batch := list(islice(rows, BATCH_SIZE)):
+            _import_batch(job_id, actor_user_id, batch)
+            processed += len(batch)
+            logger.info(
+                "patient import %s: %d rows (%.0f rows/s)",
+                job_id, processed, processed / (time.perf_counter() - started),
+            )
+    except Exception as e:
+        logger.exception("patient import %s failed after %d rows", job_id, processed)
+        _finish(job_id, "failed", str(e))
+    else:
+        _finish(job_id, "done", None)
+    finally:
+        os.unlink(path)
+
+
+def start_import(job_id: str, path: str, fmt: str) -> None:
+    threading.Thread(target=run_import, args=(job_id, path, fmt), name=f"patient-import-{job_id[:8]}", daemon=True).start()
@@ -0,0 +1,124 @@
+# app/pointer_health.py
+"""
+Background health check of record pointers.
+
+check_pointers() walks record_pointers in batches, oldest check first, and asks
+each pointer's FHIR server whether the resource still resolves. It sends a HEAD
+and falls back to GET for servers that do not support HEAD. Requests run
+concurrently up to POINTER_CHECK_CONCURRENCY, spaced per host to at most
+POINTER_CHECK_PER_HOST_RPS. The outcome is stored on the pointer
+(last_checked_at / last_status), and records views answer pointers known to be
+gone (404/410) from that instead of calling upstream again.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime, timedelta, timezone
+from urllib.parse import urlsplit
+
+import httpx
+
+from .db import AsyncSessionLocal
+from . import crud_async
+from . import fhir_client
+
+log = logging.getLogger(__name__)
+
+RECHECK_AFTER_S = float(os.getenv("POINTER_RECHECK_AFTER_S", str(24 * 3600)))
+BATCH_SIZE = int(os.getenv("POINTER_CHECK_BATCH_SIZE", "500"))
+CONCURRENCY = int(os.getenv("POINTER_CHECK_CONCURRENCY", "20"))
+PER_HOST_RPS = float(os.getenv("POINTER_CHECK_PER_HOST_RPS", "5"))
+
+# Upstream says the resource is gone; transient failures (5xx, 0) do not count.
+DEAD_STATUSES = frozenset({404, 410})
+UNREACHABLE = 0
+
+# Hosts that answered HEAD with 405/501; this process uses GET for them.
+_no_head: set[str] = set()
+
+
+def is_known_dead(ptr) -> bool:
+    return ptr.last_status in DEAD_STATUSES
+
+
+class HostRateLimiter:
+    """Spaces requests to the same host at least 1/rate seconds apart (one event loop)."""
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._next_slot: dict[str, float] = {}
+
+    async def wait(self, host: str) -> None:
+        now = time.monotonic()
+        slot = max(now, self._next_slot.get(host, now))
+        self._next_slot[host] = slot + self.interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+
+async def check_pointer(
+    client: httpx.AsyncClient, limiter: HostRateLimiter, sem: asyncio.Semaphore, base_url: str, resource_type: str, resource_id: str
+) -> int:
+    """Upstream HTTP status for one pointer, UNREACHABLE on transport errors."""
+    url = fhir_client.resource_url(base_url, resource_type, resource_id)
+    host = urlsplit(url).netloc
+    async with sem:
+        try:
+            if host not in _no_head:
+                await limiter.wait(host)
+                r = await client.head(url, headers=fhir_client.FHIR_HEADERS)
+                if r.status_code not in (405, 501):
+                    return r.status_code
+                _no_head.add(host)
+            await limiter.wait(host)
+            r = await client.get(url, headers=fhir_client.FHIR_HEADERS)
+            return r.status_code
+        except httpx.HTTPError:
+            return UNREACHABLE
+
+
+async def check_pointers(batch_size: int = BATCH_SIZE) -> int:
+    """
+    Check every pointer that is due (never checked, or not within
+    POINTER_RECHECK_AFTER_S). Returns the number of pointers checked.
+    """
+    started = time.perf_counter()
+    client = fhir_client.get_client()
+    limiter = HostRateLimiter(PER_HOST_RPS)
+    sem = asyncio.Semaphore(CONCURRENCY)
+    checked = dead = unreachable = 0
+
+    while True:
+        now = datetime.now(timezone.utc)
+        async with AsyncSessionLocal() as db:
+            due = await crud_async.claim_pointers_for_check(db, now, now - timedelta(seconds=RECHECK_AFTER_S), batch_size)
+            await db.commit()
+        if not due:
+            break
+
+        statuses = await asyncio.gather(
+            *(check_pointer(client, limiter, sem, base_url, rtype, rid) for _, base_url, rtype, rid in due)
+        )
+        async with AsyncSessionLocal() as db:
+            await crud_async.record_pointer_checks(
+                db, [(row[0], status) for row, status in zip(due, statuses)], datetime.now(timezone.utc)
+            )
+            await db.commit()
+
+        checked += len(due)
+        dead += sum(s in DEAD_STATUSES for s in statuses)
+        unreachable += sum(s == UNREACHABLE for s in statuses)
+        if len(due) < batch_size:
+            break
+
+    log.info(
+        "pointer health check: checked=%d dead=%d unreachable=%d elapsed_ms=%.1f",
+        checked,
+        dead,
+        unreachable,
+        (time.perf_counter() - started) * 1000,
+    )
+    return checked
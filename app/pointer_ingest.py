@@ -0,0 +1,148 @@
+# app/pointer_ingest.py
+"""
+Bulk record pointer ingestion (POST /patients/pointers/bulk).
+
+The NDJSON body is spooled to a temp file, then processed in batches of
+POINTER_INGEST_BATCH_SIZE lines while the per-line results stream back. Every
+patient is resolved and authorized once per upload, and each batch is one
+COPY-staged upsert and one commit. A line for a resource the patient already
+has a pointer for reports the existing pointer with created=false.
+One POINTER_ADD_BULK audit row per patient is written at the end, also when
+the client disconnects mid-stream, and covers the pointers committed so far.
+"""
+import json
+import logging
+import os
+import time
+from collections import Counter, defaultdict
+from itertools import islice
+from typing import Iterator
+
+from pydantic import ValidationError
+
+from .db import SessionLocal
+from .models import Patient
+from .schemas import BulkPointerIn
+from . import crud, uploads
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = int(os.getenv("POINTER_INGEST_BATCH_SIZE", "5000"))
+MAX_UPLOAD_BYTES = int(os.getenv("POINTER_INGEST_MAX_BYTES", str(500 * 1024 * 1024)))
+
+
+def may_add_pointers(user, p: Patient) -> bool:
+    # Same owners as POST /patients/{id}/pointers and /records/me/pointers
+    if user.role == "guardian":
+        return p.guardian_user_id == user.id
+    if user.role == "patient":
+        return p.user_id == user.id
+    return False
+
+
+def _error(n: int, message: str) -> str:
+    return json.dumps({"line": n, "status": "error", "error": message}) + "\n"
+
+
+def ingest(path: str, user) -> Iterator[str]:
+    """
+    Yield one NDJSON result line per input line, in input order, then a summary line.
+    Deletes `path` when done.
+    """
+    started = time.perf_counter()
+    # identifier as sent -> Patient, or the error every line for it gets
+    patients: dict[str, Patient | str] = {}
+    created: defaultdict[str, Counter] = defaultdict(Counter)
+    totals = Counter()
+    db = SessionLocal()
+    try:
+        lines = uploads.read_lines(path)
+        while batch := list(islice(lines, BATCH_SIZE)):
+            parsed: list[tuple[int, BulkPointerIn | None, str | None]] = []
+            for n, line in batch:
+                # Parse and validate in one pass
+                try:
+                    parsed.append((n, BulkPointerIn.model_validate_json(line), None))
+                except ValidationError as e:
+                    parsed.append((n, None, uploads.validation_message(e)))
+
+            new_identifiers = {item.patient for _, item, _ in parsed if item and item.patient not in patients}
+            if new_identifiers:
+                found = crud.get_patients_by_identifiers(db, list(new_identifiers))
+                for ident in new_identifiers:
+                    p = found.get(ident)
+                    if p is None:
+                        patients[ident] = "Patient not found"
+                    elif not may_add_pointers(user, p):
+                        patients[ident] = "Not allowed"
+                    else:
+                        patients[ident] = p
+
+            rows, row_lines, out = [], [], {}
+            for n, item, err in parsed:
+                target = patients.get(item.patient) if item else None
+                if err is None and isinstance(target, str):
+                    err = target
+                if err is not None:
+                    out[n] = _error(n, err)
+                    continue
+                rows.append(
+                    {
+                        "patient_id": target.id,
+                        "record_type": item.record_type,
+                        "fhir_base_url": item.fhir_base_url,
+                        "fhir_resource_type": item.fhir_resource_type,
+                        "fhir_resource_id": item.fhir_resource_id,
+                        "issuer": item.issuer,
+                    }
+                )
+                row_lines.append((n, target, item.record_type))
+
+            stored = crud.add_pointers_bulk(db, rows) if rows else []
+            db.commit()
+
+            for (n, p, record_type), (pointer_id, is_new) in zip(row_lines, stored):
+                if is_new:
+                    created[p.id][record_type] += 1
+                out[n] = json.dumps(
+                    {
+                        "line": n,
+                        "status": "ok",
+                        "pointer_id": pointer_id,
+                        "created": is_new,
+                        "patient_public_id": p.public_id,
+                    }
+                ) + "\n"
+            totals["lines"] += len(batch)
+            totals["created"] += sum(is_new for _, is_new in stored)
+            totals["existing"] += sum(not is_new for _, is_new in stored)
+            yield "".join(out[n] for n, _ in batch)
+
+        totals["errors"] = totals["lines"] - totals["created"] - totals["existing"]
+        elapsed = time.perf_counter() - started
+        logger.info(
+            "pointer ingest by %s: %d lines, %d pointers in %.2fs",
+            user.id, totals["lines"], totals["created"], elapsed,
+        )
+        yield json.dumps({"summary": {**totals, "patients": len(created), "elapsed_s": round(elapsed, 3)}}) + "\n"
+    finally:
+        try:
+            db.rollback()
+            publics = {p.id: p.public_id for p in patients.values() if isinstance(p, Patient)}
+            for patient_id, by_type in created.items():
+                crud.log(
+                    db,
+                    actor_user_id=user.id,
+                    patient_id=patient_id,
+                    action="POINTER_ADD_BULK",
+                    data={
+                        "count": sum(by_type.values()),
+                        "record_types": dict(by_type),
+                        "patient_public_id": publics[patient_id],
+                    },
+                    strict=True,
+                )
+            db.commit()
+        finally:
+            db.close()
+            os.unlink(path)
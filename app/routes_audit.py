@@ -0,0 +1,135 @@
+# app/routes_audit.py
+from datetime import datetime, timezone
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+
+from .db import get_read_db, ReadSessionLocal
+from .deps import get_current_user_read
+from .schemas import AuditEventOut, AuditPageOut
+from .pagination import encode_keyset_cursor, decode_keyset_cursor
+from .audit_partitions import audit_row_to_json
+from . import crud
+
+router = APIRouter(prefix="/audit", tags=["audit"])
+
+
+def _naive_utc(dt: datetime | None) -> datetime | None:
+    # audit_logs.created_at is stored as naive UTC
+    if dt is None or dt.tzinfo is None:
+        return dt
+    return dt.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def _resolve_patient_filter(db: Session, user, patient: str | None) -> dict:
+    """
+    clinic_admin: patients created by their own imports; any other filters.
+    guardian / patient: must filter by a patient they own.
+    Returns the patient filters for crud.query_audit_logs / stream_audit_logs.
+    """
+    p = None
+    if patient:
+        p = crud.get_patient_by_identifier(db, patient)
+        if not p:
+            raise HTTPException(status_code=404, detail="Patient not found")
+
+    if user.role in ("guardian", "patient"):
+        if not p:
+            raise HTTPException(status_code=400, detail="patient is required")
+        owner_id = p.guardian_user_id if user.role == "guardian" else p.user_id
+        if owner_id != user.id:
+            raise HTTPException(status_code=403, detail="Not allowed")
+    elif user.role == "clinic_admin":
+        if p and p.created_by_user_id != user.id:
+            raise HTTPException(status_code=403, detail="Not allowed")
+        if not p:
+            return {"patients_created_by": user.id}
+    else:
+        raise HTTPException(status_code=403, detail="Not allowed")
+
+    return {"patient_id": p.id}
+
+
+@router.get("/events", response_model=AuditPageOut)
+def list_audit_events(
+    patient: str | None = Query(None, description="Patient internal id or public id"),
+    actor_user_id: str | None = Query(None),
+    action: str | None = Query(None),
+    scope: str | None = Query(None, description="Matches data.scope"),
+    since: datetime | None = Query(None),
+    until: datetime | None = Query(None),
+    limit: int = Query(50, ge=1, le=500),
+    cursor: str | None = Query(None, description="next_cursor from the previous page"),
+    db: Session = Depends(get_read_db),
+    user=Depends(get_current_user_read),
+):
+    # Who did what, newest first
+    rows = crud.query_audit_logs(
+        db,
+        **_resolve_patient_filter(db, user, patient),
+        actor_user_id=actor_user_id,
+        action=action,
+        since=_naive_utc(since),
+        until=_naive_utc(until),
+        data_contains={"scope": crud.normalize_scope(scope)} if scope else None,
+        before=decode_keyset_cursor(cursor),
+        limit=limit + 1,
+    )
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    return AuditPageOut(
+        events=[
+            AuditEventOut(
+                id=r.id,
+                actor_user_id=r.actor_user_id,
+                patient_id=r.patient_id,
+                action=r.action,
+                details=r.details or "",
+                data=r.data,
+                created_at=r.created_at,
+            )
+            for r in rows
+        ],
+        next_cursor=encode_keyset_cursor(rows[-1].created_at, rows[-1].id) if has_more else None,
+    )
+
+
+@router.get("/export")
+def export_audit_events(
+    patient: str | None = Query(None, description="Patient internal id or public id"),
+    actor_user_id: str | None = Query(None),
+    action: str | None = Query(None),
+    scope: str | None = Query(None, description="Matches data.scope"),
+    since: datetime | None = Query(None),
+    until: datetime | None = Query(None),
+    db: Session = Depends(get_read_db),
+    user=Depends(get_current_user_read),
+):
+    """
+    Stream matching audit events as NDJSON, oldest first. Same filters as /audit/events.
+    """
+    filters = dict(
+        **_resolve_patient_filter(db, user, patient),
+        actor_user_id=actor_user_id,
+        action=action,
+        since=_naive_utc(since),
+        until=_naive_utc(until),
+        data_contains={"scope": crud.normalize_scope(scope)} if scope else None,
+    )
+
+    def _lines():
+        # Own session: the stream outlives the request-scoped one.
+        export_db = ReadSessionLocal()
+        try:
+            for row in crud.stream_audit_logs(export_db, **filters):
+                yield audit_row_to_json(row) + "\n"
+        finally:
+            export_db.close()
+
+    return StreamingResponse(
+        _lines(),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": 'attachment; filename="audit_events.ndjson"'},
+    )
@@ -1,16 +1,30 @@
+import logging
+import os
+import smtplib
+
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 
+from .auth import UNUSABLE_PASSWORD, decode_token
 from .db import get_db
+from .deps import get_current_user
 from .models import User  # must exist: User(id, email, password_hash, role)
-from .schemas import RegisterIn, LoginIn, TokenOut
-from .security import verify_password, hash_password, create_access_token
+from .schemas import RegisterIn, LoginIn, TokenOut, InviteIn, InviteOut, SetPasswordIn
+from .security import verify_password, hash_password, create_access_token, create_invite_token, SET_PASSWORD_PURPOSE
+from . import crud, mailer
+
+log = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
+# Set-password page the invite email links to; "{token}" is replaced by the token.
+INVITE_URL = os.getenv("INVITE_URL", "http://localhost:3000/set-password?token={token}")
+
 
 @router.post("/register", response_model=TokenOut)
 def register(payload: RegisterIn, db: Session = Depends(get_db)):
+    if payload.role == "clinic_admin":
+        raise HTTPException(status_code=403, detail="Clinic admin accounts are created by an operator")
     existing = db.query(User).filter(User.email == payload.email).first()
     if existing:
         raise HTTPException(
@@ -24,8 +38,10 @@ def register(payload: RegisterIn, db: Session = Depends(get_db)):
         role=payload.role,
     )
     db.add(user)
+    db.flush()
+    # the new user's first reads must not hit a lagging replica
+    db.info["user_id"] = user.id
     db.commit()
-    db.refresh(user)
 
     token = create_access_token(subject=str(user.id), extra={"role": user.role, "email": user.email})
     return TokenOut(access_token=token)
@@ -44,3 +60,61 @@ def login(payload: LoginIn, db: Session = Depends(get_db)):
 
     token = create_access_token(subject=str(user.id), extra={"role": user.role, "email": user.email})
     return TokenOut(access_token=token)
+
+
+@router.post("/invite", response_model=InviteOut)
+def invite(payload: InviteIn, db: Session = Depends(get_db), user=Depends(get_current_user)):
+    """
+    Email a set-password link to a guardian account that has no password yet and
+    was created by one of the caller's patient imports. The token goes only to
+    the account's address, never to the caller. Issuing a new one does not revoke
+    earlier ones; all stop working once a password is set.
+    """
+    if user.role != "clinic_admin":
+        raise HTTPException(status_code=403, detail="Only clinic admins can send invites")
+    invitee = crud.get_user_by_email(db, payload.email)
+    if not invitee or invitee.created_by_user_id != user.id:
+        raise HTTPException(status_code=404, detail="User not found")
+    if not invitee.password_hash.startswith(UNUSABLE_PASSWORD):
+        raise HTTPException(status_code=409, detail="Account already has a password")
+    if not mailer.configured():
+        raise HTTPException(status_code=503, detail="Invite email is not configured")
+
+    token, expires_at = create_invite_token(invitee.id)
+    try:
+        mailer.send(
+            invitee.email,
+            "Set your password",
+            f"Your account is ready. Set a password here before {expires_at:%Y-%m-%d %H:%M} UTC:\n\n"
+            f"{INVITE_URL.format(token=token)}\n",
+        )
+    except (smtplib.SMTPException, OSError):
+        log.exception("invite email to %s failed", invitee.email)
+        raise HTTPException(status_code=502, detail="Could not send the invite email")
+    crud.log(db, actor_user_id=user.id, patient_id="", action="INVITE", data={"user_id": invitee.id, "email": invitee.email})
+    db.commit()
+    return InviteOut(email=invitee.email, expires_at=expires_at)
+
+
+@router.post("/set-password", response_model=TokenOut)
+def set_password(payload: SetPasswordIn, db: Session = Depends(get_db)):
+    """Redeem an invite token: set the account's first password and log in."""
+    try:
+        claims = decode_token(payload.token)
+    except ValueError:
+        raise HTTPException(status_code=401, detail="Invalid or expired invite")
+    if claims.get("purpose") != SET_PASSWORD_PURPOSE:
+        raise HTTPException(status_code=401, detail="Invalid or expired invite")
+
+    user = db.get(User, claims.get("sub"))
+    # Only while the password is unusable, so each invite works once
+    if not user or not user.password_hash.startswith(UNUSABLE_PASSWORD):
+        raise HTTPException(status_code=401, detail="Invalid or expired invite")
+
+    user.password_hash = hash_password(payload.password)
+    crud.log(db, actor_user_id=user.id, patient_id="", action="PASSWORD_SET", data={"email": user.email}, strict=True)
+    db.info["user_id"] = user.id
+    db.commit()
+
+    token = create_access_token(subject=str(user.id), extra={"role": user.role, "email": user.email})
+    return TokenOut(access_token=token)
@@ -1,13 +1,23 @@
 # app/routes_consents.py
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
 from datetime import datetime, timezone
 
-from .db import get_db
-from .deps import get_current_user
-from .schemas import ConsentIn, ConsentOut, ConsentListOut
-from . import crud
+from .db import get_db, get_read_db
+from .deps import get_current_user, get_current_user_read
+from .schemas import (
+    ConsentIn,
+    ConsentOut,
+    ConsentListOut,
+    ConsentBulkIn,
+    ConsentBulkRevokeIn,
+    ConsentHistoryOut,
+    WorklistPatientOut,
+    WorklistOut,
+)
+from . import consent_prefetch, crud
 from .models import Patient
+from .pagination import encode_keyset_cursor, decode_keyset_cursor
 
 router = APIRouter(prefix="/consents", tags=["consents"])
 
@@ -36,10 +46,31 @@ def _ensure_patient_owner(db: Session, user, patient_identifier: str) -> Patient
     raise HTTPException(status_code=403, detail="Not allowed")
 
 
+def _validate_grant(data: ConsentIn, now: datetime) -> tuple[str, datetime]:
+    """
+    Returns (normalized scope, tz-aware expires_at) or raises 400.
+    """
+    expires_at = data.expires_at
+    if expires_at.tzinfo is None:
+        expires_at = expires_at.replace(tzinfo=timezone.utc)
+
+    if expires_at <= now:
+        raise HTTPException(status_code=400, detail="expires_at must be in the future")
+
+    scope = crud.normalize_scope(data.scope)
+
+    # ✅ allow "all"
+    if scope not in ALLOWED_SCOPES:
+        raise HTTPException(status_code=400, detail="Invalid scope")
+
+    return scope, expires_at
+
+
 @router.post("/patients/{patient_identifier}")
 def grant_consent(
     patient_identifier: str,
     data: ConsentIn,
+    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
     user=Depends(get_current_user),
 ):
@@ -50,43 +81,148 @@ def grant_consent(
     if not grantee or grantee.role != "doctor":
         raise HTTPException(status_code=400, detail="Grantee must be an existing doctor user")
 
+    scope, expires_at = _validate_grant(data, datetime.now(timezone.utc))
+
+    c = crud.grant_consent(db, p.id, grantee.id, scope, expires_at)
+
+    crud.log(
+        db,
+        actor_user_id=user.id,
+        patient_id=p.id,
+        action="CONSENT_GRANT",
+        data={
+            "consent_id": c.id,
+            "grantee_user_id": grantee.id,
+            "grantee_email": grantee.email,
+            "scope": scope,
+            "expires_at": expires_at.isoformat(),
+            "patient_public_id": p.public_id,
+        },
+        strict=True,
+    )
+    db.commit()
+    # Warm the FHIR cache for the doctor's first view (app/consent_prefetch.py)
+    background_tasks.add_task(consent_prefetch.start, [(c.id, p.id, scope)])
+
+    return {"status": "ok", "consent_id": c.id, "patient_id": p.id, "patient_public_id": p.public_id}
+
+
+@router.post("/patients/{patient_identifier}/bulk")
+def grant_consents_bulk(
+    patient_identifier: str,
+    data: ConsentBulkIn,
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_db),
+    user=Depends(get_current_user),
+):
+    """
+    Grant many (grantee, scope, expiry) consents for one patient in a single transaction.
+    All-or-nothing: any invalid item rejects the whole batch.
+    """
+    p = _ensure_patient_owner(db, user, patient_identifier)
+
     now = datetime.now(timezone.utc)
-    expires_at = data.expires_at
-    if expires_at.tzinfo is None:
-        expires_at = expires_at.replace(tzinfo=timezone.utc)
+    validated = [_validate_grant(g, now) for g in data.grants]
+
+    grantees = crud.get_users_by_emails(db, [g.grantee_email for g in data.grants])
+    invalid = sorted(
+        {
+            g.grantee_email
+            for g in data.grants
+            if g.grantee_email not in grantees or grantees[g.grantee_email].role != "doctor"
+        }
+    )
+    if invalid:
+        raise HTTPException(
+            status_code=400,
+            detail={"message": "Grantee must be an existing doctor user", "invalid_emails": invalid},
+        )
 
-    if expires_at <= now:
-        raise HTTPException(status_code=400, detail="expires_at must be in the future")
+    consent_ids = crud.grant_consents_bulk(
+        db,
+        p.id,
+        [
+            (grantees[g.grantee_email].id, scope, expires_at)
+            for g, (scope, expires_at) in zip(data.grants, validated)
+        ],
+    )
 
-    scope = crud.normalize_scope(data.scope)
+    # One audit row for the whole batch, committed with the inserts above.
+    crud.log(
+        db,
+        actor_user_id=user.id,
+        patient_id=p.id,
+        action="CONSENT_GRANT_BULK",
+        data={
+            "count": len(consent_ids),
+            "consent_ids": consent_ids,
+            "grantee_emails": sorted({g.grantee_email for g in data.grants}),
+            "scopes": sorted({scope for scope, _ in validated}),
+            "patient_public_id": p.public_id,
+        },
+        strict=True,
+    )
+    db.commit()
+    background_tasks.add_task(
+        consent_prefetch.start, [(cid, p.id, scope) for cid, (scope, _) in zip(consent_ids, validated)]
+    )
 
-    # ✅ allow "all"
-    if scope not in ALLOWED_SCOPES:
-        raise HTTPException(status_code=400, detail="Invalid scope")
+    return {
+        "status": "ok",
+        "patient_id": p.id,
+        "patient_public_id": p.public_id,
+        "consents": [
+            {"consent_id": cid, "grantee_email": g.grantee_email, "scope": scope}
+            for cid, g, (scope, _) in zip(consent_ids, data.grants, validated)
+        ],
+    }
 
-    c = crud.grant_consent(db, p.id, grantee.id, scope, expires_at)
+
+@router.post("/patients/{patient_identifier}/bulk-revoke")
+def revoke_consents_bulk(
+    patient_identifier: str,
+    data: ConsentBulkRevokeIn,
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_db),
+    user=Depends(get_current_user),
+):
+    """
+    Revoke many consents of one patient in a single transaction.
+    Ids that are unknown, belong to another patient or are already revoked are reported as skipped.
+    """
+    p = _ensure_patient_owner(db, user, patient_identifier)
+
+    revoked = crud.revoke_consents_bulk(db, p.id, data.consent_ids)
+    revoked_set = set(revoked)
+    skipped = [cid for cid in dict.fromkeys(data.consent_ids) if cid not in revoked_set]
+
+    if not revoked:
+        return {"status": "ok", "revoked": [], "skipped": skipped}
 
     crud.log(
         db,
         actor_user_id=user.id,
         patient_id=p.id,
-        action="CONSENT_GRANT",
-        details=f"to={grantee.email} scope={scope} exp={expires_at.isoformat()} patient_public_id={p.public_id}",
+        action="CONSENT_REVOKE_BULK",
+        data={"count": len(revoked), "consent_ids": revoked, "patient_public_id": p.public_id},
+        strict=True,
     )
+    db.commit()
+    background_tasks.add_task(consent_prefetch.cancel, revoked)
 
-    return {"status": "ok", "consent_id": c.id, "patient_id": p.id, "patient_public_id": p.public_id}
+    return {"status": "ok", "revoked": revoked, "skipped": skipped}
 
 
 @router.get("/patients/{patient_identifier}", response_model=ConsentListOut)
 def list_patient_consents(
     patient_identifier: str,
-    db: Session = Depends(get_db),
-    user=Depends(get_current_user),
+    db: Session = Depends(get_read_db),
+    user=Depends(get_current_user_read),
 ):
     # Guardian/patient can list for owned patient
     p = _ensure_patient_owner(db, user, patient_identifier)
 
-    rows = crud.list_consents_for_patient(db, p.id)
+    rows = crud.list_consents_for_patient(db, p.id, datetime.now(timezone.utc))
     consents = [
         ConsentOut(
             id=c.id,
@@ -104,10 +240,51 @@ def list_patient_consents(
     return ConsentListOut(patient_id=p.id, patient_public_id=p.public_id, consents=consents)
 
 
+@router.get("/patients/{patient_identifier}/history", response_model=ConsentHistoryOut)
+def list_patient_consent_history(
+    patient_identifier: str,
+    limit: int = Query(50, ge=1, le=200),
+    cursor: str | None = Query(None, description="next_cursor from the previous page"),
+    db: Session = Depends(get_read_db),
+    user=Depends(get_current_user_read),
+):
+    # Full history including revoked and expired grants, newest first
+    p = _ensure_patient_owner(db, user, patient_identifier)
+
+    rows = crud.list_consent_history(db, p.id, before=decode_keyset_cursor(cursor), limit=limit + 1)
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    consents = [
+        ConsentOut(
+            id=c.id,
+            patient_id=p.id,
+            patient_public_id=p.public_id,
+            grantee_email=u.email,
+            scope=c.scope,
+            expires_at=c.expires_at,
+            revoked=c.revoked,
+            created_at=c.created_at,
+        )
+        for (c, u) in rows
+    ]
+    next_cursor = None
+    if has_more:
+        last = rows[-1][0]
+        next_cursor = encode_keyset_cursor(last.created_at, last.id)
+
+    return ConsentHistoryOut(
+        patient_id=p.id,
+        patient_public_id=p.public_id,
+        consents=consents,
+        next_cursor=next_cursor,
+    )
+
+
 @router.get("/me", response_model=ConsentListOut)
 def list_my_consents(
-    db: Session = Depends(get_db),
-    user=Depends(get_current_user),
+    db: Session = Depends(get_read_db),
+    user=Depends(get_current_user_read),
 ):
     # Patient convenience endpoint
     if user.role != "patient":
@@ -117,7 +294,7 @@ def list_my_consents(
     if not p:
         raise HTTPException(status_code=404, detail="Patient profile not found. Call POST /patients/self/register.")
 
-    rows = crud.list_consents_for_patient(db, p.id)
+    rows = crud.list_consents_for_patient(db, p.id, datetime.now(timezone.utc))
     consents = [
         ConsentOut(
             id=c.id,
@@ -135,9 +312,51 @@ def list_my_consents(
     return ConsentListOut(patient_id=p.id, patient_public_id=p.public_id, consents=consents)
 
 
+@router.get("/doctor/patients", response_model=WorklistOut)
+def list_my_patients(
+    limit: int = Query(50, ge=1, le=200),
+    cursor: str | None = Query(None, description="next_cursor from the previous page"),
+    db: Session = Depends(get_read_db),
+    user=Depends(get_current_user_read),
+):
+    # Doctor worklist: every patient who currently has a live consent for the caller
+    if user.role != "doctor":
+        raise HTTPException(status_code=403, detail="Only doctors can list their patients")
+
+    rows = crud.list_patients_for_doctor(
+        db,
+        user.id,
+        datetime.now(timezone.utc),
+        after_patient_id=cursor,
+        limit=limit + 1,
+    )
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    summaries = crud.get_pointer_summaries(db, [pid for pid, *_ in rows])
+
+    def _counts(pid: str, scopes: list[str]) -> dict[str, int]:
+        visible = crud.SCOPE_RECORD_TYPES if "all" in scopes else {s: crud.SCOPE_RECORD_TYPES[s] for s in scopes if s in crud.SCOPE_RECORD_TYPES}
+        return {s: summaries.get(pid, {}).get(rtype, (0, None))[0] for s, rtype in visible.items()}
+
+    return WorklistOut(
+        patients=[
+            WorklistPatientOut(
+                patient_id=pid,
+                patient_public_id=public_id,
+                scopes=scopes,
+                soonest_expiry=soonest,
+                record_counts=_counts(pid, scopes),
+            )
+            for (pid, public_id, scopes, soonest) in rows
+        ],
+        next_cursor=rows[-1][0] if has_more else None,
+    )
+
+
 @router.post("/{consent_id}/revoke")
 def revoke_consent(
     consent_id: str,
+    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
     user=Depends(get_current_user),
 ):
@@ -162,15 +381,17 @@ def revoke_consent(
     if c.revoked:
         return {"status": "ok", "consent_id": c.id, "already_revoked": True}
 
-    c.revoked = True
-    db.commit()
+    crud.revoke_consent(db, c.id)
 
     crud.log(
         db,
         actor_user_id=user.id,
         patient_id=p.id,
         action="CONSENT_REVOKE",
-        details=f"consent_id={c.id} patient_public_id={p.public_id}",
+        data={"consent_id": c.id, "patient_public_id": p.public_id},
+        strict=True,
     )
+    db.commit()
+    background_tasks.add_task(consent_prefetch.cancel, [c.id])
 
     return {"status": "ok", "consent_id": c.id}
@@ -1,77 +1,48 @@
 from __future__ import annotations
 
-from typing import Any, Dict, List, Optional
-from fastapi import APIRouter, HTTPException, Query
+import asyncio
+import json
+from typing import Any, Dict, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import JSONResponse, StreamingResponse
 import httpx
 
+from .deps import get_current_user_async
+from . import npi_autocomplete, npi_export, npi_records, npi_registry, zip_geo
+
 router = APIRouter(prefix="/hospitals", tags=["hospitals"])
 
-CMS_NPI_BASE = "https://npiregistry.cms.hhs.gov/api/"
 CMS_API_VERSION = "2.1"
 
 
-def _pick_practice_location(addresses: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
-    # NPPES returns multiple addresses; we prefer "practice" if present.
-    # If not found, fall back to first.
-    if not addresses:
-        return None
-    for a in addresses:
-        if (a.get("address_purpose") or "").lower() == "location":
-            return a
-    return addresses[0]
-
-
-def _normalize_org_result(r: Dict[str, Any]) -> Dict[str, Any]:
-    basic = r.get("basic") or {}
-    addresses = r.get("addresses") or []
-    loc = _pick_practice_location(addresses) or {}
-
-    name = (
-        basic.get("organization_name")
-        or basic.get("name")
-        or basic.get("authorized_official_organization_name")
-        or "Unknown"
-    )
-
-    return {
-        "npi": r.get("number"),
-        "name": name,
-        "enumeration_type": r.get("enumeration_type"),
-        "status": basic.get("status"),
-        "last_updated": basic.get("last_updated"),
-        "address": {
-            "line1": loc.get("address_1"),
-            "line2": loc.get("address_2"),
-            "city": loc.get("city"),
-            "state": loc.get("state"),
-            "postal_code": loc.get("postal_code"),
-            "country_code": loc.get("country_code"),
-            "telephone_number": loc.get("telephone_number"),
-        },
-        "taxonomies": r.get("taxonomies") or [],
-        "raw": r,  # optional: keep full record for debugging; remove if you prefer
-    }
-
-
 @router.get("/cms/search")
 async def search_hospitals_cms(
-    name: str = Query(..., min_length=2, description="Organization (hospital) name, e.g. 'Northwestern'"),
+    name: Optional[str] = Query(None, min_length=2, description="Organization (hospital) name, e.g. 'Northwestern'"),
     city: Optional[str] = Query(None),
     state: Optional[str] = Query(None, min_length=2, max_length=2),
     postal_code: Optional[str] = Query(None),
     limit: int = Query(10, ge=1, le=200, description="Max 200 per CMS API"),
     skip: int = Query(0, ge=0, le=1000, description="Max 1000 per CMS API"),
-) -> Dict[str, Any]:
+    fields: Optional[str] = Query(None, description="Comma-separated result fields, e.g. 'npi,name,address'"),
+    include_raw: bool = Query(False, description="Add the full upstream record as 'raw'"),
+    near: Optional[str] = Query(None, min_length=5, max_length=10, description="ZIP code; nearest hospitals first"),
+    radius_km: float = Query(25, gt=0, le=500, description="With near: search radius"),
+) -> JSONResponse:
     """
-    Search organizations (NPI-2) from the CMS NPPES NPI Registry API.
+    Search organizations (NPI-2) from the CMS NPPES NPI Registry API, or with
+    `near` from the local NPPES mirror by distance (app/zip_geo.py).
     """
+    if not name and not near:
+        raise HTTPException(status_code=400, detail="Pass name, near, or both")
+    selected = npi_records.parse_fields(fields, npi_records.HOSPITAL_FIELDS, include_raw, near=bool(near))
     params: Dict[str, Any] = {
         "version": CMS_API_VERSION,
         "enumeration_type": "NPI-2",
-        "organization_name": name,
         "limit": limit,
         "skip": skip,
     }
+    if name:
+        params["organization_name"] = name
     if city:
         params["city"] = city
     if state:
@@ -79,21 +50,76 @@ async def search_hospitals_cms(
     if postal_code:
         params["postal_code"] = postal_code
 
-    timeout = httpx.Timeout(10.0, connect=5.0)
-    async with httpx.AsyncClient(timeout=timeout) as client:
+    if near:
+        data = await zip_geo.search_near(params, near, radius_km)
+    else:
         try:
-            resp = await client.get(CMS_NPI_BASE, params=params)
-            resp.raise_for_status()
+            data = await npi_registry.search(params)
         except httpx.HTTPError as e:
             raise HTTPException(status_code=502, detail=f"CMS NPI Registry request failed: {str(e)}")
 
-    data = resp.json()
-    results = data.get("results") or []
-    normalized = [_normalize_org_result(x) for x in results]
+    results = [npi_records.normalize(x, selected) for x in data.get("results") or []]
 
-    return {
-        "source": "cms_npi_registry",
-        "query": params,
-        "result_count": data.get("result_count", len(normalized)),
-        "results": normalized,
-    }
+    # Plain JSON types already; skip FastAPI's jsonable_encoder pass over every result
+    return JSONResponse(
+        {
+            "source": "mirror" if near else npi_registry.source(),
+            "result_count": data.get("result_count", len(results)),
+            "results": results,
+        }
+    )
+
+
+@router.get("/cms/autocomplete")
+async def autocomplete_hospitals_cms(
+    q: str = Query(..., min_length=1, description="What the user has typed so far"),
+    state: Optional[str] = Query(None, min_length=2, max_length=2, description="Rank hospitals in this state first"),
+    city: Optional[str] = Query(None, description="Rank hospitals in this city next"),
+    limit: int = Query(10, ge=1, le=50),
+) -> Dict[str, Any]:
+    """
+    Type-ahead over hospital names from the in-process index (app/npi_autocomplete.py);
+    no request to the CMS API.
+    """
+    if not npi_autocomplete.built():
+        raise HTTPException(status_code=503, detail="Autocomplete index is still building", headers={"Retry-After": "5"})
+    return npi_autocomplete.search("NPI-2", q, limit, state=state, city=city)
+
+
+@router.get("/cms/export")
+async def export_hospitals_cms(
+    name: Optional[str] = Query(None, min_length=2, description="Organization name prefix"),
+    city: Optional[str] = Query(None),
+    state: Optional[str] = Query(None, min_length=2, max_length=2),
+    postal_code: Optional[str] = Query(None, description="ZIP or ZIP prefix, e.g. '606'"),
+    fields: Optional[str] = Query(None, description="Comma-separated result fields, e.g. 'npi,name,address'"),
+    include_raw: bool = Query(False, description="Add the full upstream record as 'raw'"),
+    user=Depends(get_current_user_async),
+):
+    """
+    Every matching organization (NPI-2), not just one page: NDJSON, one result per
+    line, each NPI once, then a summary line. Queries beyond the CMS API's
+    1200-result cap are split by postal code prefix (app/npi_export.py), so
+    e.g. `?state=IL` returns every hospital in the state.
+    """
+    if user.role != "clinic_admin":
+        raise HTTPException(status_code=403, detail="Only clinic admins can export search results")
+    if not any((name, city, state, postal_code)):
+        raise HTTPException(status_code=400, detail="Pass at least one of name, city, state, postal_code")
+    selected = npi_records.parse_fields(fields, npi_records.HOSPITAL_FIELDS, include_raw)
+    params: Dict[str, Any] = {"version": CMS_API_VERSION, "enumeration_type": "NPI-2"}
+    if name:
+        params["organization_name"] = name
+    if city:
+        params["city"] = city
+    if state:
+        params["state"] = state
+    if postal_code:
+        # matched as a prefix, as the splitting does
+        params["postal_code"] = postal_code.strip().rstrip("*") + "*"
+
+    async def _lines():
+        async for r in npi_export.export(params):
+            yield json.dumps(r if "summary" in r else npi_records.normalize(r, selected)) + "\n"
+
+    return StreamingResponse(_lines(), media_type="application/x-ndjson")
@@ -7,12 +7,12 @@ from pydantic import BaseModel, Field
 from sqlalchemy.orm import Session
 import uuid
 
-from .db import get_db
+from .db import get_db, get_read_db
 from .models_hospitals import PatientHospitalSelection
 
 # Use your existing auth dependency that returns current user
 # (adjust import name if yours differs)
-from .deps import get_current_user
+from .deps import get_current_user, get_current_user_read
 from .crud import get_patient_by_user_id  # must exist in your project
 
 router = APIRouter(prefix="/patients/me", tags=["hospitals"])
@@ -47,8 +47,8 @@ class HospitalSelectionOut(BaseModel):
 
 @router.get("/hospital", response_model=Optional[HospitalSelectionOut])
 def get_my_selected_hospital(
-    db: Session = Depends(get_db),
-    user: Any = Depends(get_current_user),
+    db: Session = Depends(get_read_db),
+    user: Any = Depends(get_current_user_read),
 ):
     patient = get_patient_by_user_id(db, user.id)
     if not patient:
@@ -110,7 +110,6 @@ def set_my_selected_hospital(
         row.taxonomy_desc = payload.taxonomy_desc
 
     db.commit()
-    db.refresh(row)
 
     return HospitalSelectionOut(
         hospital_npi=row.hospital_npi,
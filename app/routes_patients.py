@@ -1,11 +1,17 @@
-from fastapi import APIRouter, Depends, HTTPException
+import json
+from datetime import datetime, timezone
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from .db import get_db
-from .deps import get_current_user
-from .models import RecordPointer, Patient, generate_public_patient_id
-from .schemas import CreatePatientIn, PatientOut, CreatePointerIn, PatientSelfRegisterIn
-from . import crud
+from .db import get_db, get_read_db, get_async_read_db, AsyncSessionLocal, ReadSessionLocal
+from .deps import get_current_user, get_current_user_read, get_current_user_async_read, get_current_user_async_upload
+from .models import RecordPointer, PatientImportJob, uuid_str
+from .schemas import CreatePatientIn, PatientOut, CreatePointerIn, PatientSelfRegisterIn, PatientImportJobOut
+from .schemas import ConsentOut, PatientProfileOut, PatientSummaryOut
+from . import crud, crud_async, patient_import, pointer_ingest, uploads
 
 router = APIRouter(prefix="/patients", tags=["patients"])
 
@@ -20,6 +26,7 @@ def create_patient(
         raise HTTPException(status_code=403, detail="Only guardians can create patients")
 
     p = crud.create_patient(db, user.id)
+    db.commit()
 
     return PatientOut(
         id=p.id,
@@ -58,35 +65,186 @@ def self_register_patient(
         )
 
     # Create new patient profile linked to this user
-    for _ in range(10):
-        public_id = generate_public_patient_id()
-        if not db.query(Patient).filter(Patient.public_id == public_id).first():
-            p = Patient(
-                public_id=public_id,
-                guardian_user_id=None,
-                user_id=user.id,
-                date_of_birth=dob,
-            )
-            db.add(p)
-            db.commit()
-            db.refresh(p)
+    try:
+        p = crud.allocate_patient(db, guardian_user_id=None, user_id=user.id, date_of_birth=dob)
+    except RuntimeError:
+        raise HTTPException(status_code=500, detail="Failed to generate public patient id")
+
+    crud.log(
+        db,
+        actor_user_id=user.id,
+        patient_id=p.id,
+        action="PATIENT_SELF_REGISTER",
+        data={"patient_public_id": p.public_id},
+        strict=True,
+    )
+    db.commit()
+
+    return PatientOut(
+        id=p.id,
+        public_id=p.public_id,
+        guardian_user_id="",
+        created_at=p.created_at,
+    )
 
-            crud.log(
-                db,
-                actor_user_id=user.id,
+
+@router.get("/me/summary", response_model=PatientSummaryOut)
+async def get_my_summary(
+    db: AsyncSession = Depends(get_async_read_db),
+    user=Depends(get_current_user_async_read),
+):
+    """
+    Everything the patient home screen needs in one call: profile, selected
+    hospital and provider, live consents and record counts per scope (from
+    pointer_summaries, with when the newest was added). Reads the
+    database only (no FHIR requests).
+    """
+    if user.role != "patient":
+        raise HTTPException(status_code=403, detail="Only patients can call /patients/me/summary")
+
+    row = await crud_async.get_patient_with_selections(db, user.id)
+    if not row:
+        raise HTTPException(status_code=404, detail="Patient profile not found. Call POST /patients/self/register.")
+    p, hospital, provider = row
+
+    consents = await crud_async.list_consents_for_patient(db, p.id, datetime.now(timezone.utc))
+    records = await crud_async.get_pointer_summary(db, p.id)
+
+    return PatientSummaryOut(
+        profile=PatientProfileOut(id=p.id, public_id=p.public_id, date_of_birth=p.date_of_birth, created_at=p.created_at),
+        # Same shapes as GET /patients/me/hospital and GET /providers/me
+        hospital={
+            "hospital_npi": hospital.hospital_npi,
+            "hospital_name": hospital.hospital_name,
+            "hospital_phone": hospital.hospital_phone,
+            "address_line1": hospital.address_line1,
+            "address_line2": hospital.address_line2,
+            "city": hospital.city,
+            "state": hospital.state,
+            "postal_code": hospital.postal_code,
+            "taxonomy_desc": hospital.taxonomy_desc,
+        }
+        if hospital
+        else None,
+        provider={
+            "npi": provider.provider_npi,
+            "name": provider.provider_name,
+            "taxonomy_desc": provider.taxonomy_desc,
+            "telephone_number": provider.provider_phone,
+            "city": provider.city,
+            "state": provider.state,
+            "postal_code": provider.postal_code,
+        }
+        if provider
+        else None,
+        consents=[
+            ConsentOut(
+                id=c.id,
                 patient_id=p.id,
-                action="PATIENT_SELF_REGISTER",
-                details=f"public_id={p.public_id}",
+                patient_public_id=p.public_id,
+                grantee_email=email,
+                scope=c.scope,
+                expires_at=c.expires_at,
+                revoked=c.revoked,
+                created_at=c.created_at,
             )
+            for c, email in consents
+        ],
+        record_counts={scope: records.get(rtype, (0, None))[0] for scope, rtype in crud.SCOPE_RECORD_TYPES.items()},
+        records_last_added={scope: records.get(rtype, (0, None))[1] for scope, rtype in crud.SCOPE_RECORD_TYPES.items()},
+    )
 
-            return PatientOut(
-                id=p.id,
-                public_id=p.public_id,
-                guardian_user_id="",
-                created_at=p.created_at,
-            )
 
-    raise HTTPException(status_code=500, detail="Failed to generate public patient id")
+@router.post("/imports", status_code=202, response_model=PatientImportJobOut)
+async def start_patient_import(
+    request: Request,
+    format: str | None = Query(None, pattern="^(csv|ndjson)$", description="Default: from Content-Type"),
+    user=Depends(get_current_user_async_upload),
+):
+    """
+    Bulk-create patients (and their guardian accounts) from a CSV or NDJSON body.
+    Returns a job to poll; per-row results are at /patients/imports/{job_id}/results.
+    """
+    if user.role != "clinic_admin":
+        raise HTTPException(status_code=403, detail="Only clinic admins can import patients")
+
+    fmt = patient_import.detect_format(request, format)
+    path = await patient_import.spool_upload(request, fmt)
+
+    # The session is opened only now, so no pool connection waits on the upload
+    async with AsyncSessionLocal() as db:
+        db.info["user_id"] = user.id
+        job = PatientImportJob(id=uuid_str(), actor_user_id=user.id, format=fmt)
+        db.add(job)
+        await db.commit()
+    patient_import.start_import(job.id, path, fmt)
+
+    return PatientImportJobOut.model_validate(job, from_attributes=True)
+
+
+def _own_import_job(db: Session, user, job_id: str) -> PatientImportJob:
+    job = db.get(PatientImportJob, job_id)
+    if not job or job.actor_user_id != user.id:
+        raise HTTPException(status_code=404, detail="Import job not found")
+    return job
+
+
+@router.get("/imports/{job_id}", response_model=PatientImportJobOut)
+def get_patient_import(
+    job_id: str,
+    db: Session = Depends(get_read_db),
+    user=Depends(get_current_user_read),
+):
+    return PatientImportJobOut.model_validate(_own_import_job(db, user, job_id), from_attributes=True)
+
+
+@router.get("/imports/{job_id}/results")
+def get_patient_import_results(
+    job_id: str,
+    db: Session = Depends(get_read_db),
+    user=Depends(get_current_user_read),
+):
+    """
+    Per-row results as NDJSON in input order. While the job runs, this is the
+    rows processed so far.
+    """
+    _own_import_job(db, user, job_id)
+
+    def _lines():
+        # Own session: the stream outlives the request-scoped one.
+        results_db = ReadSessionLocal()
+        try:
+            for row in crud.stream_import_results(results_db, job_id):
+                yield json.dumps({k: v for k, v in row.items() if k != "job_id"}) + "\n"
+        finally:
+            results_db.close()
+
+    return StreamingResponse(
+        _lines(),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="patient_import_{job_id}.ndjson"'},
+    )
+
+
+@router.post("/pointers/bulk")
+async def add_pointers_bulk(
+    request: Request,
+    user=Depends(get_current_user_async_upload),
+):
+    """
+    Register many record pointers from an NDJSON body, one BulkPointerIn per line.
+    Streams back one NDJSON result per line in input order, then a summary line.
+    """
+    ctype = uploads.content_type(request)
+    if ctype and ctype not in uploads.NDJSON_CONTENT_TYPES:
+        raise HTTPException(status_code=415, detail="Send application/x-ndjson")
+    if user.role not in ("guardian", "patient"):
+        raise HTTPException(status_code=403, detail="Not allowed")
+
+    path = await uploads.spool_upload(
+        request, prefix="pointer-ingest-", suffix=".ndjson", max_bytes=pointer_ingest.MAX_UPLOAD_BYTES
+    )
+    return StreamingResponse(pointer_ingest.ingest(path, user), media_type="application/x-ndjson")
 
 
 @router.post("/{patient_identifier}/pointers")
@@ -113,15 +271,25 @@ def add_pointer(
         issuer=data.issuer,
     )
 
-    crud.add_pointer(db, p.id, pointer)
+    pointer = crud.add_pointer(db, p.id, pointer)
 
     crud.log(
         db,
         actor_user_id=user.id,
         patient_id=p.id,
         action="POINTER_ADD",
-        details=f"{data.record_type}:{data.fhir_resource_type}/{data.fhir_resource_id}",
+        data={
+            "pointer_id": pointer.id,
+            "record_type": data.record_type,
+            "fhir_base_url": data.fhir_base_url,
+            "fhir_resource_type": data.fhir_resource_type,
+            "fhir_resource_id": data.fhir_resource_id,
+            "issuer": data.issuer,
+            "patient_public_id": p.public_id,
+        },
+        strict=True,
     )
+    db.commit()
 
     return {
         "status": "ok",
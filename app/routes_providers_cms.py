@@ -1,12 +1,15 @@
-from fastapi import APIRouter, Depends, Query
+import json
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import JSONResponse, StreamingResponse
 import httpx
 
 from .deps import get_current_user  # IMPORTANT: use deps (not routes_auth)
+from .schemas import NpiLookupIn
+from . import npi_autocomplete, npi_export, npi_records, npi_registry, zip_geo
 
 router = APIRouter(prefix="/providers/cms", tags=["providers"])
 
-CMS_NPI_URL = "https://npiregistry.cms.hhs.gov/api/"
-
 @router.get("/search")
 async def search_providers_cms(
     first_name: str | None = Query(default=None),
@@ -16,8 +19,13 @@ async def search_providers_cms(
     postal_code: str | None = Query(default=None),
     limit: int = Query(default=10, ge=1, le=50),
     skip: int = Query(default=0, ge=0),
+    fields: str | None = Query(default=None, description="Comma-separated result fields, e.g. 'npi,name,taxonomy'"),
+    include_raw: bool = Query(default=False, description="Add the full upstream record as 'raw'"),
+    near: str | None = Query(default=None, min_length=5, max_length=10, description="ZIP code; nearest providers first"),
+    radius_km: float = Query(default=25, gt=0, le=500),
     user=Depends(get_current_user),
 ):
+    selected = npi_records.parse_fields(fields, npi_records.PROVIDER_FIELDS, include_raw, near=bool(near))
     params = {
         "version": "2.1",
         "enumeration_type": "NPI-1",
@@ -30,52 +38,95 @@ async def search_providers_cms(
     if state: params["state"] = state
     if postal_code: params["postal_code"] = postal_code
 
-    async with httpx.AsyncClient(timeout=12.0) as client:
-        r = await client.get(CMS_NPI_URL, params=params)
-        r.raise_for_status()
-        data = r.json()
+    if near:
+        # Local NPPES mirror, nearest first (app/zip_geo.py)
+        data = await zip_geo.search_near(params, near, radius_km)
+    else:
+        try:
+            data = await npi_registry.search(params)
+        except httpx.HTTPError as e:
+            raise HTTPException(status_code=502, detail=f"CMS NPI Registry request failed: {str(e)}")
 
-    results = []
-    for item in data.get("results", []) or []:
-        basic = item.get("basic", {}) or {}
-        tax = item.get("taxonomies", []) or []
-        addresses = item.get("addresses", []) or []
+    results = [npi_records.normalize(x, selected) for x in data.get("results") or []]
 
-        loc = next((a for a in addresses if a.get("address_purpose") == "LOCATION"), None) or \
-              next((a for a in addresses if a.get("address_purpose") == "MAILING"), None) or {}
+    # Plain JSON types already; skip FastAPI's jsonable_encoder pass over every result
+    return JSONResponse(
+        {
+            "source": "mirror" if near else npi_registry.source(),
+            "result_count": data.get("result_count", len(results)),
+            "results": results,
+        }
+    )
 
-        name = " ".join([basic.get("first_name") or "", basic.get("middle_name") or "", basic.get("last_name") or ""]).strip()
-        cred = basic.get("credential")
-        if cred:
-            name = f"{name}, {cred}"
 
-        primary_tax = next((t for t in tax if t.get("primary")), None) or (tax[0] if tax else {})
+@router.post("/lookup")
+async def lookup_npis(
+    payload: NpiLookupIn,
+    fields: str | None = Query(default=None, description="Comma-separated result fields, e.g. 'npi,name,address'"),
+    include_raw: bool = Query(default=False, description="Add the full upstream record as 'raw'"),
+    user=Depends(get_current_user),
+):
+    """
+    Details for up to 500 known NPIs (individuals or organizations) in one call.
+    results maps each NPI to its record, or null when the registry does not know
+    it; NPIs whose upstream request failed are in errors instead.
+    """
+    selected = npi_records.parse_fields(fields, npi_records.LOOKUP_FIELDS, include_raw)
+    found, errors = await npi_registry.lookup(payload.npis)
+    return JSONResponse(
+        {
+            "source": npi_registry.source(),
+            "results": {npi: npi_records.normalize(r, selected) if r else None for npi, r in found.items()},
+            "errors": errors,
+        }
+    )
 
-        results.append({
-            "npi": item.get("number"),
-            "name": name or basic.get("name") or "—",
-            "status": basic.get("status"),
-            "last_updated": basic.get("last_updated"),
-            "address": {
-                "line1": loc.get("address_1"),
-                "line2": loc.get("address_2"),
-                "city": loc.get("city"),
-                "state": loc.get("state"),
-                "postal_code": loc.get("postal_code"),
-                "country_code": loc.get("country_code"),
-                "telephone_number": loc.get("telephone_number"),
-            },
-            "taxonomy": {
-                "code": primary_tax.get("code"),
-                "desc": primary_tax.get("desc"),
-                "primary": primary_tax.get("primary", False),
-            },
-            "raw": item,
-        })
 
-    return {
-        "source": "cms_npi_registry",
-        "query": params,
-        "result_count": data.get("result_count", len(results)),
-        "results": results,
-    }
+@router.get("/autocomplete")
+async def autocomplete_providers_cms(
+    q: str = Query(..., min_length=1),
+    state: str | None = Query(default=None, min_length=2, max_length=2),
+    city: str | None = Query(default=None),
+    limit: int = Query(default=10, ge=1, le=50),
+    user=Depends(get_current_user),
+):
+    # In-process name index (app/npi_autocomplete.py); no request to the CMS API
+    if not npi_autocomplete.built():
+        raise HTTPException(status_code=503, detail="Autocomplete index is still building", headers={"Retry-After": "5"})
+    return npi_autocomplete.search("NPI-1", q, limit, state=state, city=city)
+
+
+@router.get("/export")
+async def export_providers_cms(
+    first_name: str | None = Query(default=None, min_length=2, description="First name prefix"),
+    last_name: str | None = Query(default=None, min_length=2, description="Last name prefix"),
+    city: str | None = Query(default=None),
+    state: str | None = Query(default=None, min_length=2, max_length=2),
+    postal_code: str | None = Query(default=None, description="ZIP or ZIP prefix, e.g. '606'"),
+    fields: str | None = Query(default=None, description="Comma-separated result fields, e.g. 'npi,name,taxonomy'"),
+    include_raw: bool = Query(default=False, description="Add the full upstream record as 'raw'"),
+    user=Depends(get_current_user),
+):
+    """
+    Every matching individual provider (NPI-1) as NDJSON, each NPI once, then a
+    summary line; the provider counterpart of GET /hospitals/cms/export
+    (app/npi_export.py).
+    """
+    if user.role != "clinic_admin":
+        raise HTTPException(status_code=403, detail="Only clinic admins can export search results")
+    if not any((first_name, last_name, city, state, postal_code)):
+        raise HTTPException(status_code=400, detail="Pass at least one of first_name, last_name, city, state, postal_code")
+    selected = npi_records.parse_fields(fields, npi_records.PROVIDER_FIELDS, include_raw)
+    params = {"version": "2.1", "enumeration_type": "NPI-1"}
+    if first_name: params["first_name"] = first_name
+    if last_name: params["last_name"] = last_name
+    if city: params["city"] = city
+    if state: params["state"] = state
+    # matched as a prefix, as the splitting does
+    if postal_code: params["postal_code"] = postal_code.strip().rstrip("*") + "*"
+
+    async def _lines():
+        async for r in npi_export.export(params):
+            yield json.dumps(r if "summary" in r else npi_records.normalize(r, selected)) + "\n"
+
+    return StreamingResponse(_lines(), media_type="application/x-ndjson")
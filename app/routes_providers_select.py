@@ -2,13 +2,13 @@ from fastapi import APIRouter, Depends
 from pydantic import BaseModel
 from sqlalchemy.orm import Session
 
-from .db import get_db
+from .db import get_db, get_read_db
 from .crud import get_provider_selection, upsert_provider_selection, clear_provider_selection
 
 # IMPORTANT: match whatever your hospital selection routes use.
 # Your earlier error was importing get_current_user from routes_auth.
 # Your project already uses deps_auth in working routes.
-from .deps import get_current_user
+from .deps import get_current_user, get_current_user_read
 from .crud import get_patient_by_user_id  # this should already exist in your crud.py
 
 
@@ -29,8 +29,8 @@ class ProviderSelectIn(BaseModel):
 
 @router.get("/me")
 def get_my_provider(
-    db: Session = Depends(get_db),
-    user=Depends(get_current_user),
+    db: Session = Depends(get_read_db),
+    user=Depends(get_current_user_read),
 ):
     patient = get_patient_by_user_id(db, user.id)
     if not patient:
@@ -79,6 +79,7 @@ def set_my_provider(
         state=payload.state,
         postal_code=payload.postal_code,
     )
+    db.commit()
     return {"status": "ok", "selected": {"npi": row.npi, "name": row.name}}
 
 
@@ -92,4 +93,5 @@ def clear_my_provider(
         return {"status": "ok", "cleared": False}
 
     cleared = clear_provider_selection(db, patient.id)
+    db.commit()
     return {"status": "ok", "cleared": cleared}
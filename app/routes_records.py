@@ -1,16 +1,18 @@
 # app/routes_records.py
 import os
-import httpx
 from datetime import datetime, timezone
 
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from .db import get_db
-from .deps import get_current_user
-from .models import RecordPointer, Patient
+from .db import get_db, get_async_db, get_async_read_db
+from .deps import get_current_user, get_current_user_async
+from .models import Patient
 from . import crud
-from .fhir_client import fetch_fhir_resource
+from . import crud_async
+from .fhir_client import fetch_fhir_resource, get_client, missing_resource, resource_url
+from .pointer_health import is_known_dead
 from .schemas import SelfPointerIn, SelfPointerOut
 from .schemas import CatalogCreateIn, CatalogCreateOut
 
@@ -18,22 +20,53 @@ router = APIRouter(prefix="/records", tags=["records"])
 
 FHIR_BASE_URL = os.getenv("FHIR_BASE_URL", "http://localhost:8080/fhir").rstrip("/")
 
+async def _fetch_record(ptr) -> dict:
+    if is_known_dead(ptr):
+        # The health checker already found it gone; answer without an upstream call.
+        resource = missing_resource(
+            ptr.fhir_resource_type,
+            ptr.fhir_resource_id,
+            resource_url(ptr.fhir_base_url, ptr.fhir_resource_type, ptr.fhir_resource_id),
+            cached=True,
+            checked_at=ptr.last_checked_at.isoformat() if ptr.last_checked_at else None,
+        )
+    else:
+        resource = await fetch_fhir_resource(ptr.fhir_base_url, ptr.fhir_resource_type, ptr.fhir_resource_id)
+    return {
+        "issuer": ptr.issuer,
+        "pointer_id": ptr.id,
+        "resource": resource,
+        "missing": bool(resource.get("_error")),
+    }
+
+
+async def _fetch_records(pointers) -> list[dict]:
+    results = []
+    for ptr in pointers:
+        results.append(await _fetch_record(ptr))
+    return results
+
+
 @router.get("/patients/{patient_identifier}")
 async def get_records(
     patient_identifier: str,
     scope: str,
-    db: Session = Depends(get_db),
-    user=Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+    read_db: AsyncSession = Depends(get_async_read_db),
+    user=Depends(get_current_user_async),
 ):
+    # Authorization and the consent check read the primary: read-your-writes only
+    # covers the writer, so a revoke must not be hidden from the doctor by replica
+    # lag. Only the pointer listing goes to the replica.
     if user.role != "doctor":
         raise HTTPException(status_code=403, detail="Only doctors can view records")
 
-    p = crud.get_patient_by_identifier(db, patient_identifier)
+    p = await crud_async.get_patient_by_identifier(db, patient_identifier)
     if not p:
         raise HTTPException(status_code=404, detail="Patient not found")
 
     now = datetime.now(timezone.utc)
-    if not crud.has_valid_consent(db, p.id, user.id, scope, now):
+    if not await crud_async.has_valid_consent(db, p.id, user.id, scope, now):
         raise HTTPException(status_code=403, detail="No valid consent for this scope")
 
     scope_to_type = {
@@ -46,33 +79,16 @@ async def get_records(
 
     record_type = scope_to_type[scope]
 
-    pointers = (
-        db.query(RecordPointer)
-        .filter(RecordPointer.patient_id == p.id)
-        .filter(RecordPointer.record_type == record_type)
-        .all()
-    )
+    pointers = await crud_async.list_pointers(read_db, p.id, record_type)
 
-    results = []
-    for ptr in pointers:
-        resource = await fetch_fhir_resource(
-            ptr.fhir_base_url, ptr.fhir_resource_type, ptr.fhir_resource_id
-        )
-        results.append(
-            {
-                "issuer": ptr.issuer,
-                "pointer_id": ptr.id,
-                "resource": resource,
-                "missing": bool(resource.get("_error")),
-            }
-        )
+    results = await _fetch_records(pointers)
 
-    crud.log(
+    await crud_async.log(
         db,
         actor_user_id=user.id,
         patient_id=p.id,
         action="RECORD_VIEW",
-        details=f"scope={scope} count={len(results)} patient_public_id={p.public_id}",
+        data={"scope": scope, "count": len(results), "patient_public_id": p.public_id},
     )
 
     return {
@@ -87,13 +103,14 @@ async def get_records(
 @router.get("/me")
 async def get_my_records(
     scope: str,
-    db: Session = Depends(get_db),
-    user=Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+    read_db: AsyncSession = Depends(get_async_read_db),
+    user=Depends(get_current_user_async),
 ):
     if user.role != "patient":
         raise HTTPException(status_code=403, detail="Only patients can view /records/me")
 
-    p = db.query(Patient).filter(Patient.user_id == user.id).first()
+    p = await crud_async.get_patient_by_user_id(db, user.id)
     if not p:
         raise HTTPException(
             status_code=404,
@@ -113,33 +130,16 @@ async def get_my_records(
 
     record_type = scope_to_type[scope]
 
-    pointers = (
-        db.query(RecordPointer)
-        .filter(RecordPointer.patient_id == p.id)
-        .filter(RecordPointer.record_type == record_type)
-        .all()
-    )
+    pointers = await crud_async.list_pointers(read_db, p.id, record_type)
 
-    results = []
-    for ptr in pointers:
-        resource = await fetch_fhir_resource(
-            ptr.fhir_base_url, ptr.fhir_resource_type, ptr.fhir_resource_id
-        )
-        results.append(
-            {
-                "issuer": ptr.issuer,
-                "pointer_id": ptr.id,
-                "resource": resource,
-                "missing": bool(resource.get("_error")),
-            }
-        )
+    results = await _fetch_records(pointers)
 
-    crud.log(
+    await crud_async.log(
         db,
         actor_user_id=user.id,
         patient_id=p.id,
         action="PATIENT_RECORD_VIEW",
-        details=f"scope={scope} count={len(results)} patient_public_id={p.public_id}",
+        data={"scope": scope, "count": len(results), "patient_public_id": p.public_id},
     )
 
     return {
@@ -200,11 +200,17 @@ def add_my_pointer(
         actor_user_id=user.id,
         patient_id=p.id,
         action="POINTER_CREATE_SELF",
-        details=(
-            f"scope={scope} fhir={fhir_resource_type}/{fhir_id} "
-            f"issuer={data.issuer or 'Self (Patient)'} patient_public_id={p.public_id}"
-        ),
+        data={
+            "pointer_id": ptr.id,
+            "scope": scope,
+            "fhir_resource_type": fhir_resource_type,
+            "fhir_resource_id": fhir_id,
+            "issuer": data.issuer or "Self (Patient)",
+            "patient_public_id": p.public_id,
+        },
+        strict=True,
     )
+    db.commit()
 
     return {"status": "ok", "pointer_id": ptr.id, "record_type": ptr.record_type}
 
@@ -212,13 +218,13 @@ def add_my_pointer(
 @router.post("/me/catalog/create", response_model=CatalogCreateOut)
 async def create_from_catalog_and_link(
     data: CatalogCreateIn,
-    db: Session = Depends(get_db),
-    user=Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+    user=Depends(get_current_user_async),
 ):
     if user.role != "patient":
         raise HTTPException(status_code=403, detail="Only patients can create and link their records")
 
-    p = db.query(Patient).filter(Patient.user_id == user.id).first()
+    p = await crud_async.get_patient_by_user_id(db, user.id)
     if not p:
         raise HTTPException(
             status_code=404,
@@ -268,12 +274,11 @@ async def create_from_catalog_and_link(
         }
 
     # Create on our mock FHIR (or whatever FHIR_BASE_URL points to)
-    async with httpx.AsyncClient(timeout=10.0) as client:
-        r = await client.post(
-            f"{FHIR_BASE_URL}/{fhir_type}",
-            json=payload,
-            headers={"Accept": "application/json", "Content-Type": "application/json"},
-        )
+    r = await get_client().post(
+        f"{FHIR_BASE_URL}/{fhir_type}",
+        json=payload,
+        headers={"Accept": "application/json", "Content-Type": "application/json"},
+    )
 
     # ✅ Avoid opaque 500s: return a useful upstream error if FHIR fails
     if r.status_code >= 400:
@@ -299,7 +304,7 @@ async def create_from_catalog_and_link(
             detail="FHIR resource created but id could not be determined",
         )
 
-    ptr = crud.create_pointer_for_patient(
+    ptr = await crud_async.create_pointer_for_patient(
         db,
         patient_id=p.id,
         record_type=record_type,
@@ -309,13 +314,22 @@ async def create_from_catalog_and_link(
         issuer=issuer,
     )
 
-    crud.log(
+    await crud_async.log(
         db,
         actor_user_id=user.id,
         patient_id=p.id,
         action="FHIR_CREATE_AND_POINTER",
-        details=f"scope={scope} display={display} fhir={fhir_type}/{created_id} patient_public_id={p.public_id}",
+        data={
+            "pointer_id": ptr.id,
+            "scope": scope,
+            "display": display,
+            "fhir_resource_type": fhir_type,
+            "fhir_resource_id": created_id,
+            "patient_public_id": p.public_id,
+        },
+        strict=True,
     )
+    await db.commit()
 
     return {
         "status": "ok",
@@ -1,8 +1,8 @@
 from datetime import datetime
 from datetime import date as date_type
-from typing import Literal, Optional
+from typing import Annotated, Any, Literal, Optional
 
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, EmailStr, Field
 
 Role = Literal["guardian", "doctor", "patient", "clinic_admin"]
 Scope = Literal["immunizations", "allergies", "conditions"]
@@ -25,6 +25,20 @@ class TokenOut(BaseModel):
     token_type: str = "bearer"
 
 
+class InviteIn(BaseModel):
+    email: EmailStr
+
+
+class InviteOut(BaseModel):
+    email: str
+    expires_at: datetime  # of the token emailed to `email`
+
+
+class SetPasswordIn(BaseModel):
+    token: str
+    password: str = Field(..., min_length=8)
+
+
 class PatientOut(BaseModel):
     id: str
     public_id: str
@@ -45,16 +59,57 @@ class CreatePointerIn(BaseModel):
     issuer: str
 
 
+class BulkPointerIn(CreatePointerIn):
+    """One NDJSON line of POST /patients/pointers/bulk."""
+    patient: str  # internal id or public id
+
+
 class ConsentIn(BaseModel):
     grantee_email: EmailStr
     scope: Scope
     expires_at: datetime
 
 
+class ConsentBulkIn(BaseModel):
+    grants: list[ConsentIn] = Field(..., min_length=1, max_length=200)
+
+
+class ConsentBulkRevokeIn(BaseModel):
+    consent_ids: list[str] = Field(..., min_length=1, max_length=200)
+
+
 class PatientSelfRegisterIn(BaseModel):
     date_of_birth: date_type
 
 
+Npi = Annotated[str, Field(pattern=r"^\d{10}$")]
+
+
+class NpiLookupIn(BaseModel):
+    npis: list[Npi] = Field(..., min_length=1, max_length=500)
+
+
+class PatientImportRowIn(BaseModel):
+    """One CSV row / NDJSON line of POST /patients/imports."""
+    external_id: str | None = None
+    date_of_birth: date_type | None = None
+    guardian_email: EmailStr | None = None
+
+
+class PatientImportJobOut(BaseModel):
+    id: str
+    format: str
+    status: str
+    rows_processed: int
+    patients_created: int
+    guardians_created: int
+    errors: int
+    error: str | None = None
+    created_at: datetime
+    updated_at: datetime
+    finished_at: datetime | None = None
+
+
 class ConsentOut(BaseModel):
     id: str
     patient_id: str
@@ -72,6 +127,55 @@ class ConsentListOut(BaseModel):
     consents: list[ConsentOut]
 
 
+class ConsentHistoryOut(ConsentListOut):
+    next_cursor: str | None = None
+
+
+class PatientProfileOut(BaseModel):
+    id: str
+    public_id: str
+    date_of_birth: date_type | None = None
+    created_at: datetime
+
+
+class PatientSummaryOut(BaseModel):
+    """GET /patients/me/summary: what the patient home screen shows."""
+    profile: PatientProfileOut
+    hospital: dict[str, Any] | None = None
+    provider: dict[str, Any] | None = None
+    consents: list[ConsentOut]
+    record_counts: dict[str, int]  # per scope
+    records_last_added: dict[str, datetime | None]  # per scope
+
+
+class WorklistPatientOut(BaseModel):
+    patient_id: str
+    patient_public_id: str
+    scopes: list[str]
+    soonest_expiry: datetime
+    record_counts: dict[str, int] = {}  # per consented scope
+
+
+class WorklistOut(BaseModel):
+    patients: list[WorklistPatientOut]
+    next_cursor: str | None = None
+
+
+class AuditEventOut(BaseModel):
+    id: str
+    actor_user_id: str
+    patient_id: str
+    action: str
+    details: str = ""
+    data: dict[str, Any] | None = None
+    created_at: datetime
+
+
+class AuditPageOut(BaseModel):
+    events: list[AuditEventOut]
+    next_cursor: str | None = None
+
+
 class SelfPointerIn(BaseModel):
     scope: Literal["immunizations", "allergies", "conditions"]
     fhir_resource_id: str
@@ -5,21 +5,25 @@ from typing import Any, Dict
 from jose import jwt
 from passlib.context import CryptContext
 
+# One definition of what verifies, including the unusable-password rule for
+# accounts created by the bulk patient import
+from .auth import verify_password  # noqa: F401
+
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 JWT_SECRET = os.getenv("JWT_SECRET", "dev-secret-change-me")
 JWT_ALG = os.getenv("JWT_ALG", "HS256")
 JWT_EXPIRES_MIN = int(os.getenv("JWT_EXPIRES_MIN", "60"))
+INVITE_EXPIRES_H = int(os.getenv("INVITE_EXPIRES_H", "72"))
+
+# "purpose" claim of invite tokens; deps rejects tokens carrying any purpose as bearer tokens
+SET_PASSWORD_PURPOSE = "set_password"
 
 
 def hash_password(password: str) -> str:
     return pwd_context.hash(password)
 
 
-def verify_password(password: str, password_hash: str) -> bool:
-    return pwd_context.verify(password, password_hash)
-
-
 def create_access_token(subject: str, extra: Dict[str, Any] | None = None) -> str:
     now = datetime.now(timezone.utc)
     exp = now + timedelta(minutes=JWT_EXPIRES_MIN)
@@ -33,3 +37,11 @@ def create_access_token(subject: str, extra: Dict[str, Any] | None = None) -> st
         payload.update(extra)
 
     return jwt.encode(payload, JWT_SECRET, algorithm=JWT_ALG)
+
+
+def create_invite_token(subject: str) -> tuple[str, datetime]:
+    """One-time set-password token for an account without a usable password, and its expiry."""
+    now = datetime.now(timezone.utc)
+    exp = now + timedelta(hours=INVITE_EXPIRES_H)
+    payload = {"sub": subject, "purpose": SET_PASSWORD_PURPOSE, "iat": int(now.timestamp()), "exp": int(exp.timestamp())}
+    return jwt.encode(payload, JWT_SECRET, algorithm=JWT_ALG), exp
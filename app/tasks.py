@@ -0,0 +1,128 @@
+# app/tasks.py
+"""
+In-process periodic background jobs, started/stopped from main.py.
+
+Each job is a plain sync function run in a worker thread (they use the sync
+SQLAlchemy session), or a coroutine function awaited on the event loop,
+rescheduled every `interval` seconds. Every worker runs every job: a second
+consent sweep finds nothing left to delete, pointer checks claim their rows with
+SKIP LOCKED, audit partition maintenance takes advisory locks (audit_partitions),
+and the autocomplete index is per process.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime, timezone
+from typing import Callable
+
+from .db import SessionLocal
+from . import crud
+from . import audit_partitions
+from . import pointer_health
+from . import npi_autocomplete
+
+log = logging.getLogger(__name__)
+
+BACKGROUND_TASKS = os.getenv("BACKGROUND_TASKS", "true").lower() in ("1", "true", "yes", "on")
+CONSENT_SWEEP_INTERVAL_S = float(os.getenv("CONSENT_SWEEP_INTERVAL_S", "60"))
+CONSENT_SWEEP_BATCH_SIZE = int(os.getenv("CONSENT_SWEEP_BATCH_SIZE", "1000"))
+AUDIT_PARTITION_INTERVAL_S = float(os.getenv("AUDIT_PARTITION_INTERVAL_S", str(6 * 3600)))
+POINTER_CHECK_INTERVAL_S = float(os.getenv("POINTER_CHECK_INTERVAL_S", "300"))
+AUTOCOMPLETE_REFRESH_S = float(os.getenv("AUTOCOMPLETE_REFRESH_S", "300"))
+
+_running: list[asyncio.Task] = []
+
+
+def sweep_expired_consents(batch_size: int = CONSENT_SWEEP_BATCH_SIZE) -> int:
+    """
+    Drop lapsed grants from the active_consents projection in batches,
+    one short transaction per batch. Returns the number of grants removed.
+    """
+    now = datetime.now(timezone.utc)
+    started = time.perf_counter()
+    total = 0
+    batches = 0
+
+    db = SessionLocal()
+    try:
+        while True:
+            n = crud.sweep_expired_active_consents(db, now, batch_size)
+            db.commit()
+            total += n
+            batches += 1
+            if n < batch_size:
+                break
+    finally:
+        db.close()
+
+    log.info(
+        "consent sweep: removed=%d batches=%d elapsed_ms=%.1f",
+        total,
+        batches,
+        (time.perf_counter() - started) * 1000,
+    )
+    return total
+
+
+def maintain_audit_partitions() -> None:
+    """
+    Keep upcoming monthly audit partitions created and archive the ones past retention.
+    """
+    started = time.perf_counter()
+    created = audit_partitions.ensure_partitions()
+    archived = audit_partitions.archive_expired_partitions()
+    log.info(
+        "audit partition maintenance: created=%d archived=%d elapsed_ms=%.1f",
+        len(created),
+        len(archived),
+        (time.perf_counter() - started) * 1000,
+    )
+
+
+async def _run_periodically(name: str, interval_s: float, job: Callable[[], object]) -> None:
+    while True:
+        try:
+            if asyncio.iscoroutinefunction(job):
+                await job()
+            else:
+                await asyncio.to_thread(job)
+        except Exception:
+            log.exception("background job %s failed", name)
+        await asyncio.sleep(interval_s)
+
+
+def start_background_tasks() -> None:
+    if not BACKGROUND_TASKS:
+        log.info("BACKGROUND_TASKS disabled; not starting periodic jobs.")
+        return
+
+    _running.append(
+        asyncio.create_task(
+            _run_periodically("consent_sweep", CONSENT_SWEEP_INTERVAL_S, sweep_expired_consents)
+        )
+    )
+    _running.append(
+        asyncio.create_task(
+            _run_periodically("audit_partitions", AUDIT_PARTITION_INTERVAL_S, maintain_audit_partitions)
+        )
+    )
+    _running.append(
+        asyncio.create_task(
+            _run_periodically("pointer_health", POINTER_CHECK_INTERVAL_S, pointer_health.check_pointers)
+        )
+    )
+    _running.append(
+        asyncio.create_task(
+            _run_periodically("npi_autocomplete", AUTOCOMPLETE_REFRESH_S, npi_autocomplete.refresh)
+        )
+    )
+
+
+async def stop_background_tasks() -> None:
+    for task in _running:
+        task.cancel()
+    await asyncio.gather(*_running, return_exceptions=True)
+    _running.clear()
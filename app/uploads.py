@@ -0,0 +1,72 @@
+# app/uploads.py
+"""
+Helpers for endpoints that take large request bodies (bulk imports).
+"""
+import json
+import os
+import tempfile
+from typing import Iterator
+
+from fastapi import HTTPException, Request
+from pydantic import ValidationError
+
+SPOOL_DIR = os.getenv("UPLOAD_SPOOL_DIR") or None  # None: the system temp dir
+
+NDJSON_CONTENT_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonl")
+
+
+def content_type(request: Request) -> str:
+    return (request.headers.get("content-type") or "").split(";")[0].strip().lower()
+
+
+async def spool_upload(request: Request, *, prefix: str, suffix: str, max_bytes: int) -> str:
+    """
+    Stream the request body to a temp file without holding it in memory and
+    return its path. The caller deletes the file.
+    """
+    f = tempfile.NamedTemporaryFile(prefix=prefix, suffix=suffix, dir=SPOOL_DIR, delete=False)
+    size = 0
+    try:
+        with f:
+            async for chunk in request.stream():
+                size += len(chunk)
+                if size > max_bytes:
+                    raise HTTPException(status_code=413, detail=f"Upload exceeds {max_bytes} bytes")
+                f.write(chunk)
+    except BaseException:
+        os.unlink(f.name)
+        raise
+    if size == 0:
+        os.unlink(f.name)
+        raise HTTPException(status_code=400, detail="Empty upload")
+    return f.name
+
+
+def read_lines(path: str) -> Iterator[tuple[int, str]]:
+    """Yield (line number, line) per non-blank line of an NDJSON upload, 1-based."""
+    with open(path, encoding="utf-8-sig") as f:
+        n = 0
+        for line in f:
+            if not line.strip():
+                continue
+            n += 1
+            yield n, line
+
+
+def read_ndjson(path: str) -> Iterator[tuple[int, dict | None, str | None]]:
+    """Yield (line number, object, parse error) per non-blank line, 1-based."""
+    for n, line in read_lines(path):
+        try:
+            rec = json.loads(line)
+        except ValueError as e:
+            yield n, None, f"Invalid JSON: {e}"
+            continue
+        if not isinstance(rec, dict):
+            yield n, None, "Each line must be a JSON object"
+            continue
+        yield n, rec, None
+
+
+def validation_message(e: ValidationError) -> str:
+    """One-line summary of a row's validation errors for per-row results."""
+    return "; ".join(f"{'.'.join(str(x) for x in err['loc'])}: {err['msg']}" for err in e.errors())
@@ -0,0 +1,169 @@
+# app/zip_geo.py
+"""
+ZIP code centroids and the `near=<zip>&radius_km=` proximity search of the
+CMS search routes.
+
+Centroids come from the Census Gazetteer ZCTA file
+(https://www.census.gov/geographies/reference-files/time-series/geo/gazetteer-files.html,
+"ZIP Code Tabulation Areas", ~34k rows):
+
+    python -m app.maintenance zip-centroids-import 2024_Gaz_zcta_national.zip
+
+Each worker keeps them in memory in a grid of ZIP_GRID_CELL_DEG-degree cells,
+so finding the ZIPs within a radius only looks at the cells that overlap its
+bounding box. Providers are then read from the NPPES mirror by ZIP, nearest ZIP
+first (nppes_mirror.search_near). NPPES has no coordinates, so a provider's
+distance is that of its practice ZIP's centroid.
+"""
+from __future__ import annotations
+
+import asyncio
+import csv
+import io
+import logging
+import math
+import os
+import threading
+import zipfile
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, TextIO, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from .db import ReadSessionLocal, SessionLocal
+from .models_nppes import NppesLoad, ZipCentroid
+from . import nppes_mirror
+
+log = logging.getLogger(__name__)
+
+CELL_DEG = float(os.getenv("ZIP_GRID_CELL_DEG", "0.5"))
+EARTH_RADIUS_KM = 6371.0088
+
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dp, dl = p2 - p1, math.radians(lon2 - lon1)
+    a = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+class ZipGrid:
+    """ZIP centroids bucketed by (lat, lon) cell."""
+
+    def __init__(self, points: Dict[str, Tuple[float, float]]):
+        self.points = points
+        self.cells: defaultdict[Tuple[int, int], List[str]] = defaultdict(list)
+        for z, (lat, lon) in points.items():
+            self.cells[self._cell(lat, lon)].append(z)
+
+    @staticmethod
+    def _cell(lat: float, lon: float) -> Tuple[int, int]:
+        return math.floor(lat / CELL_DEG), math.floor(lon / CELL_DEG)
+
+    def __len__(self) -> int:
+        return len(self.points)
+
+    def within(self, lat: float, lon: float, radius_km: float) -> List[Tuple[float, str]]:
+        """(distance_km, zip) of every centroid within `radius_km`, nearest first."""
+        # Bounding box of the circle on the sphere: latitude +-a, longitude
+        # +-asin(sin a / cos lat), or every longitude when it reaches a pole
+        a = radius_km / EARTH_RADIUS_KM
+        dlat = math.degrees(a)
+        s = math.sin(a) / max(math.cos(math.radians(lat)), 1e-12)
+        if s < 1:
+            dlon = math.degrees(math.asin(s))
+            west, east = lon - dlon, lon + dlon
+        else:
+            west, east = -180.0, 180.0
+        lat0, lon0 = self._cell(lat - dlat, west)
+        lat1, lon1 = self._cell(lat + dlat, east)
+        out = []
+        for i in range(lat0, lat1 + 1):
+            for j in range(lon0, lon1 + 1):
+                for z in self.cells.get((i, j), ()):
+                    d = haversine_km(lat, lon, *self.points[z])
+                    if d <= radius_km:
+                        out.append((d, z))
+        out.sort()
+        return out
+
+
+_grid: ZipGrid | None = None
+_grid_lock = threading.Lock()
+_mirror_ready = False
+
+
+def grid() -> ZipGrid:
+    """The centroid grid, loaded on first use (and retried while the table is empty)."""
+    global _grid
+    with _grid_lock:
+        if _grid is None or not _grid:
+            with ReadSessionLocal() as db:
+                _grid = ZipGrid({z: (lat, lon) for z, lat, lon in db.execute(select(ZipCentroid.zip, ZipCentroid.lat, ZipCentroid.lon))})
+            log.info("zip grid loaded: %d centroids", len(_grid))
+        return _grid
+
+
+def mirror_loaded() -> bool:
+    global _mirror_ready
+    if not _mirror_ready:
+        with ReadSessionLocal() as db:
+            _mirror_ready = db.scalar(select(NppesLoad.id).where(NppesLoad.status == "done").limit(1)) is not None
+    return _mirror_ready
+
+
+async def search_near(params: Dict[str, Any], near: str, radius_km: float) -> Dict[str, Any]:
+    """NPI Registry-shaped results from the mirror within `radius_km` of ZIP `near`, nearest first."""
+    g = await asyncio.to_thread(grid)
+    if not g or not await asyncio.to_thread(mirror_loaded):
+        raise HTTPException(
+            status_code=503,
+            detail="Proximity search needs the ZIP centroids and the NPPES mirror; see app/zip_geo.py",
+        )
+    origin = g.points.get(near.strip()[:5])
+    if origin is None:
+        raise HTTPException(status_code=400, detail=f"Unknown ZIP code: {near}")
+    return await nppes_mirror.search_near(params, g.within(*origin, radius_km))
+
+
+# ---- Gazetteer import ----
+
+@contextmanager
+def _open_gazetteer(path: str) -> Iterator[TextIO]:
+    if not zipfile.is_zipfile(path):
+        with open(path, newline="", encoding="utf-8") as f:
+            yield f
+        return
+    with zipfile.ZipFile(path) as zf:
+        name = next(n for n in zf.namelist() if n.lower().endswith(".txt"))
+        with zf.open(name) as raw:
+            yield io.TextIOWrapper(raw, encoding="utf-8", newline="")
+
+
+def import_centroids(path: str, batch_size: int = 5000) -> int:
+    """Upsert the Gazetteer ZCTA file (tab-separated, GEOID/INTPTLAT/INTPTLONG). Returns rows read."""
+    n = 0
+    with _open_gazetteer(path) as f, SessionLocal() as db:
+        reader = csv.DictReader(f, delimiter="\t")
+        # The last header of some vintages carries trailing blanks
+        reader.fieldnames = [h.strip() for h in reader.fieldnames or []]
+        batch = []
+        for rec in reader:
+            batch.append({"zip": rec["GEOID"].strip(), "lat": float(rec["INTPTLAT"]), "lon": float(rec["INTPTLONG"])})
+            if len(batch) >= batch_size:
+                n += _upsert(db, batch)
+                batch = []
+        n += _upsert(db, batch)
+        db.commit()
+    return n
+
+
+def _upsert(db, rows: list[dict]) -> int:
+    if not rows:
+        return 0
+    stmt = pg_insert(ZipCentroid).values(rows)
+    db.execute(stmt.on_conflict_do_update(index_elements=[ZipCentroid.zip], set_={"lat": stmt.excluded.lat, "lon": stmt.excluded.lon}))
+    return len(rows)
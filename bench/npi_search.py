@@ -0,0 +1,116 @@
+"""
+CMS search latency and upstream call count against a local NPPES stand-in.
+
+Start the stand-in and the API pointed at it:
+
+    python bench/npi_search.py --serve-upstream --upstream-port 8199 --upstream-latency-ms 300
+    NPI_REGISTRY_URL=http://127.0.0.1:8199/api/ uvicorn app.main:app --port 8000
+
+then run the clients:
+
+    python bench/npi_search.py --base-url http://127.0.0.1:8000 --upstream http://127.0.0.1:8199 --clients 16 --requests 2000
+
+Each client types hospital names one keystroke at a time (from the third
+character) against GET /hospitals/cms/search, the way the type-ahead does, so
+many requests repeat. Reports p50/p95 latency and how many of the searches
+reached the stand-in.
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import time
+
+import httpx
+
+NAMES = ["Northwestern Memorial", "Mercy General", "Saint Luke", "Mayo Clinic", "Cedars Sinai", "Mount Sinai"]
+
+
+def serve_upstream(port: int, latency_ms: float) -> None:
+    from fastapi import FastAPI, Request
+    import uvicorn
+
+    app = FastAPI()
+    calls = {"n": 0}
+
+    @app.get("/api/")
+    async def api(request: Request):
+        calls["n"] += 1
+        await asyncio.sleep(latency_ms / 1000)
+        q = dict(request.query_params)
+        name = q.get("organization_name") or q.get("last_name") or "x"
+        limit = int(q.get("limit", 10))
+        # number= (by-NPI lookup) answers with that one record
+        numbers = [q["number"]] if "number" in q else [str(1000000000 + i) for i in range(limit)]
+        results = [
+            {
+                "number": number,
+                "enumeration_type": q.get("enumeration_type"),
+                "basic": {"organization_name": f"{name.upper()} {i}", "status": "A"},
+                "addresses": [{"address_purpose": "LOCATION", "city": "CHICAGO", "state": "IL"}],
+                "taxonomies": [],
+            }
+            for i, number in enumerate(numbers)
+        ]
+        return {"result_count": len(results), "results": results}
+
+    @app.get("/calls")
+    async def get_calls():
+        return calls
+
+    uvicorn.run(app, port=port, log_level="warning")
+
+
+async def run(base_url: str, upstream: str, clients: int, requests: int) -> None:
+    latencies: list[float] = []
+    remaining = [requests]
+
+    async with httpx.AsyncClient(timeout=60) as up:
+        before = (await up.get(f"{upstream}/calls")).json()["n"]
+
+    async def worker(client: httpx.AsyncClient) -> None:
+        while remaining[0] > 0:
+            name = random.choice(NAMES)
+            for i in range(3, len(name) + 1):
+                if remaining[0] <= 0:
+                    return
+                remaining[0] -= 1
+                t0 = time.perf_counter()
+                r = await client.get("/hospitals/cms/search", params={"name": name[:i], "state": "IL"})
+                r.raise_for_status()
+                latencies.append(time.perf_counter() - t0)
+
+    started = time.perf_counter()
+    async with httpx.AsyncClient(base_url=base_url, timeout=60) as client:
+        await asyncio.gather(*(worker(client) for _ in range(clients)))
+    elapsed = time.perf_counter() - started
+
+    async with httpx.AsyncClient(timeout=60) as up:
+        upstream_calls = (await up.get(f"{upstream}/calls")).json()["n"] - before
+
+    latencies.sort()
+    print(f"requests: {len(latencies)} in {elapsed:.2f}s ({len(latencies) / elapsed:,.0f} req/s)")
+    print(f"p50:      {statistics.median(latencies) * 1000:.1f} ms")
+    print(f"p95:      {latencies[int(len(latencies) * 0.95) - 1] * 1000:.1f} ms")
+    print(f"upstream: {upstream_calls} calls")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--serve-upstream", action="store_true", help="run the NPPES stand-in instead of the clients")
+    parser.add_argument("--upstream-port", type=int, default=8199)
+    parser.add_argument("--upstream-latency-ms", type=float, default=300)
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--upstream", default="http://127.0.0.1:8199")
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+
+    if args.serve_upstream:
+        serve_upstream(args.upstream_port, args.upstream_latency_ms)
+    else:
+        asyncio.run(run(args.base_url, args.upstream, args.clients, args.requests))
+
+
+if __name__ == "__main__":
+    main()
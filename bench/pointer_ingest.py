@@ -0,0 +1,74 @@
+"""
+Bulk pointer ingestion throughput (POST /patients/pointers/bulk).
+
+Start the API first (RUN_DB_INIT=true on a scratch database), then:
+
+    python bench/pointer_ingest.py --base-url http://127.0.0.1:8000 --pointers 100000 --patients 100
+
+Registers a guardian with --patients patients, uploads --pointers pointers spread
+over them as one NDJSON body and reports pointers/s from first byte sent to the
+summary line.
+"""
+import argparse
+import json
+import time
+import uuid
+
+import httpx
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--pointers", type=int, default=100_000)
+    parser.add_argument("--patients", type=int, default=100)
+    args = parser.parse_args()
+
+    with httpx.Client(base_url=args.base_url, timeout=600) as client:
+        email = f"bench-guardian-{uuid.uuid4().hex[:8]}@example.com"
+        r = client.post("/auth/register", json={"email": email, "password": "bench-pass", "role": "guardian"})
+        r.raise_for_status()
+        headers = {"Authorization": f"Bearer {r.json()['access_token']}"}
+
+        patients = []
+        for _ in range(args.patients):
+            r = client.post("/patients", json={}, headers=headers)
+            r.raise_for_status()
+            patients.append(r.json()["public_id"])
+
+        body = "".join(
+            json.dumps(
+                {
+                    "patient": patients[i % len(patients)],
+                    "record_type": "immunization",
+                    "fhir_base_url": "http://fhir.example.org/fhir",
+                    "fhir_resource_type": "Immunization",
+                    "fhir_resource_id": f"bench-{i}",
+                    "issuer": "Bench Hospital",
+                }
+            )
+            + "\n"
+            for i in range(args.pointers)
+        ).encode()
+
+        started = time.perf_counter()
+        summary = None
+        with client.stream(
+            "POST",
+            "/patients/pointers/bulk",
+            content=body,
+            headers={**headers, "Content-Type": "application/x-ndjson"},
+        ) as r:
+            r.raise_for_status()
+            for line in r.iter_lines():
+                if line.startswith('{"summary"'):
+                    summary = json.loads(line)["summary"]
+        elapsed = time.perf_counter() - started
+
+    print(f"body:     {len(body) / 1e6:.1f} MB, {args.pointers} lines, {args.patients} patients")
+    print(f"summary:  {summary}")
+    print(f"elapsed:  {elapsed:.2f}s  ->  {args.pointers / elapsed:,.0f} pointers/s")
+
+
+if __name__ == "__main__":
+    main()
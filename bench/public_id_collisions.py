@@ -0,0 +1,141 @@
+"""
+Public patient id collision rate as the id space fills, and allocator throughput.
+
+MED-XXXX-XXX has 32**7 (~3.4e10) possible ids, far too many to fill, so both parts
+use a shrunken space of --chars random characters with the same alphabet.
+Collision behaviour only depends on the fill fraction, not on the size of the space.
+
+In-memory simulation only:
+
+    python bench/public_id_collisions.py
+
+Against a scratch database (tables created with RUN_DB_INIT=true), through
+crud.allocate_patient with --threads concurrent sessions:
+
+    DATABASE_URL=postgresql+psycopg2://... python bench/public_id_collisions.py --db --threads 16
+
+Reports, per fill level, the share of insert attempts that hit an existing id and the
+share of allocations that gave up after crud.PUBLIC_ID_ATTEMPTS attempts.
+"""
+import argparse
+import os
+import secrets
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.models import _ALPHABET  # noqa: E402
+
+FILL_LEVELS = (0.1, 0.25, 0.5, 0.75, 0.9, 0.95)
+
+
+def small_id_factory(chars: int):
+    def factory() -> str:
+        return "BENCH-" + "".join(secrets.choice(_ALPHABET) for _ in range(chars))
+
+    return factory
+
+
+def simulate(chars: int, samples: int, max_attempts: int) -> None:
+    space = len(_ALPHABET) ** chars
+    factory = small_id_factory(chars)
+    taken: set[str] = set()
+    print(f"simulation: space={space} ids, {samples} allocations per fill level")
+    print(f"{'fill':>6} {'collision/attempt':>18} {'avg attempts':>13} {'gave up':>9}")
+    for fill in FILL_LEVELS:
+        while len(taken) < int(space * fill):
+            taken.add(factory())
+        attempts = collisions = failures = 0
+        for _ in range(samples):
+            for _ in range(max_attempts):
+                attempts += 1
+                if factory() not in taken:
+                    break
+                collisions += 1
+            else:
+                failures += 1
+        print(f"{fill:>6.0%} {collisions / attempts:>18.4f} {attempts / samples:>13.3f} {failures / samples:>9.4%}")
+    real_space = len(_ALPHABET) ** 7
+    print(f"\nMED-XXXX-XXX space: {real_space:.3e} ids; 1M patients fill {1_000_000 / real_space:.6%} of it")
+
+
+def run_db(chars: int, samples: int, threads: int) -> None:
+    from sqlalchemy import delete, func, select
+
+    from app import crud
+    from app.db import SessionLocal
+    from app.models import Patient
+
+    space = len(_ALPHABET) ** chars
+    base = small_id_factory(chars)
+    lock = threading.Lock()
+    counts = {"attempts": 0}
+
+    def counting_factory() -> str:
+        with lock:
+            counts["attempts"] += 1
+        return base()
+
+    def allocate_one(_) -> bool:
+        with SessionLocal() as db:
+            try:
+                crud.allocate_patient(db, id_factory=counting_factory, guardian_user_id=None)
+            except RuntimeError:
+                db.rollback()
+                return False
+            db.commit()
+            return True
+
+    def bench_count(db) -> int:
+        return db.scalar(select(func.count()).select_from(Patient).where(Patient.public_id.like("BENCH-%")))
+
+    print(f"database: space={space} ids, {samples} allocations per fill level, {threads} threads")
+    print(f"{'fill':>6} {'collision/attempt':>18} {'gave up':>9} {'alloc/s':>9}")
+    with SessionLocal() as db:
+        db.execute(delete(Patient).where(Patient.public_id.like("BENCH-%")))
+        db.commit()
+    try:
+        with ThreadPoolExecutor(threads) as ex:
+            for fill in FILL_LEVELS:
+                with SessionLocal() as db:
+                    missing = int(space * fill) - bench_count(db)
+                # Fill up to the level (collisions here are not measured)
+                list(ex.map(allocate_one, range(max(missing, 0))))
+
+                counts["attempts"] = 0
+                started = time.perf_counter()
+                results = list(ex.map(allocate_one, range(samples)))
+                elapsed = time.perf_counter() - started
+                attempts = counts["attempts"]
+                ok = sum(results)
+                print(
+                    f"{fill:>6.0%} {(attempts - ok) / attempts:>18.4f} "
+                    f"{(samples - ok) / samples:>9.4%} {samples / elapsed:>9.1f}"
+                )
+    finally:
+        with SessionLocal() as db:
+            db.execute(delete(Patient).where(Patient.public_id.like("BENCH-%")))
+            db.commit()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chars", type=int, default=None, help="random characters per id (default 4, or 3 with --db)")
+    parser.add_argument("--samples", type=int, default=2000)
+    parser.add_argument("--db", action="store_true", help="allocate through crud.allocate_patient against DATABASE_URL")
+    parser.add_argument("--threads", type=int, default=16)
+    args = parser.parse_args()
+
+    if args.db:
+        run_db(args.chars or 3, args.samples, args.threads)
+    else:
+        from app.crud import PUBLIC_ID_ATTEMPTS
+
+        simulate(args.chars or 4, args.samples, PUBLIC_ID_ATTEMPTS)
+
+
+if __name__ == "__main__":
+    main()
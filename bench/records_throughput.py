@@ -0,0 +1,120 @@
+"""
+Records view throughput with concurrent clients.
+
+Start the API first (RUN_DB_INIT=true on a scratch database), then:
+
+    python bench/records_throughput.py --base-url http://127.0.0.1:8000 --clients 32 --requests 2000
+
+Sets up a guardian, a doctor, one patient with --pointers immunization pointers and an
+immunizations consent, then has --clients workers hit
+GET /records/patients/{id}?scope=immunizations until --requests calls are done.
+
+Pointers are created on the mock /fhir router of --fhir-base-url (default: the API itself).
+Point it at a second API instance to keep upstream FHIR fetches off the server under test.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import httpx
+
+
+async def _register(client: httpx.AsyncClient, role: str) -> tuple[str, dict]:
+    email = f"bench-{role}-{uuid.uuid4().hex[:8]}@example.com"
+    r = await client.post("/auth/register", json={"email": email, "password": "bench-pass", "role": role})
+    r.raise_for_status()
+    return email, {"Authorization": f"Bearer {r.json()['access_token']}"}
+
+
+async def setup(client: httpx.AsyncClient, fhir_base_url: str, pointers: int) -> tuple[str, dict]:
+    _, guardian = await _register(client, "guardian")
+    doctor_email, doctor = await _register(client, "doctor")
+
+    r = await client.post("/patients", json={}, headers=guardian)
+    r.raise_for_status()
+    patient_id = r.json()["public_id"]
+
+    for i in range(pointers):
+        r = await client.post(
+            f"{fhir_base_url}/Immunization",
+            json={"resourceType": "Immunization", "status": "completed", "vaccineCode": {"text": f"bench {i}"}},
+        )
+        r.raise_for_status()
+        r = await client.post(
+            f"/patients/{patient_id}/pointers",
+            json={
+                "record_type": "immunization",
+                "fhir_base_url": fhir_base_url,
+                "fhir_resource_type": "Immunization",
+                "fhir_resource_id": r.json()["id"],
+                "issuer": "Bench Hospital",
+            },
+            headers=guardian,
+        )
+        r.raise_for_status()
+
+    expires_at = (datetime.now(timezone.utc) + timedelta(days=1)).isoformat()
+    r = await client.post(
+        f"/consents/patients/{patient_id}",
+        json={"grantee_email": doctor_email, "scope": "immunizations", "expires_at": expires_at},
+        headers=guardian,
+    )
+    r.raise_for_status()
+    return patient_id, doctor
+
+
+async def run(base_url: str, fhir_base_url: str, clients: int, requests: int, pointers: int) -> None:
+    limits = httpx.Limits(max_connections=clients, max_keepalive_connections=clients)
+    async with httpx.AsyncClient(base_url=base_url, timeout=60.0, limits=limits) as client:
+        patient_id, doctor = await setup(client, fhir_base_url, pointers)
+        url = f"/records/patients/{patient_id}"
+
+        # warm-up
+        (await client.get(url, params={"scope": "immunizations"}, headers=doctor)).raise_for_status()
+
+        remaining = requests
+        latencies: list[float] = []
+        errors = 0
+
+        async def worker() -> None:
+            nonlocal remaining, errors
+            while remaining > 0:
+                remaining -= 1
+                t0 = time.perf_counter()
+                r = await client.get(url, params={"scope": "immunizations"}, headers=doctor)
+                latencies.append(time.perf_counter() - t0)
+                if r.status_code != 200:
+                    errors += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(clients)))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    print(f"clients={clients} requests={len(latencies)} pointers={pointers} errors={errors}")
+    print(f"throughput={len(latencies) / elapsed:.1f} req/s")
+    print(
+        f"latency_ms p50={statistics.median(latencies) * 1000:.1f} "
+        f"p95={latencies[int(len(latencies) * 0.95) - 1] * 1000:.1f} "
+        f"max={latencies[-1] * 1000:.1f}"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--fhir-base-url", default=None, help="defaults to <base-url>/fhir")
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--pointers", type=int, default=3)
+    args = parser.parse_args()
+    base_url = args.base_url.rstrip("/")
+    fhir_base_url = (args.fhir_base_url or f"{base_url}/fhir").rstrip("/")
+    asyncio.run(run(base_url, fhir_base_url, args.clients, args.requests, args.pointers))
+
+
+if __name__ == "__main__":
+    main()
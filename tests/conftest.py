@@ -0,0 +1,73 @@
+# tests/conftest.py
+"""
+The suite runs the app against a throwaway database, created on the Postgres
+server TEST_DATABASE_URL points at and dropped at the end of the run:
+
+    TEST_DATABASE_URL=postgresql+psycopg2://postgres@localhost/postgres python -m pytest -q
+
+The app reads its settings at import time, so they are set here first. The
+read replica is the primary itself, which still sends the read-only routes
+through the replica session. Periodic background jobs are off; tests call them.
+"""
+import os
+import uuid
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import make_url
+
+_server = make_url(os.getenv("TEST_DATABASE_URL", "postgresql+psycopg2://postgres@localhost/postgres"))
+_db_name = f"vivisys_test_{uuid.uuid4().hex[:8]}"
+_admin = create_engine(_server, isolation_level="AUTOCOMMIT")
+with _admin.connect() as conn:
+    conn.execute(text(f'CREATE DATABASE "{_db_name}"'))
+
+os.environ["DATABASE_URL"] = _server.set(database=_db_name).render_as_string(hide_password=False)
+os.environ["DATABASE_READ_URL"] = os.environ["DATABASE_URL"]
+os.environ["RUN_DB_INIT"] = "true"
+os.environ["BACKGROUND_TASKS"] = "false"
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+from app.main import app  # noqa: E402
+
+
+def pytest_sessionfinish(session, exitstatus):
+    from app import db
+
+    db.engine.dispose()
+    db.read_engine.dispose()
+    with _admin.connect() as conn:
+        conn.execute(text(f'DROP DATABASE IF EXISTS "{_db_name}" WITH (FORCE)'))
+    _admin.dispose()
+
+
+@pytest.fixture(scope="session")
+def client():
+    with TestClient(app) as c:
+        yield c
+
+
+@pytest.fixture
+def register(client):
+    """register(role) -> (email, auth headers) for a new user."""
+
+    def _register(role: str):
+        email = f"{role}-{uuid.uuid4().hex[:8]}@example.com"
+        if role == "clinic_admin":
+            # created by an operator (app.maintenance create-clinic-admin), then redeemed
+            from app import crud
+            from app.db import SessionLocal
+            from app.security import create_invite_token
+
+            with SessionLocal() as db:
+                user = crud.create_invited_user(db, email, role)
+                db.commit()
+                token, _ = create_invite_token(user.id)
+            r = client.post("/auth/set-password", json={"token": token, "password": "password123"})
+        else:
+            r = client.post("/auth/register", json={"email": email, "password": "password123", "role": role})
+        assert r.status_code == 200, r.text
+        return email, {"Authorization": f"Bearer {r.json()['access_token']}"}
+
+    return _register
@@ -0,0 +1,162 @@
+import threading
+import time
+import uuid
+from datetime import datetime
+
+from sqlalchemy import func, select
+
+from app import audit, crud
+from app.db import SessionLocal
+from app.models import AuditLog
+
+
+def _row(patient_id: str) -> dict:
+    return {
+        "id": str(uuid.uuid4()),
+        "actor_user_id": "tester",
+        "patient_id": patient_id,
+        "action": "TEST",
+        "details": "",
+        "data": None,
+        "created_at": datetime.utcnow(),
+    }
+
+
+def _count(patient_id: str) -> int:
+    with SessionLocal() as db:
+        return db.scalar(select(func.count()).select_from(AuditLog).where(AuditLog.patient_id == patient_id))
+
+
+def _wait_for(predicate, timeout_s: float = 5.0) -> bool:
+    deadline = time.monotonic() + timeout_s
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.02)
+    return predicate()
+
+
+def test_stop_flushes_every_accepted_entry(client):
+    pid = f"audit-{uuid.uuid4().hex}"
+    sink = audit.AuditSink(batch_size=100, flush_interval_s=60)
+    sink.start()
+    for _ in range(250):
+        sink.submit(_row(pid))
+    sink.stop()
+    assert not sink.running
+    assert _count(pid) == 250
+
+
+def test_flushes_full_batches_and_on_interval(client):
+    pid = f"audit-{uuid.uuid4().hex}"
+    sink = audit.AuditSink(batch_size=10, flush_interval_s=60)
+    sink.start()
+    for _ in range(25):
+        sink.submit(_row(pid))
+    # two full batches go out at once, the rest waits for the interval
+    assert _wait_for(lambda: _count(pid) == 20)
+    time.sleep(0.2)
+    assert _count(pid) == 20
+    sink.stop()
+    assert _count(pid) == 25
+
+    pid = f"audit-{uuid.uuid4().hex}"
+    sink = audit.AuditSink(batch_size=1000, flush_interval_s=0.05)
+    sink.start()
+    for _ in range(3):
+        sink.submit(_row(pid))
+    assert _wait_for(lambda: _count(pid) == 3)
+    sink.stop()
+
+
+def test_full_queue_writes_synchronously(client, monkeypatch):
+    pid = f"audit-{uuid.uuid4().hex}"
+    release = threading.Event()
+    callers = []
+    write_rows = audit.write_rows
+
+    def gated_write_rows(rows):
+        callers.append(threading.current_thread().name)
+        if threading.current_thread().name == "audit-writer":
+            release.wait(5)
+        write_rows(rows)
+
+    monkeypatch.setattr(audit, "write_rows", gated_write_rows)
+    sink = audit.AuditSink(max_queue=2, batch_size=1, flush_interval_s=60, put_timeout_s=0.01)
+    sink.start()
+    sink.submit(_row(pid))
+    assert _wait_for(lambda: "audit-writer" in callers)
+    for _ in range(9):
+        sink.submit(_row(pid))
+    assert not sink.offer(_row(pid))
+
+    # the writer is stuck on its first batch: the queue holds two, callers wrote the rest
+    assert callers.count("audit-writer") == 1
+    assert _count(pid) == 7
+    release.set()
+    sink.stop()
+    assert _count(pid) == 10
+
+
+def test_strict_entries_commit_with_the_caller(client):
+    pid = f"audit-{uuid.uuid4().hex}"
+    with SessionLocal() as db:
+        crud.log(db, actor_user_id="tester", patient_id=pid, action="TEST", strict=True)
+        db.rollback()
+    assert _count(pid) == 0
+
+    with SessionLocal() as db:
+        crud.log(db, actor_user_id="tester", patient_id=pid, action="TEST", strict=True)
+        db.commit()
+    assert _count(pid) == 1
+
+    assert audit.sink.running
+    with SessionLocal() as db:
+        crud.log(db, actor_user_id="tester", patient_id=pid, action="TEST")
+        db.rollback()
+    audit.stop()
+    audit.start()
+    assert _count(pid) == 2
+
+
+def test_failed_flushes_are_spilled_and_replayed(client, monkeypatch, tmp_path):
+    pid = f"audit-{uuid.uuid4().hex}"
+    monkeypatch.setattr(audit, "AUDIT_SPILL_PATH", str(tmp_path / "spill.ndjson"))
+    down = threading.Event()
+    down.set()
+    write_rows = audit.write_rows
+
+    def flaky_write_rows(rows):
+        if down.is_set():
+            raise RuntimeError("database unavailable")
+        write_rows(rows)
+
+    monkeypatch.setattr(audit, "write_rows", flaky_write_rows)
+    sink = audit.AuditSink(batch_size=5, flush_interval_s=0.05)
+    sink.start()
+    for _ in range(5):
+        sink.submit(_row(pid))
+    assert _wait_for(lambda: (tmp_path / "spill.ndjson").exists())
+    assert _count(pid) == 0
+
+    down.clear()
+    sink.submit(_row(pid))
+    assert _wait_for(lambda: _count(pid) == 6)
+    assert not (tmp_path / "spill.ndjson").exists()
+    sink.stop()
+
+    # a replay that already went through is not doubled
+    audit.spill([_row(pid)] * 2)
+    assert audit.replay_spill() == 2
+    assert _count(pid) == 7
+
+
+def test_entries_after_stop_are_written_synchronously(client):
+    pid = f"audit-{uuid.uuid4().hex}"
+    sink = audit.AuditSink(batch_size=100, flush_interval_s=60)
+    sink.start()
+    sink.submit(_row(pid))
+    sink.stop()
+    assert not sink.offer(_row(pid))
+    sink.submit(_row(pid))
+    assert _count(pid) == 2
@@ -0,0 +1,105 @@
+import json
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from sqlalchemy import select
+
+from app import audit
+from app.db import SessionLocal
+from app.models import AuditLog
+
+
+def _seed(patient_id: str) -> None:
+    # three timestamps shared by many rows, so pages split inside runs of ties
+    base = datetime.utcnow().replace(microsecond=0)
+    audit.write_rows(
+        [
+            {
+                "id": str(uuid.uuid4()),
+                "actor_user_id": "tester",
+                "patient_id": patient_id,
+                "action": "CONSENT_GRANT" if i % 2 else "RECORD_VIEW",
+                "details": "",
+                "data": {"scope": "allergies" if i % 5 == 0 else "conditions"},
+                "created_at": base - timedelta(seconds=i % 3),
+            }
+            for i in range(25)
+        ]
+    )
+
+
+def test_keyset_pages_match_the_full_ordering(client, register):
+    _, guardian = register("guardian")
+    p = client.post("/patients", json={}, headers=guardian).json()
+    _seed(p["id"])
+    with SessionLocal() as db:
+        expected = list(
+            db.scalars(
+                select(AuditLog.id)
+                .where(AuditLog.patient_id == p["id"])
+                .order_by(AuditLog.created_at.desc(), AuditLog.id.desc())
+            )
+        )
+    assert len(expected) == 26  # the seeded rows and PATIENT_CREATE
+
+    seen, cursor = [], None
+    while True:
+        params = {"patient": p["public_id"], "limit": 4, **({"cursor": cursor} if cursor else {})}
+        r = client.get("/audit/events", params=params, headers=guardian)
+        assert r.status_code == 200, r.text
+        seen += [e["id"] for e in r.json()["events"]]
+        cursor = r.json()["next_cursor"]
+        if not cursor:
+            break
+    assert seen == expected
+
+
+def test_filters_and_access(client, register):
+    _, guardian = register("guardian")
+    p = client.post("/patients", json={}, headers=guardian).json()
+    _seed(p["id"])
+
+    events = client.get("/audit/events", params={"patient": p["id"], "scope": "allergies"}, headers=guardian).json()["events"]
+    assert len(events) == 5 and all(e["data"]["scope"] == "allergies" for e in events)
+    events = client.get("/audit/events", params={"patient": p["id"], "action": "CONSENT_GRANT"}, headers=guardian).json()["events"]
+    assert len(events) == 12
+
+    assert client.get("/audit/events", params={"patient": p["id"], "cursor": "not-a-cursor"}, headers=guardian).status_code == 400
+    _, stranger = register("guardian")
+    assert client.get("/audit/events", params={"patient": p["id"]}, headers=stranger).status_code == 403
+    _, doctor = register("doctor")
+    assert client.get("/audit/events", headers=doctor).status_code == 403
+
+
+def _imported_patient(client, admin) -> str:
+    body = json.dumps({"external_id": "x1", "date_of_birth": "2015-01-01"})
+    job = client.post("/patients/imports", content=body, headers={**admin, "content-type": "application/x-ndjson"}).json()
+    deadline = time.monotonic() + 10
+    while client.get(f"/patients/imports/{job['id']}", headers=admin).json()["status"] != "done":
+        assert time.monotonic() < deadline
+        time.sleep(0.05)
+    results = client.get(f"/patients/imports/{job['id']}/results", headers=admin).text.splitlines()
+    return json.loads(results[0])["patient_id"]
+
+
+def test_clinic_admins_see_their_own_patients_only(client, register):
+    _, admin = register("clinic_admin")
+    _, other_admin = register("clinic_admin")
+    mine = _imported_patient(client, admin)
+    _seed(mine)
+    _, guardian = register("guardian")
+    theirs = client.post("/patients", json={}, headers=guardian).json()["id"]
+    _seed(theirs)
+
+    events = client.get("/audit/events", params={"limit": 500}, headers=admin).json()["events"]
+    assert len(events) == 26 and {e["patient_id"] for e in events} == {mine}
+    assert client.get("/audit/events", params={"patient": mine}, headers=admin).status_code == 200
+    assert client.get("/audit/events", params={"patient": theirs}, headers=admin).status_code == 403
+    assert client.get("/audit/events", params={"patient": mine}, headers=other_admin).status_code == 403
+    assert client.get("/audit/events", headers=other_admin).json()["events"] == []
+    assert client.get("/audit/export", params={"patient": theirs}, headers=admin).status_code == 403
+
+    r = client.get("/audit/export", params={"scope": "allergies"}, headers=admin)
+    rows = [json.loads(line) for line in r.text.splitlines()]
+    assert len(rows) == 5 and all(x["patient_id"] == mine and x["data"]["scope"] == "allergies" for x in rows)
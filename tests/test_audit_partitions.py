@@ -0,0 +1,52 @@
+import gzip
+import json
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+
+from sqlalchemy import text
+
+from app import audit_partitions
+from app.db import engine
+
+
+def _old_partition(month: date) -> str:
+    with engine.begin() as conn:
+        audit_partitions._create_months(conn, month, month)
+        conn.execute(
+            text(
+                "INSERT INTO audit_logs (id, actor_user_id, patient_id, action, details, created_at)"
+                " VALUES (:id, 'old', 'old', 'OLD', '', :at)"
+            ),
+            {"id": str(uuid.uuid4()), "at": datetime(month.year, month.month, 5)},
+        )
+    return audit_partitions.partition_name(month)
+
+
+def _partitions() -> list[str]:
+    with engine.connect() as conn:
+        return [name for name, _ in audit_partitions.list_partitions(conn)]
+
+
+def test_archiving_is_skipped_while_another_process_holds_the_lock(client, tmp_path):
+    name = _old_partition(date(2018, 1, 1))
+    with engine.connect() as other:
+        other.execute(text("SELECT pg_advisory_lock(:k)"), {"k": audit_partitions._ARCHIVE_LOCK})
+        assert audit_partitions.archive_expired_partitions(archive_dir=str(tmp_path)) == []
+        other.execute(text("SELECT pg_advisory_unlock(:k)"), {"k": audit_partitions._ARCHIVE_LOCK})
+    assert name in _partitions()
+
+    paths = audit_partitions.archive_expired_partitions(archive_dir=str(tmp_path))
+    assert paths == [str(tmp_path / f"{name}.ndjson.gz")]
+    assert name not in _partitions()
+
+
+def test_concurrent_runs_archive_each_partition_once(client, tmp_path):
+    names = [_old_partition(date(2017, m, 1)) for m in (1, 2, 3)]
+    with ThreadPoolExecutor(4) as pool:
+        runs = list(pool.map(lambda _: audit_partitions.archive_expired_partitions(archive_dir=str(tmp_path)), range(4)))
+    archived = sorted(p for run in runs for p in run)
+    assert archived == sorted(str(tmp_path / f"{n}.ndjson.gz") for n in names)
+    assert sorted(p.name for p in tmp_path.iterdir()) == sorted(f"{n}.ndjson.gz" for n in names)
+    for path in archived:
+        assert [json.loads(line)["action"] for line in gzip.open(path, "rt")] == ["OLD"]
@@ -0,0 +1,110 @@
+import time
+
+import pytest
+
+from app import npi_autocomplete
+from app.npi_autocomplete import Entry, NameIndex
+
+HOSPITALS = [
+    Entry("2000000001", "NORTHWESTERN MEMORIAL HOSPITAL", "CHICAGO", "IL"),
+    Entry("2000000002", "MEMORIAL HERMANN HOSPITAL", "HOUSTON", "TX"),
+    Entry("2000000003", "MEMORIAL HOSPITAL", "SPRINGFIELD", "IL"),
+    Entry("2000000004", "MEMORIAL HOSPITAL", "CHICAGO", "IL"),
+]
+
+
+def _api_result(npi: str, name: str, state: str = "CA") -> dict:
+    return {
+        "number": npi,
+        "enumeration_type": "NPI-2",
+        "basic": {"organization_name": name},
+        "addresses": [{"address_purpose": "LOCATION", "city": "X", "state": state}],
+    }
+
+
+def test_prefix_matches_any_word_and_ranks_by_location():
+    index = NameIndex(HOSPITALS)
+    entries, fuzzy = index.search("memo", 10)
+    assert not fuzzy
+    assert entries[0].name == "MEMORIAL HOSPITAL"
+    assert entries[-1].npi == "2000000001"  # matched on its second word
+
+    entries, _ = index.search("memorial", 10, state="IL", city="chicago")
+    assert [e.npi for e in entries] == ["2000000004", "2000000001", "2000000003", "2000000002"]
+    assert index.search("", 10) == ([], False)
+
+
+def test_typo_fallback():
+    index = NameIndex(HOSPITALS)
+    entries, fuzzy = index.search("nortwestern mem", 10)
+    assert fuzzy and entries[0].npi == "2000000001"
+    assert index.search("qqqqqq", 10) == ([], False)
+
+
+@pytest.fixture
+def mirror(client, monkeypatch):
+    """A fake mirror load, counting how often it is read."""
+    state = {"version": 1, "reads": 0}
+
+    def entries():
+        state["reads"] += 1
+        return [("NPI-2", e) for e in HOSPITALS]
+
+    monkeypatch.setattr(npi_autocomplete, "_mirror_version", lambda: state["version"])
+    monkeypatch.setattr(npi_autocomplete, "_mirror_entries", entries)
+    npi_autocomplete._seen.clear()
+    npi_autocomplete.refresh(force=True)
+    yield state
+    monkeypatch.undo()
+    npi_autocomplete._seen.clear()
+    npi_autocomplete.refresh(force=True)
+
+
+def test_api_results_merge_without_rereading_the_mirror(mirror):
+    assert mirror["reads"] == 1
+    assert not npi_autocomplete.refresh()
+
+    npi_autocomplete.remember([_api_result("3000000001", "ZEPHYR MEMORIAL CLINIC")])
+    assert npi_autocomplete.refresh()
+    assert mirror["reads"] == 1
+    names = [r["name"] for r in npi_autocomplete.search("NPI-2", "memorial", 10)["results"]]
+    assert names[:2] == ["MEMORIAL HOSPITAL", "MEMORIAL HOSPITAL"] and "ZEPHYR MEMORIAL CLINIC" in names
+
+    # an NPI both sources know is listed once, as the mirror has it
+    npi_autocomplete.remember([_api_result("2000000003", "MEMORIAL HOSPITAL SPRINGFIELD")])
+    npi_autocomplete.refresh()
+    results = npi_autocomplete.search("NPI-2", "memorial hosp", 10)["results"]
+    assert [r["npi"] for r in results].count("2000000003") == 1
+
+    mirror["version"] = 2
+    assert npi_autocomplete.refresh()
+    assert mirror["reads"] == 2
+
+
+def test_autocomplete_routes(client, register, mirror):
+    r = client.get("/hospitals/cms/autocomplete", params={"q": "memo", "limit": 2})
+    assert r.status_code == 200 and len(r.json()["results"]) == 2
+    assert client.get("/providers/cms/autocomplete", params={"q": "doe"}).status_code == 401
+    _, headers = register("guardian")
+    assert client.get("/providers/cms/autocomplete", params={"q": "doe"}, headers=headers).json()["results"] == []
+
+
+def test_candidates_are_ranked_across_all_states(monkeypatch):
+    monkeypatch.setattr(npi_autocomplete, "MAX_CANDIDATES", 5)
+    # long names in alphabetically early states, the best match in the last one
+    entries = [Entry(f"20000001{i:02d}", f"MERCY REGIONAL MEDICAL CENTER {i}", "X", f"A{i % 10}") for i in range(40)]
+    entries.append(Entry("2000000200", "MERCY", "CASPER", "WY"))
+    entries, _ = NameIndex(entries).search("mercy", 3)
+    assert entries[0].npi == "2000000200"
+
+
+def test_routes_answer_503_until_the_index_is_built(client, mirror, monkeypatch):
+    monkeypatch.setattr(npi_autocomplete, "_built", False)
+    r = client.get("/hospitals/cms/autocomplete", params={"q": "memo"})
+    assert r.status_code == 503 and r.headers["retry-after"]
+    npi_autocomplete.build_in_background()
+    for _ in range(100):
+        if npi_autocomplete.built():
+            break
+        time.sleep(0.02)
+    assert client.get("/hospitals/cms/autocomplete", params={"q": "memo"}).status_code == 200
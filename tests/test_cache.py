@@ -0,0 +1,68 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from app import crud
+from app.cache import LRUCache
+from app.db import SessionLocal
+
+
+def test_evicts_least_recently_used():
+    cache = LRUCache(3)
+    for k in "abc":
+        cache.set(k, k.upper())
+    assert cache.get("a") == "A"  # now the most recently used
+    cache.set("d", "D")
+    assert cache.get("b") is None
+    assert [cache.get(k) for k in "acd"] == ["A", "C", "D"]
+    cache.set("c", "C2")
+    cache.set("e", "E")
+    assert cache.get("a") is None and cache.get("c") == "C2"
+    assert len(cache) == 3
+
+
+def test_get_default_pop_and_clear():
+    cache = LRUCache(2)
+    assert cache.get("missing", "x") == "x"
+    cache.set("a", None)
+    assert cache.get("a", "x") is None
+    cache.pop("a")
+    cache.pop("a")
+    assert cache.get("a", "x") == "x"
+    cache.set("b", 1)
+    cache.clear()
+    assert len(cache) == 0 and cache.values() == []
+
+
+def test_non_positive_size_disables_caching():
+    cache = LRUCache(0)
+    cache.set("a", 1)
+    assert cache.get("a") is None and len(cache) == 0
+
+
+def test_concurrent_use_stays_bounded():
+    cache = LRUCache(100)
+
+    def work(n):
+        for i in range(1000):
+            cache.set((n, i), i)
+            cache.get((n, i - 1))
+
+    with ThreadPoolExecutor(8) as pool:
+        list(pool.map(work, range(8)))
+    assert len(cache) == 100 == len(cache.values())
+
+
+def test_patient_lookup_uses_and_repairs_the_public_id_cache(client, register):
+    _, guardian = register("guardian")
+    p = client.post("/patients", json={}, headers=guardian).json()
+    crud.patient_id_cache.clear()
+    with SessionLocal() as db:
+        assert crud.get_patient_by_identifier(db, p["id"]).public_id == p["public_id"]
+        assert crud.get_patient_by_identifier(db, p["public_id"]).id == p["id"]
+        assert crud.patient_id_cache.get(p["public_id"]) == p["id"]
+        assert crud.get_patient_by_identifier(db, "MED-NONE-000") is None
+
+    # an entry pointing at a patient that is gone is dropped on use
+    crud.patient_id_cache.set("MED-GONE-000", "00000000-0000-0000-0000-000000000000")
+    with SessionLocal() as db:
+        assert crud.get_patient_by_identifier(db, "MED-GONE-000") is None
+    assert crud.patient_id_cache.get("MED-GONE-000") is None
@@ -0,0 +1,121 @@
+import asyncio
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import httpx
+import pytest
+from sqlalchemy import update
+
+from app import consent_prefetch, fhir_client
+from app.db import SessionLocal
+from app.models import RecordPointer
+
+
+class Fhir:
+    """Stand-in FHIR server that records the resources it served."""
+
+    def __init__(self):
+        self.fetched = []
+
+    async def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.fetched.append(request.url.path.rsplit("/", 1)[-1])
+        await asyncio.sleep(0.01)
+        return httpx.Response(200, json={"resourceType": "Condition", "id": self.fetched[-1]})
+
+
+@pytest.fixture
+def fhir(client, monkeypatch):
+    server = Fhir()
+    monkeypatch.setattr(fhir_client, "_client", httpx.AsyncClient(transport=httpx.MockTransport(server)))
+    monkeypatch.setattr(consent_prefetch, "_limiter", consent_prefetch.HostRateLimiter(1000))
+    monkeypatch.setattr(fhir_client, "FHIR_CACHE_RECORD_VIEWS", True)
+    yield server
+    _wait_for_prefetch()
+
+
+def _wait_for_prefetch(timeout_s: float = 10.0) -> None:
+    deadline = time.monotonic() + timeout_s
+    while consent_prefetch._jobs:
+        assert time.monotonic() < deadline, "prefetch still running"
+        time.sleep(0.02)
+
+
+def _patient_with_pointers(client, register, conditions: int):
+    doctor_email, doctor = register("doctor")
+    _, guardian = register("guardian")
+    pid = client.post("/patients", json={}, headers=guardian).json()["id"]
+    base = f"http://fhir-{uuid.uuid4().hex[:8]}.test/fhir"
+    for i in range(conditions):
+        pointer = {"record_type": "condition", "fhir_base_url": base, "fhir_resource_type": "Condition", "fhir_resource_id": f"c{i}", "issuer": "H"}
+        assert client.post(f"/patients/{pid}/pointers", json=pointer, headers=guardian).status_code == 200
+    pointer = {"record_type": "allergy", "fhir_base_url": base, "fhir_resource_type": "AllergyIntolerance", "fhir_resource_id": "a0", "issuer": "H"}
+    assert client.post(f"/patients/{pid}/pointers", json=pointer, headers=guardian).status_code == 200
+    return doctor_email, doctor, guardian, pid
+
+
+def _grant(client, guardian, pid, doctor_email, scope):
+    expires_at = (datetime.now(timezone.utc) + timedelta(days=3)).isoformat()
+    r = client.post(f"/consents/patients/{pid}", json={"grantee_email": doctor_email, "scope": scope, "expires_at": expires_at}, headers=guardian)
+    assert r.status_code == 200, r.text
+    return r.json()["consent_id"]
+
+
+def test_grant_warms_the_granted_scope(client, register, fhir):
+    doctor_email, doctor, guardian, pid = _patient_with_pointers(client, register, 5)
+    with SessionLocal() as db:
+        db.execute(update(RecordPointer).where(RecordPointer.fhir_resource_id == "c4", RecordPointer.patient_id == pid).values(last_status=404))
+        db.commit()
+
+    _grant(client, guardian, pid, doctor_email, "conditions")
+    _wait_for_prefetch()
+    # conditions only, and not the one the health checker found gone
+    assert sorted(fhir.fetched) == ["c0", "c1", "c2", "c3"]
+
+    fhir.fetched.clear()
+    r = client.get(f"/records/patients/{pid}", params={"scope": "conditions"}, headers=doctor)
+    assert r.status_code == 200 and r.json()["count"] == 5
+    assert fhir.fetched == []
+
+
+def test_revoke_cancels_the_prefetch(client, register, fhir, monkeypatch):
+    monkeypatch.setattr(consent_prefetch, "_limiter", consent_prefetch.HostRateLimiter(10))
+    doctor_email, _, guardian, pid = _patient_with_pointers(client, register, 20)
+    consent_id = _grant(client, guardian, pid, doctor_email, "conditions")
+    time.sleep(0.3)
+    assert client.post(f"/consents/{consent_id}/revoke", headers=guardian).status_code == 200
+    _wait_for_prefetch()
+    fetched = len(fhir.fetched)
+    time.sleep(0.3)
+    assert len(fhir.fetched) == fetched < 20
+
+
+def test_prefetch_can_be_turned_off(client, register, fhir, monkeypatch):
+    monkeypatch.setattr(consent_prefetch, "PREFETCH", False)
+    doctor_email, _, guardian, pid = _patient_with_pointers(client, register, 3)
+    _grant(client, guardian, pid, doctor_email, "conditions")
+    time.sleep(0.1)
+    assert not consent_prefetch._jobs and fhir.fetched == []
+
+
+def test_record_views_skip_the_cache_unless_enabled(client, register, fhir, monkeypatch):
+    monkeypatch.setattr(fhir_client, "FHIR_CACHE_RECORD_VIEWS", False)
+    doctor_email, doctor, guardian, pid = _patient_with_pointers(client, register, 2)
+    _grant(client, guardian, pid, doctor_email, "conditions")
+    time.sleep(0.1)
+    assert not consent_prefetch._jobs and fhir.fetched == []
+
+    for _ in range(2):
+        r = client.get(f"/records/patients/{pid}", params={"scope": "conditions"}, headers=doctor)
+        assert r.status_code == 200
+    assert sorted(fhir.fetched) == ["c0", "c0", "c1", "c1"]
+
+
+def test_cached_resources_are_copies(client, fhir):
+    async def fetch():
+        return await fhir_client.fetch_fhir_resource("http://fhir-copy.test/fhir", "Condition", "x", use_cache=True)
+
+    first = client.portal.call(fetch)
+    first["id"] = "changed"
+    assert client.portal.call(fetch)["id"] == "x"
+    assert fhir.fetched == ["x"]
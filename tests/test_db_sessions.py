@@ -0,0 +1,63 @@
+import json
+
+from sqlalchemy import event
+
+from app import db
+
+
+def test_without_a_replica_a_request_holds_one_connection(client, register, monkeypatch):
+    _, patient = register("patient")
+    assert client.post("/patients/self/register", json={"date_of_birth": "1980-01-01"}, headers=patient).status_code == 200
+    monkeypatch.setattr(db, "DATABASE_READ_URL", None)
+
+    held, most = 0, 0
+
+    def checkout(*args):
+        nonlocal held, most
+        held += 1
+        most = max(most, held)
+
+    def checkin(*args):
+        nonlocal held
+        held -= 1
+
+    pool = db.async_engine.sync_engine.pool
+    event.listen(pool, "checkout", checkout)
+    event.listen(pool, "checkin", checkin)
+    try:
+        # consent check on the primary session, pointers on the read session
+        r = client.get("/records/me", params={"scope": "allergies"}, headers=patient)
+    finally:
+        event.remove(pool, "checkout", checkout)
+        event.remove(pool, "checkin", checkin)
+    assert r.status_code == 200, r.text
+    assert most == 1
+
+
+def test_checkout_wait_is_still_measured(client, register):
+    _, patient = register("patient")
+
+    def checkouts():
+        return sum(st["checkouts"] for st in db.pool_metrics.snapshot().values())
+
+    before = checkouts()
+    assert client.post("/patients/self/register", json={"date_of_birth": "1980-01-01"}, headers=patient).status_code == 200
+    assert checkouts() > before
+
+
+def test_uploads_hold_no_connection_while_the_body_arrives(client, register):
+    _, guardian = register("guardian")
+    p = client.post("/patients", json={}, headers=guardian).json()
+    pool = db.async_engine.sync_engine.pool
+    held = []
+
+    def body():
+        # the request body is read while the route runs; sample the pool meanwhile
+        for i in range(3):
+            held.append(pool.checkedout())
+            yield (json.dumps({"patient": p["id"], "record_type": "immunization", "fhir_resource_type": "Immunization",
+                               "fhir_resource_id": f"up-{i}", "issuer": "H"}) + "\n").encode()
+
+    r = client.post("/patients/pointers/bulk", content=body(), headers={**guardian, "content-type": "application/x-ndjson"})
+    assert r.status_code == 200, r.text
+    assert held and max(held) == 0
@@ -0,0 +1,87 @@
+import json
+import time
+import uuid
+
+import pytest
+
+from app import mailer
+
+
+@pytest.fixture
+def outbox(monkeypatch):
+    sent = []
+    monkeypatch.setattr(mailer, "SMTP_HOST", "smtp.test")
+    monkeypatch.setattr(mailer, "send", lambda to, subject, body: sent.append((to, body)))
+    return sent
+
+
+def _import_guardian(client, admin) -> str:
+    email = f"guardian-{uuid.uuid4().hex[:8]}@example.com"
+    body = json.dumps({"external_id": "g1", "date_of_birth": "2015-01-01", "guardian_email": email})
+    job = client.post("/patients/imports", content=body, headers={**admin, "content-type": "application/x-ndjson"}).json()
+    deadline = time.monotonic() + 10
+    while client.get(f"/patients/imports/{job['id']}", headers=admin).json()["status"] != "done":
+        assert time.monotonic() < deadline
+        time.sleep(0.05)
+    return email
+
+
+def test_invite_is_emailed_to_the_guardian_only(client, register, outbox):
+    _, admin = register("clinic_admin")
+    email = _import_guardian(client, admin)
+
+    r = client.post("/auth/invite", json={"email": email}, headers=admin)
+    assert r.status_code == 200, r.text
+    assert set(r.json()) == {"email", "expires_at"}
+    [(to, body)] = outbox
+    assert to == email
+    token = body.split("token=", 1)[1].split()[0]
+
+    r = client.post("/auth/set-password", json={"token": token, "password": "password123"})
+    assert r.status_code == 200
+    assert client.post("/auth/set-password", json={"token": token, "password": "password456"}).status_code == 401
+    assert client.post("/auth/invite", json={"email": email}, headers=admin).status_code == 409
+
+
+def test_invites_only_for_the_callers_own_imports(client, register, outbox):
+    _, admin = register("clinic_admin")
+    _, other_admin = register("clinic_admin")
+    email = _import_guardian(client, admin)
+    assert client.post("/auth/invite", json={"email": email}, headers=other_admin).status_code == 404
+
+    self_registered, _ = register("guardian")
+    assert client.post("/auth/invite", json={"email": self_registered}, headers=admin).status_code == 404
+    assert outbox == []
+
+
+def test_invite_needs_email_delivery(client, register, monkeypatch):
+    _, admin = register("clinic_admin")
+    email = _import_guardian(client, admin)
+    monkeypatch.setattr(mailer, "SMTP_HOST", "")
+    assert client.post("/auth/invite", json={"email": email}, headers=admin).status_code == 503
+
+
+def test_clinic_admins_cannot_self_register(client):
+    r = client.post("/auth/register", json={"email": "admin@example.com", "password": "password123", "role": "clinic_admin"})
+    assert r.status_code == 403
+
+
+def test_imports_do_not_attach_patients_to_other_accounts(client, register):
+    _, admin = register("clinic_admin")
+    _, other_admin = register("clinic_admin")
+    mine = _import_guardian(client, admin)
+    stranger, _ = register("guardian")
+
+    lines = [
+        {"external_id": "same-admin", "guardian_email": mine},
+        {"external_id": "self-registered", "guardian_email": stranger},
+    ]
+    body = "\n".join(json.dumps(line) for line in lines)
+    for headers, expected in ((admin, ["created", "error"]), (other_admin, ["error", "error"])):
+        job = client.post("/patients/imports", content=body, headers={**headers, "content-type": "application/x-ndjson"}).json()
+        deadline = time.monotonic() + 10
+        while client.get(f"/patients/imports/{job['id']}", headers=headers).json()["status"] != "done":
+            assert time.monotonic() < deadline
+            time.sleep(0.05)
+        results = client.get(f"/patients/imports/{job['id']}/results", headers=headers).text.splitlines()
+        assert [json.loads(line)["status"] for line in results] == expected
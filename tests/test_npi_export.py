@@ -0,0 +1,157 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from app import npi_export, npi_registry
+
+
+def _hospital(i: int, postal_code: str) -> dict:
+    return {
+        "number": str(1100000000 + i),
+        "enumeration_type": "NPI-2",
+        "basic": {"organization_name": f"HOSPITAL {i}", "status": "A"},
+        "addresses": [{"address_purpose": "LOCATION", "state": "IL", "postal_code": postal_code + "0000"}],
+        "taxonomies": [],
+    }
+
+
+# 3000 hospitals: over 1500 in 60611 alone (more than one query can return),
+# the rest spread over 606xx and 62xxx
+HOSPITALS = [
+    _hospital(i, "60611" if i < 1500 else "606%02d" % (i % 50) if i < 2600 else "62%03d" % (i % 300))
+    for i in range(3000)
+]
+
+
+class Registry:
+    """Stand-in for the NPI Registry API's paging and its 'too broad' error."""
+
+    def __init__(self, records, overlap: int = 0):
+        self.records = records
+        self.overlap = overlap
+        self.requests = []
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        q = dict(request.url.params)
+        self.requests.append(q)
+        prefix = q.get("postal_code", "").rstrip("*")
+        if not prefix and not q.get("organization_name") and not q.get("last_name"):
+            return httpx.Response(200, json={"Errors": [{"description": "No valid search criteria"}]})
+        skip, limit = int(q["skip"]), int(q["limit"])
+        assert skip <= npi_export.MAX_SKIP and limit <= npi_export.PAGE_LIMIT
+        matches = [r for r in self.records if r["addresses"][0]["postal_code"].startswith(prefix)]
+        # pages that repeat the previous page's tail, as the live API's do when results shift
+        start = max(0, skip - self.overlap)
+        return httpx.Response(200, json={"result_count": limit, "results": matches[start : skip + limit]})
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    def install(records, overlap=0):
+        upstream = Registry(records, overlap)
+        monkeypatch.setattr(npi_registry, "NPI_SOURCE", "registry")
+        monkeypatch.setattr(npi_registry, "_client", httpx.AsyncClient(transport=httpx.MockTransport(upstream)))
+        monkeypatch.setattr(npi_export, "_limiter", npi_export.HostRateLimiter(10000))
+        return upstream
+
+    return install
+
+
+def _export(params):
+    async def collect():
+        return [r async for r in npi_export.export(params)]
+
+    *results, last = asyncio.run(collect())
+    return results, last["summary"]
+
+
+def test_splits_by_postal_code_and_yields_each_npi_once(registry):
+    registry(HOSPITALS, overlap=20)
+    results, summary = _export({"version": "2.1", "enumeration_type": "NPI-2", "state": "IL"})
+    npis = [r["number"] for r in results]
+    assert len(npis) == len(set(npis)) == summary["results"]
+    assert summary["duplicates"] > 0
+    # 60611 alone is past the API's 1200-result cap and can only be reported
+    assert summary["truncated"] == ["60611"]
+    outside = {r["number"] for r in HOSPITALS if not r["addresses"][0]["postal_code"].startswith("60611")}
+    assert len(npis) == 1200 + len(outside)
+    assert set(npis) >= outside
+    assert summary["splits"] > 0 and not summary["errors"]
+
+
+def test_small_queries_take_one_request(registry):
+    upstream = registry(HOSPITALS)
+    results, summary = _export({"version": "2.1", "enumeration_type": "NPI-2", "postal_code": "620*"})
+    assert len(results) == summary["results"] == 100
+    assert summary["splits"] == 0 and len(upstream.requests) == 1
+
+
+def test_failed_pages_are_reported(registry, monkeypatch):
+    registry(HOSPITALS[2600:])
+    monkeypatch.setattr(npi_export, "EXPORT_ATTEMPTS", 1)
+    monkeypatch.setattr(npi_registry, "_client", httpx.AsyncClient(transport=httpx.MockTransport(lambda r: httpx.Response(503))))
+    results, summary = _export({"version": "2.1", "enumeration_type": "NPI-2", "postal_code": "62*"})
+    assert results == [] and len(summary["errors"]) == 1
+
+
+def test_export_routes(client, register, registry):
+    registry(HOSPITALS[2600:])
+    _, guardian = register("guardian")
+    assert client.get("/hospitals/cms/export", params={"state": "IL"}, headers=guardian).status_code == 403
+    assert client.get("/providers/cms/export", params={"state": "IL"}, headers=guardian).status_code == 403
+    _, admin = register("clinic_admin")
+    assert client.get("/hospitals/cms/export", headers=admin).status_code == 400
+    assert client.get("/providers/cms/export", headers=admin).status_code == 400
+
+    r = client.get("/hospitals/cms/export", params={"postal_code": "62", "fields": "npi"}, headers=admin)
+    assert r.status_code == 200 and r.headers["content-type"] == "application/x-ndjson"
+    *lines, summary = [json.loads(line) for line in r.text.splitlines()]
+    assert summary["summary"]["results"] == len(lines) == 400
+    assert all(set(line) == {"npi"} for line in lines)
+
+
+def test_provider_export_queries_individuals(client, register, registry):
+    people = [
+        {
+            "number": str(1200000000 + i),
+            "enumeration_type": "NPI-1",
+            "basic": {"first_name": "ANN", "last_name": f"SMITH{i}", "status": "A"},
+            "addresses": [{"address_purpose": "LOCATION", "state": "IL", "postal_code": "606010000"}],
+            "taxonomies": [],
+        }
+        for i in range(250)
+    ]
+    upstream = registry(people, overlap=5)
+    _, admin = register("clinic_admin")
+    r = client.get("/providers/cms/export", params={"last_name": "smi", "fields": "npi,name"}, headers=admin)
+    *lines, summary = [json.loads(line) for line in r.text.splitlines()]
+    assert summary["summary"]["results"] == len({line["npi"] for line in lines}) == 250
+    assert summary["summary"]["duplicates"] == 5
+    assert upstream.requests[0]["enumeration_type"] == "NPI-1" and upstream.requests[0]["last_name"] == "smi"
+
+
+def test_exports_share_the_process_rate_limiter(registry, monkeypatch):
+    registry(HOSPITALS[2600:])
+    waits = []
+
+    class CountingLimiter(npi_export.HostRateLimiter):
+        async def wait(self, host):
+            waits.append(host)
+            await super().wait(host)
+
+    monkeypatch.setattr(npi_export, "_limiter", CountingLimiter(10000))
+
+    async def two_exports():
+        async def one(prefix):
+            return [r async for r in npi_export.export({"enumeration_type": "NPI-2", "postal_code": prefix})]
+
+        return await asyncio.gather(one("6200*"), one("6220*"))
+
+    first, second = asyncio.run(two_exports())
+    for prefix, out in (("6200", first), ("6220", second)):
+        expected = sum(r["addresses"][0]["postal_code"].startswith(prefix) for r in HOSPITALS[2600:])
+        assert 0 < out[-1]["summary"]["results"] == expected < npi_export.PAGE_LIMIT
+    # one page each, both spaced by the same limiter
+    assert waits == ["npi_registry", "npi_registry"]
@@ -0,0 +1,97 @@
+import asyncio
+
+import httpx
+import pytest
+
+from app import npi_registry
+
+PARAMS = {"version": "2.1", "enumeration_type": "NPI-2", "organization_name": "Mercy", "limit": 10}
+
+
+class Upstream:
+    """Stand-in registry: every response carries the number of the request that produced it."""
+
+    def __init__(self):
+        self.calls = 0
+        self.fail = False
+
+    async def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.calls += 1
+        await asyncio.sleep(0.02)
+        if self.fail:
+            return httpx.Response(500)
+        return httpx.Response(200, json={"result_count": 0, "results": [], "served": self.calls})
+
+
+@pytest.fixture
+def upstream(monkeypatch):
+    up = Upstream()
+    npi_registry.clear()
+    monkeypatch.setattr(npi_registry, "NPI_SOURCE", "registry")
+    monkeypatch.setattr(npi_registry, "_client", httpx.AsyncClient(transport=httpx.MockTransport(up)))
+    yield up
+    npi_registry.clear()
+
+
+async def _settle():
+    await asyncio.gather(*list(npi_registry._inflight.values()), return_exceptions=True)
+
+
+def test_identical_searches_share_one_request(upstream):
+    async def run():
+        variants = [PARAMS, {**PARAMS, "organization_name": " mercy "}, {**PARAMS, "organization_name": "MERCY", "city": ""}]
+        results = await asyncio.gather(*(npi_registry.search(v) for v in variants * 5))
+        assert {r["served"] for r in results} == {1}
+        assert (await npi_registry.search(PARAMS))["served"] == 1
+
+    asyncio.run(run())
+    assert upstream.calls == 1
+    assert npi_registry.stats["miss"] == 15 and npi_registry.stats["hit"] == 1
+
+
+def test_stale_entries_are_served_while_revalidating(upstream, monkeypatch):
+    async def run():
+        assert (await npi_registry.search(PARAMS))["served"] == 1
+        monkeypatch.setattr(npi_registry, "NPI_CACHE_TTL_S", 0)
+        # past the TTL: the old body at once, a refresh in the background
+        assert (await npi_registry.search(PARAMS))["served"] == 1
+        assert npi_registry._inflight
+        await _settle()
+        assert (await npi_registry.search(PARAMS))["served"] == 2
+        await _settle()
+
+        # past the stale window too: the caller waits for a fresh body
+        monkeypatch.setattr(npi_registry, "NPI_CACHE_STALE_S", 0)
+        assert (await npi_registry.search(PARAMS))["served"] == 4
+
+    asyncio.run(run())
+    assert npi_registry.stats["stale"] == 2 and npi_registry.stats["miss"] == 2
+
+
+def test_failures_are_not_cached(upstream, monkeypatch):
+    async def run():
+        upstream.fail = True
+        with pytest.raises(httpx.HTTPStatusError):
+            await npi_registry.search(PARAMS)
+        upstream.fail = False
+        assert (await npi_registry.search(PARAMS))["served"] == 2
+
+        # a failed background refresh leaves the stale body in place
+        monkeypatch.setattr(npi_registry, "NPI_CACHE_TTL_S", 0)
+        upstream.fail = True
+        assert (await npi_registry.search(PARAMS))["served"] == 2
+        await _settle()
+        assert (await npi_registry.search(PARAMS))["served"] == 2
+        await _settle()
+
+    asyncio.run(run())
+    assert upstream.calls == 4
+
+
+def test_search_route_reports_upstream_failure(client, upstream):
+    upstream.fail = True
+    r = client.get("/hospitals/cms/search", params={"name": "mercy"})
+    assert r.status_code == 502
+    upstream.fail = False
+    r = client.get("/hospitals/cms/search", params={"name": "mercy"})
+    assert r.status_code == 200 and r.json()["source"] == "cms_npi_registry"
@@ -0,0 +1,117 @@
+import json
+
+import pytest
+from sqlalchemy import text
+
+from app import crud_async, maintenance
+from app.db import AsyncSessionLocal, engine
+from app.init_db import init_db
+
+NDJSON = {"content-type": "application/x-ndjson"}
+
+
+def _pointer(resource_id: str, record_type: str = "immunization") -> dict:
+    return {"record_type": record_type, "fhir_resource_type": "Immunization", "fhir_resource_id": resource_id, "issuer": "H"}
+
+
+def _count(patient_id: str) -> int:
+    with engine.connect() as conn:
+        return conn.execute(text("SELECT count(*) FROM record_pointers WHERE patient_id = :p"), {"p": patient_id}).scalar()
+
+
+def test_pointer_writes_are_idempotent(client, register):
+    _, guardian = register("guardian")
+    p = client.post("/patients", json={}, headers=guardian).json()
+    a = client.post(f"/patients/{p['public_id']}/pointers", json=_pointer("dup-1"), headers=guardian).json()
+    b = client.post(f"/patients/{p['public_id']}/pointers", json=_pointer("dup-1"), headers=guardian).json()
+    assert a["pointer_id"] == b["pointer_id"]
+
+    lines = [json.dumps({"patient": p["public_id"], **_pointer(i)}) for i in ("dup-1", "new-1", "new-1")]
+    r = client.post("/patients/pointers/bulk", content="\n".join(lines), headers={**guardian, **NDJSON})
+    assert r.status_code == 200, r.text
+    *results, summary = [json.loads(line) for line in r.text.splitlines()]
+    assert results[0] == {**results[0], "pointer_id": a["pointer_id"], "created": False}
+    assert results[1]["pointer_id"] == results[2]["pointer_id"]
+    assert [results[1]["created"], results[2]["created"]].count(True) == 1
+    assert summary["summary"]["created"] == 1 and summary["summary"]["existing"] == 2
+
+    async def create_twice():
+        async with AsyncSessionLocal() as db:
+            ptrs = [
+                await crud_async.create_pointer_for_patient(
+                    db, patient_id=p["id"], fhir_base_url="http://fhir.test", **_pointer("async-1")
+                )
+                for _ in range(2)
+            ]
+            await db.commit()
+            return ptrs
+
+    first, second = client.portal.call(create_twice)
+    assert first.id == second.id
+    assert _count(p["id"]) == 3
+
+
+def test_self_pointer_is_idempotent(client, register):
+    _, patient = register("patient")
+    assert client.post("/patients/self/register", json={"date_of_birth": "1980-01-01"}, headers=patient).status_code == 200
+    x = client.post("/records/me/pointers", json={"scope": "allergies", "fhir_resource_id": "z"}, headers=patient).json()
+    y = client.post("/records/me/pointers", json={"scope": "allergies", "fhir_resource_id": "z"}, headers=patient).json()
+    assert x["pointer_id"] == y["pointer_id"]
+
+
+def test_dedup_pointers_builds_the_unique_index(client, register):
+    _, guardian = register("guardian")
+    p = client.post("/patients", json={}, headers=guardian).json()
+    with engine.begin() as conn:
+        conn.exec_driver_sql("DROP INDEX uq_record_pointers_resource")
+    try:
+        with engine.begin() as conn:
+            for resource_id in ("d", "d", "d", "e"):
+                conn.execute(
+                    text(
+                        "INSERT INTO record_pointers (id, patient_id, record_type, fhir_base_url, fhir_resource_type,"
+                        " fhir_resource_id, issuer, created_at)"
+                        " VALUES (gen_random_uuid()::text, :p, 'immunization', 'u', 'Immunization', :r, 'H', now())"
+                    ),
+                    {"p": p["id"], "r": resource_id},
+                )
+
+        # writes rely on the index (ON CONFLICT), so startup refuses to run without it
+        with pytest.raises(RuntimeError, match="uq_record_pointers_resource"):
+            init_db()
+    finally:
+        maintenance.dedup_pointers(batch_size=2)
+
+    assert _count(p["id"]) == 2
+    with engine.connect() as conn:
+        n = conn.execute(text("SELECT count(*) FROM pg_indexes WHERE indexname = 'uq_record_pointers_resource'")).scalar()
+    assert n == 1
+    init_db()
+
+
+def test_a_refused_start_leaves_the_backfills_to_the_next_one(client, register):
+    doctor_email, _ = register("doctor")
+    _, guardian = register("guardian")
+    p = client.post("/patients", json={}, headers=guardian).json()
+    grant = {"grantee_email": doctor_email, "scope": "allergies", "expires_at": "2999-01-01T00:00:00+00:00"}
+    assert client.post(f"/consents/patients/{p['id']}", json=grant, headers=guardian).status_code == 200
+    assert client.post(f"/patients/{p['id']}/pointers", json=_pointer("bf-1"), headers=guardian).status_code == 200
+
+    # an older database: neither projection exists yet, the unique index is missing
+    with engine.begin() as conn:
+        live = conn.execute(text("SELECT count(*) FROM active_consents")).scalar()
+        conn.exec_driver_sql("DROP TABLE active_consents, pointer_summaries, schema_backfills")
+        conn.exec_driver_sql("DROP INDEX uq_record_pointers_resource")
+    try:
+        with pytest.raises(RuntimeError, match="uq_record_pointers_resource"):
+            init_db()
+        with engine.connect() as conn:
+            assert conn.execute(text("SELECT to_regclass('active_consents')")).scalar() is None
+    finally:
+        maintenance.dedup_pointers()
+        init_db()
+
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT count(*) FROM active_consents")).scalar() == live > 0
+        n = conn.execute(text("SELECT count FROM pointer_summaries WHERE patient_id = :p"), {"p": p["id"]}).scalar()
+        assert n == 1
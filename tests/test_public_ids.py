@@ -0,0 +1,74 @@
+import itertools
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from sqlalchemy import event
+
+from app import crud
+from app.db import SessionLocal, engine
+
+
+def _fresh_id() -> str:
+    return f"MED-TEST-{uuid.uuid4().hex[:6].upper()}"
+
+
+def test_allocate_retries_clashing_ids(client):
+    taken = _fresh_id()
+    with SessionLocal() as db:
+        crud.allocate_patient(db, id_factory=lambda: taken, guardian_user_id=None)
+        db.commit()
+
+    fresh = _fresh_id()
+    candidates = iter([taken, taken, fresh])
+    inserts = []
+
+    def count_inserts(conn, cursor, statement, *args):
+        if statement.lstrip().upper().startswith("INSERT INTO PATIENTS"):
+            inserts.append(statement)
+
+    event.listen(engine, "before_cursor_execute", count_inserts)
+    try:
+        with SessionLocal() as db:
+            p = crud.allocate_patient(db, id_factory=lambda: next(candidates), guardian_user_id=None)
+            # a clash does not abort the transaction
+            db.commit()
+    finally:
+        event.remove(engine, "before_cursor_execute", count_inserts)
+    assert p.public_id == fresh and p.id and p.created_at
+    assert len(inserts) == 3
+
+
+def test_allocate_gives_up_after_the_attempt_limit(client):
+    taken = _fresh_id()
+    with SessionLocal() as db:
+        crud.allocate_patient(db, id_factory=lambda: taken, guardian_user_id=None)
+        db.commit()
+    with SessionLocal() as db:
+        with pytest.raises(RuntimeError):
+            crud.allocate_patient(db, id_factory=lambda: taken, guardian_user_id=None)
+
+
+def test_bulk_allocation_resolves_clashes_within_and_across_batches(client):
+    taken = _fresh_id()
+    with SessionLocal() as db:
+        crud.allocate_patient(db, id_factory=lambda: taken, guardian_user_id=None)
+        db.commit()
+
+    # first round: every row asks for the taken id, or for one shared new id
+    shared = _fresh_id()
+    candidates = itertools.chain([taken, shared, shared, taken], iter(_fresh_id, None))
+    with SessionLocal() as db:
+        out = crud.allocate_patients_bulk(db, [{"guardian_user_id": None}] * 4, id_factory=lambda: next(candidates))
+        db.commit()
+    public_ids = [public_id for _, public_id in out]
+    assert len(set(public_ids)) == 4 and taken not in public_ids
+    assert public_ids.count(shared) == 1
+
+
+def test_concurrent_creates_get_distinct_ids(client, register):
+    _, guardian = register("guardian")
+    with ThreadPoolExecutor(16) as pool:
+        responses = list(pool.map(lambda _: client.post("/patients", json={}, headers=guardian), range(64)))
+    assert all(r.status_code == 200 for r in responses)
+    assert len({r.json()["public_id"] for r in responses}) == 64
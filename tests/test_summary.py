@@ -0,0 +1,66 @@
+import json
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import event
+
+from app import db as app_db
+
+
+def _selects(client, headers):
+    statements = []
+
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    engines = {app_db.async_engine.sync_engine, app_db.async_read_engine.sync_engine}
+    for e in engines:
+        event.listen(e, "before_cursor_execute", record)
+    try:
+        r = client.get("/patients/me/summary", headers=headers)
+    finally:
+        for e in engines:
+            event.remove(e, "before_cursor_execute", record)
+    return r, [s for s in statements if s.lstrip().upper().startswith("SELECT")]
+
+
+def test_summary(client, register):
+    doctor_email, _ = register("doctor")
+    _, patient = register("patient")
+    assert client.get("/patients/me/summary", headers=patient).status_code == 404
+    pid = client.post("/patients/self/register", json={"date_of_birth": "1980-01-01"}, headers=patient).json()["id"]
+
+    s = client.get("/patients/me/summary", headers=patient).json()
+    assert s["hospital"] is None and s["provider"] is None and s["consents"] == []
+    assert s["record_counts"] == {"immunizations": 0, "allergies": 0, "conditions": 0}
+
+    r = client.post("/patients/me/hospital", json={"npi": "1234567890", "name": "Mercy", "city": "Chicago"}, headers=patient)
+    assert r.status_code == 200, r.text
+    expires_at = (datetime.now(timezone.utc) + timedelta(days=3)).isoformat()
+    r = client.post(
+        f"/consents/patients/{pid}",
+        json={"grantee_email": doctor_email, "scope": "allergies", "expires_at": expires_at},
+        headers=patient,
+    )
+    assert r.status_code == 200, r.text
+    lines = [
+        json.dumps({"patient": pid, "record_type": t, "fhir_resource_type": "X", "fhir_resource_id": str(i), "issuer": "H"})
+        for i, t in enumerate(["allergy", "allergy", "condition"])
+    ]
+    r = client.post("/patients/pointers/bulk", content="\n".join(lines), headers={**patient, "content-type": "application/x-ndjson"})
+    assert r.status_code == 200, r.text
+
+    r, selects = _selects(client, patient)
+    s = r.json()
+    assert s["profile"]["id"] == pid and s["profile"]["date_of_birth"] == "1980-01-01"
+    assert s["hospital"]["hospital_name"] == "Mercy" and s["provider"] is None
+    assert [c["grantee_email"] for c in s["consents"]] == [doctor_email]
+    assert s["record_counts"] == {"immunizations": 0, "allergies": 2, "conditions": 1}
+    assert s["records_last_added"]["immunizations"] is None and s["records_last_added"]["allergies"]
+    # the user, the profile with its selections, consents, counts
+    assert len(selects) <= 4
+
+
+def test_summary_is_for_patients(client, register):
+    _, doctor = register("doctor")
+    assert client.get("/patients/me/summary", headers=doctor).status_code == 403
+    assert client.get("/patients/me/summary").status_code == 401
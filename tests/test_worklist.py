@@ -0,0 +1,51 @@
+from datetime import datetime, timedelta, timezone
+
+
+def _grant(client, guardian, patient_id, doctor_email, scopes):
+    expires_at = (datetime.now(timezone.utc) + timedelta(days=1)).isoformat()
+    grants = [{"grantee_email": doctor_email, "scope": s, "expires_at": expires_at} for s in scopes]
+    r = client.post(f"/consents/patients/{patient_id}/bulk", json={"grants": grants}, headers=guardian)
+    assert r.status_code == 200, r.text
+    return r.json()
+
+
+def test_worklist_pages_through_every_patient_once(client, register):
+    doctor_email, doctor = register("doctor")
+    _, guardian = register("guardian")
+    expected = {}
+    for _ in range(7):
+        p = client.post("/patients", json={}, headers=guardian).json()
+        _grant(client, guardian, p["public_id"], doctor_email, ["immunizations", "allergies"])
+        expected[p["id"]] = p["public_id"]
+
+    seen, cursor = [], None
+    while True:
+        params = {"limit": 3, **({"cursor": cursor} if cursor else {})}
+        r = client.get("/consents/doctor/patients", params=params, headers=doctor)
+        assert r.status_code == 200, r.text
+        body = r.json()
+        assert len(body["patients"]) <= 3
+        seen += body["patients"]
+        cursor = body["next_cursor"]
+        if not cursor:
+            break
+
+    assert [p["patient_id"] for p in seen] == sorted(expected)
+    assert {p["patient_id"]: p["patient_public_id"] for p in seen} == expected
+    assert all(p["scopes"] == ["allergies", "immunizations"] for p in seen)
+
+
+def test_worklist_leaves_out_revoked_consents(client, register):
+    doctor_email, doctor = register("doctor")
+    _, guardian = register("guardian")
+    kept = client.post("/patients", json={}, headers=guardian).json()
+    revoked = client.post("/patients", json={}, headers=guardian).json()
+    _grant(client, guardian, kept["public_id"], doctor_email, ["conditions"])
+    _grant(client, guardian, revoked["public_id"], doctor_email, ["conditions"])
+    consents = client.get(f"/consents/patients/{revoked['public_id']}", headers=guardian).json()["consents"]
+    assert client.post(f"/consents/{consents[0]['id']}/revoke", headers=guardian).status_code == 200
+
+    r = client.get("/consents/doctor/patients", headers=doctor)
+    assert [p["patient_id"] for p in r.json()["patients"]] == [kept["id"]]
+    _, other = register("guardian")
+    assert client.get("/consents/doctor/patients", headers=other).status_code == 403
@@ -0,0 +1,45 @@
+import math
+import random
+
+import pytest
+
+from app import zip_geo
+from app.zip_geo import ZipGrid, haversine_km
+
+
+def _brute_force(points, lat, lon, radius_km):
+    return sorted((d, z) for z, p in points.items() if (d := haversine_km(lat, lon, *p)) <= radius_km)
+
+
+def test_within_matches_brute_force_on_random_points():
+    rnd = random.Random(7)
+    points = {f"{i:05d}": (rnd.uniform(25, 49), rnd.uniform(-124, -67)) for i in range(20000)}
+    grid = ZipGrid(points)
+    for _ in range(50):
+        lat, lon = rnd.uniform(26, 48), rnd.uniform(-120, -70)
+        radius_km = rnd.choice([1, 10, 50, 120, 500])
+        assert grid.within(lat, lon, radius_km) == _brute_force(points, lat, lon, radius_km)
+
+
+@pytest.mark.parametrize("radius_km", [25, 55.6, 200, 500])
+@pytest.mark.parametrize("lat", [0.0, 39.99999, 45.0, 64.9, 80.0])
+def test_within_finds_points_on_the_circle(lat, radius_km):
+    # points just inside the radius in every direction, where a box drawn too
+    # tight around the circle misses them
+    lon = -100.0
+    points = {}
+    for bearing in range(0, 360, 5):
+        for fraction in (0.999999, 1.000001):
+            points[f"{bearing}-{fraction}"] = _destination(lat, lon, bearing, radius_km * fraction)
+    grid = ZipGrid(points)
+    found = grid.within(lat, lon, radius_km)
+    assert found == _brute_force(points, lat, lon, radius_km)
+    assert len(found) == 72
+
+
+def _destination(lat, lon, bearing_deg, distance_km):
+    d = distance_km / zip_geo.EARTH_RADIUS_KM
+    p1, l1, b = math.radians(lat), math.radians(lon), math.radians(bearing_deg)
+    p2 = math.asin(math.sin(p1) * math.cos(d) + math.cos(p1) * math.sin(d) * math.cos(b))
+    l2 = l1 + math.atan2(math.sin(b) * math.sin(d) * math.cos(p1), math.cos(d) - math.sin(p1) * math.sin(p2))
+    return math.degrees(p2), math.degrees(l2)